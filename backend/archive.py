@@ -0,0 +1,356 @@
+import csv
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import os
+import uuid
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, insert, delete, exists, inspect
+from database import db, Client, Order, OrderArchive, StockMovement
+from data_versions import bump_data_versions, record_tombstones
+
+DEFAULTS = {
+    'ARCHIVE_DIR': None,                    # padrão: <instance>/archive
+    'ARCHIVE_AFTER_DAYS': 365,              # meses inteiros anteriores a hoje - N dias
+    'ARCHIVE_STATUSES': 'Concluído,Entregue,Cancelado',
+}
+
+# Colunas do arquivo, na ordem do CSV. client_name guarda o nome do cliente na data do
+# arquivamento: relatórios de pedidos arquivados não dependem do cliente continuar existindo.
+FIELDS = ('id', 'order_number', 'client_id', 'client_name', 'material', 'thickness', 'width', 'length',
+          'quantity', 'observations', 'value', 'status', 'created_at', 'updated_at')
+ArchivedOrder = namedtuple('ArchivedOrder', FIELDS)
+
+_PARSE = {
+    'id': int, 'client_id': int, 'width': float, 'length': float, 'quantity': int, 'value': float,
+    'created_at': datetime.fromisoformat, 'updated_at': datetime.fromisoformat,
+}
+DELETE_CHUNK = 500
+COMPRESS_LEVEL = 6
+
+
+class ArchiveError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _archive_dir(app=None):
+    app = app or current_app
+    directory = app.config.get('ARCHIVE_DIR') or os.path.join(app.instance_path, 'archive')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _month_of(value):
+    return date(value.year, value.month, 1)
+
+
+def _next_month(day):
+    return date(day.year + (day.month // 12), day.month % 12 + 1, 1)
+
+
+def parse_month(value):
+    try:
+        return date.fromisoformat(f"{value}-01")
+    except (TypeError, ValueError):
+        raise ArchiveError(f"Mês inválido: {value}. Use YYYY-MM.")
+
+
+# --- Arquivos: CSV compactado, ordenado por (created_at, id) ---
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _parse_row(values):
+    row = {}
+    for field, value in zip(FIELDS, values):
+        if value == '':
+            row[field] = None
+        else:
+            convert = _PARSE.get(field)
+            row[field] = convert(value) if convert else value
+    return ArchivedOrder(**row)
+
+
+def read_archive_file(path):
+    """Lê um mês arquivado em streaming (descompacta e converte linha a linha)."""
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if tuple(header or ()) != FIELDS:
+            raise ArchiveError(f"Arquivo de pedidos com colunas inesperadas: {path}")
+        for values in reader:
+            yield _parse_row(values)
+
+
+def _write_archive_file(path, rows):
+    """Grava as linhas no arquivo e força para o disco. Retorna (linhas, bytes, sha256)."""
+    count = 0
+    with open(path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=COMPRESS_LEVEL, mtime=0) as gz:
+            text = io.TextIOWrapper(gz, encoding='utf-8', newline='')
+            writer = csv.writer(text)
+            writer.writerow(FIELDS)
+            for row in rows:
+                writer.writerow([_cell(value) for value in row])
+                count += 1
+            text.flush()
+            text.detach()
+        raw.flush()
+        os.fsync(raw.fileno())
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return count, os.path.getsize(path), digest.hexdigest()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# --- Resumo de vendas (mantém o rollup sem ler os arquivos) ---
+def _summarize(rows, summary=None):
+    summary = summary if summary is not None else {}
+    for row in rows:
+        key = (row.created_at.date().isoformat(), row.status)
+        total_value, total_orders = summary.get(key, (0.0, 0))
+        summary[key] = (total_value + (row.value or 0), total_orders + 1)
+    return summary
+
+
+def _load_summary(text):
+    return {(day, status): (value, count) for day, status, value, count in json.loads(text)}
+
+
+def _dump_summary(summary):
+    return json.dumps([[day, status, value, count] for (day, status), (value, count) in sorted(summary.items())])
+
+
+def archived_sales(connection):
+    """Vendas dos pedidos arquivados {(dia, status): (valor, quantidade)}, para reconstruir e
+    conferir o rollup (os pedidos arquivados continuam contando nas vendas)."""
+    totals = {}
+    # A migração do rollup roda antes da que cria o índice do arquivo
+    if not inspect(connection).has_table(OrderArchive.__tablename__):
+        return totals
+    for (text,) in connection.execute(select(OrderArchive.summary)):
+        for (day, status), (value, count) in _load_summary(text).items():
+            key = (date.fromisoformat(day), status)
+            total_value, total_orders = totals.get(key, (0.0, 0))
+            totals[key] = (total_value + value, total_orders + count)
+    return totals
+
+
+# --- Arquivamento ---
+def default_cutoff(app=None):
+    """Primeiro mês que fica na tabela: o mês de hoje - ARCHIVE_AFTER_DAYS."""
+    app = app or current_app
+    return _month_of(datetime.utcnow() - timedelta(days=int(app.config['ARCHIVE_AFTER_DAYS'])))
+
+
+def archive_statuses(app=None):
+    app = app or current_app
+    return [s.strip() for s in app.config['ARCHIVE_STATUSES'].split(',') if s.strip()]
+
+
+def _candidates(statuses):
+    # Pedidos com movimentações de estoque ficam na tabela: o livro razão mantém o vínculo
+    return (Order.status.in_(statuses), Order.created_at.isnot(None),
+            ~exists().where(StockMovement.order_id == Order.id))
+
+
+def archivable_months(cutoff, statuses):
+    """[(mês, pedidos)] com pedidos finalizados anteriores ao mês de corte."""
+    before = datetime.combine(cutoff, datetime.min.time())
+    rows = db.session.execute(
+        select(Order.created_at).where(*_candidates(statuses), Order.created_at < before)
+    ).scalars()
+    months = {}
+    for created_at in rows:
+        month = _month_of(created_at)
+        months[month] = months.get(month, 0) + 1
+    return sorted(months.items())
+
+
+def archive_month(month, statuses, app=None):
+    """Move os pedidos finalizados do mês para o arquivo, numa única transação.
+
+    Se o mês já tem arquivo, gera uma nova versão com as linhas antigas e as novas
+    intercaladas; a versão anterior só é apagada depois do commit. Retorna a quantidade
+    de pedidos arquivados.
+    """
+    app = app or current_app
+    directory = _archive_dir(app)
+    start, end = (datetime.combine(day, datetime.min.time()) for day in (month, _next_month(month)))
+    filename = f"orders-{month:%Y-%m}-{uuid.uuid4().hex[:8]}.csv.gz"
+    path = os.path.join(directory, filename)
+    with db.engine.begin() as connection:
+        query = (
+            select(Order.id, Order.order_number, Order.client_id, Client.name, Order.material, Order.thickness,
+                   Order.width, Order.length, Order.quantity, Order.observations, Order.value, Order.status,
+                   Order.created_at, Order.updated_at)
+            .outerjoin(Client, Client.id == Order.client_id)
+            .where(*_candidates(statuses), Order.created_at >= start, Order.created_at < end)
+            .order_by(Order.created_at, Order.id)
+        )
+        if connection.dialect.name == 'postgresql':
+            query = query.with_for_update(of=Order)
+        new_rows = [ArchivedOrder(*row) for row in connection.execute(query)]
+        if not new_rows:
+            return 0
+        previous = connection.execute(select(OrderArchive).where(OrderArchive.month == month)).first()
+        old_rows = read_archive_file(os.path.join(directory, previous.filename)) if previous else ()
+        summary = _load_summary(previous.summary) if previous else {}
+        _summarize(new_rows, summary)
+        merged = heapq.merge(old_rows, new_rows, key=lambda row: (row.created_at, row.id))
+        try:
+            rows, size, sha256 = _write_archive_file(path, merged)
+            bump_data_versions(connection, ['orders'])
+            ids = [row.id for row in new_rows]
+            deleted = 0
+            for chunk in range(0, len(ids), DELETE_CHUNK):
+                # Mesmo filtro da leitura: um pedido reaberto nesse meio tempo não é apagado
+                deleted += connection.execute(
+                    delete(Order).where(Order.id.in_(ids[chunk:chunk + DELETE_CHUNK]), *_candidates(statuses))
+                ).rowcount
+            if deleted != len(ids):
+                raise ArchiveError(f"Pedidos de {month:%Y-%m} alterados durante o arquivamento; tente de novo")
+            record_tombstones(connection, [('orders', order_id) for order_id in ids])
+            values = {
+                'filename': filename, 'rows': rows, 'size_bytes': size, 'sha256': sha256,
+                'first_created_at': min(new_rows[0].created_at, previous.first_created_at if previous else end),
+                'last_created_at': max(new_rows[-1].created_at, previous.last_created_at if previous else start),
+                'summary': _dump_summary(summary), 'archived_at': datetime.utcnow(),
+            }
+            connection.execute(delete(OrderArchive).where(OrderArchive.month == month))
+            connection.execute(insert(OrderArchive).values(month=month, **values))
+        except BaseException:
+            _remove(path)
+            raise
+    if previous:
+        _remove(os.path.join(directory, previous.filename))
+    return len(new_rows)
+
+
+def archive_orders(cutoff=None, statuses=None, dry_run=False, log=print):
+    """Arquiva, mês a mês, os pedidos finalizados anteriores ao mês de corte."""
+    cutoff = cutoff or default_cutoff()
+    statuses = statuses or archive_statuses()
+    months = archivable_months(cutoff, statuses)
+    db.session.rollback()
+    total = 0
+    for month, count in months:
+        if dry_run:
+            log(f"{month:%Y-%m}: {count} pedido(s) seriam arquivados")
+            total += count
+            continue
+        archived = archive_month(month, statuses)
+        log(f"{month:%Y-%m}: {archived} pedido(s) arquivados")
+        total += archived
+    return total
+
+
+# --- Restauração ---
+def restore_month(month, app=None):
+    """Devolve os pedidos de um mês arquivado para a tabela e apaga o arquivo."""
+    app = app or current_app
+    directory = _archive_dir(app)
+    with db.engine.begin() as connection:
+        entry = connection.execute(select(OrderArchive).where(OrderArchive.month == month)).first()
+        if not entry:
+            raise ArchiveError(f"Mês {month:%Y-%m} não está arquivado", 404)
+        path = os.path.join(directory, entry.filename)
+        rows = list(read_archive_file(path))
+        ids = [row.id for row in rows]
+        numbers = [row.order_number for row in rows]
+        client_ids = sorted({row.client_id for row in rows})
+        conflicts = []
+        for chunk in range(0, len(rows), DELETE_CHUNK):
+            conflicts += connection.execute(
+                select(Order.id).where(Order.id.in_(ids[chunk:chunk + DELETE_CHUNK])
+                                       | Order.order_number.in_(numbers[chunk:chunk + DELETE_CHUNK]))
+            ).scalars().all()
+        if conflicts:
+            raise ArchiveError(f"Já existem pedidos com o mesmo id ou número na tabela: {conflicts[:10]}", 409)
+        existing = set(connection.execute(select(Client.id).where(Client.id.in_(client_ids))).scalars())
+        missing = [client_id for client_id in client_ids if client_id not in existing]
+        if missing:
+            raise ArchiveError(f"Clientes excluídos depois do arquivamento: {missing[:10]}", 409)
+        # Os pedidos nunca saíram do rollup de vendas: o INSERT direto não gera deltas.
+        # change_version vem do default da coluna (versão já incrementada)
+        bump_data_versions(connection, ['orders'])
+        for chunk in range(0, len(rows), DELETE_CHUNK):
+            connection.execute(insert(Order), [
+                {field: getattr(row, field) for field in FIELDS if field != 'client_name'}
+                for row in rows[chunk:chunk + DELETE_CHUNK]
+            ])
+        connection.execute(delete(OrderArchive).where(OrderArchive.month == month))
+    _remove(path)
+    return len(rows)
+
+
+# --- Leitura: pedidos arquivados com os filtros das listagens ---
+def archived_months(start=None, end=None):
+    """Meses arquivados que se sobrepõem ao período [start, end]."""
+    query = select(OrderArchive.month, OrderArchive.filename).order_by(OrderArchive.month)
+    if start:
+        query = query.where(OrderArchive.last_created_at >= start)
+    if end:
+        query = query.where(OrderArchive.first_created_at <= end)
+    return db.session.execute(query).all()
+
+
+def iter_archived(filters, descending=False):
+    """Pedidos arquivados que atendem aos filtros de pagination.order_filters, em ordem de
+    (created_at, id). Lê um mês por vez; só os meses dentro do período são abertos."""
+    statuses, client_id, start, end, end_inclusive = filters
+    statuses = set(statuses)
+    directory = _archive_dir()
+    months = archived_months(start, end)
+    for _, filename in reversed(months) if descending else months:
+        rows = read_archive_file(os.path.join(directory, filename))
+        if descending:
+            # O arquivo está em ordem crescente: inverte um mês por vez
+            rows = reversed(list(rows))
+        for row in rows:
+            if statuses and row.status not in statuses:
+                continue
+            if client_id is not None and row.client_id != client_id:
+                continue
+            if start and row.created_at < start:
+                continue
+            if end and (row.created_at > end if end_inclusive else row.created_at >= end):
+                continue
+            yield row
+
+
+def merge_archived(live_rows, archived_rows, key, descending=False):
+    """Intercala linhas da tabela e do arquivo, as duas já ordenadas por `key`."""
+    return heapq.merge(live_rows, archived_rows, key=key, reverse=descending)
+
+
+def archive_listing():
+    return [
+        {'month': f"{row.month:%Y-%m}", 'rows': row.rows, 'size_bytes': row.size_bytes,
+         'first_created_at': row.first_created_at.isoformat(), 'last_created_at': row.last_created_at.isoformat(),
+         'archived_at': row.archived_at.isoformat(), 'sha256': row.sha256}
+        for row in db.session.execute(select(OrderArchive).order_by(OrderArchive.month)).scalars()
+    ]
+
+
+def init_archive(app):
+    for key, default in DEFAULTS.items():
+        app.config.setdefault(key, default)
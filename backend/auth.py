@@ -0,0 +1,254 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+from flask import current_app, has_app_context, request, jsonify, g
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from sqlalchemy import event, func, select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from werkzeug.security import generate_password_hash, check_password_hash
+from database import db, User, RevokedToken
+
+DEFAULTS = {
+    'AUTH_REQUIRED': True,
+    'ACCESS_TOKEN_TTL': 15 * 60,            # segundos
+    'REFRESH_TOKEN_TTL': 7 * 24 * 3600,
+    'AUTH_KDF_WORKERS': 2,                  # threads dedicadas ao hash de senha
+    'AUTH_KDF_MAX_PENDING': 1,              # logins aguardando além das threads; acima disso, 503
+    'AUTH_KDF_TIMEOUT': 10,
+    'AUTH_REVOCATION_CACHE_TTL': 5,         # segundos que cada processo reaproveita a consulta de revogação
+    'WEB_THREADS': 4,                       # threads por worker do gunicorn (GUNICORN_THREADS)
+}
+
+# Segundos que o cliente deve esperar quando o pool de hash de senha está cheio
+KDF_RETRY_AFTER = 2
+# Entradas do cache de revogação acima das quais as expiradas são descartadas
+REVOCATION_CACHE_MAX = 10000
+
+# Views liberadas de token (marcadas com @public)
+_public_views = set()
+
+
+class AuthError(Exception):
+    def __init__(self, message, status=401, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class RevocationStore:
+    """Tokens revogados (por jti) e geração de tokens de cada usuário.
+
+    Fica no banco, então logout, rotação do refresh token e troca de senha/perfil valem em
+    todos os workers. A gravação usa a sessão da requisição (quem chama faz o commit). Cada
+    token leva a geração do usuário na emissão; trocar senha ou perfil incrementa a geração e
+    invalida todos os tokens anteriores, sem depender do relógio.
+
+    A verificação roda em toda requisição: cada processo guarda o resultado por `ttl` segundos.
+    As gravações deste processo descartam as entradas no commit; as de outros workers passam a
+    valer aqui em até `ttl` segundos.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._users = {}    # user_id -> (expira em, geração ou None se o usuário não existe)
+        self._tokens = {}   # jti -> (expira em, revogado)
+
+    def revoke(self, jti, user_id, expires_at):
+        """Revoga o token. Levanta AuthError se ele já estava revogado (ex.: refresh reutilizado)."""
+        now = datetime.utcnow()
+        db.session.execute(delete(RevokedToken).where(RevokedToken.expires_at < now))
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(RevokedToken).values(
+                    jti=jti, user_id=user_id, expires_at=datetime.utcfromtimestamp(expires_at)))
+        except IntegrityError:
+            raise AuthError('Token revogado')
+        db.session.info.setdefault('revoked_tokens', set()).add(jti)
+
+    def revoke_user(self, user_id):
+        db.session.execute(update(User).where(User.id == user_id)
+                           .values(token_generation=func.coalesce(User.token_generation, 0) + 1))
+        db.session.info.setdefault('revoked_users', set()).add(user_id)
+
+    def forget(self, jtis=(), user_ids=()):
+        for jti in jtis:
+            self._tokens.pop(jti, None)
+        for user_id in user_ids:
+            self._users.pop(user_id, None)
+
+    def is_revoked(self, jti, user_id, generation):
+        now = time.monotonic()
+        user = self._users.get(user_id)
+        token = self._tokens.get(jti)
+        if user is None or user[0] < now or token is None or token[0] < now:
+            revoked = select(RevokedToken.jti).where(RevokedToken.jti == jti).exists()
+            row = db.session.execute(
+                select(func.coalesce(User.token_generation, 0).label('generation'), revoked.label('revoked'))
+                .where(User.id == user_id)
+            ).first()
+            if len(self._users) + len(self._tokens) > REVOCATION_CACHE_MAX:
+                self._purge(now)
+            expires = now + self.ttl
+            # Usuário excluído: nenhum token dele vale mais
+            user = self._users[user_id] = (expires, row.generation if row else None)
+            token = self._tokens[jti] = (expires, bool(row and row.revoked))
+        return user[1] is None or token[1] or generation < user[1]
+
+    def _purge(self, now):
+        for cache in (self._users, self._tokens):
+            for key, (expires, _) in list(cache.items()):
+                if expires < now:
+                    cache.pop(key, None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _forget_revoked(session):
+    jtis = session.info.pop('revoked_tokens', ())
+    user_ids = session.info.pop('revoked_users', ())
+    if (jtis or user_ids) and has_app_context():
+        get_auth().revoked.forget(jtis, user_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_revoked(session):
+    session.info.pop('revoked_tokens', None)
+    session.info.pop('revoked_users', None)
+
+
+class KdfPool:
+    """Executa o hash de senha (KDF, propositalmente lento) num pool pequeno e dedicado.
+
+    Uma rajada de logins ocupa no máximo `workers` CPUs. Cada chamada em andamento prende uma
+    thread do gunicorn, então o total (`workers` + `max_pending`) fica abaixo das `threads` do
+    worker: sobra sempre uma thread para as outras rotas. Acima disso o pedido é recusado na
+    hora com 503 e Retry-After.
+    """
+
+    def __init__(self, workers, max_pending, timeout, threads):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='kdf')
+        self._slots = threading.BoundedSemaphore(max(min(workers + max_pending, threads - 1), 1))
+        self.timeout = timeout
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise AuthError('Muitas tentativas de login simultâneas. Tente novamente em instantes.', 503,
+                            {'Retry-After': str(KDF_RETRY_AFTER)})
+        try:
+            return self._executor.submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeout:
+            raise AuthError('Tempo esgotado ao verificar credenciais.', 503, {'Retry-After': str(KDF_RETRY_AFTER)})
+        finally:
+            self._slots.release()
+
+
+class TokenAuth:
+    def __init__(self, app):
+        self.config = {key: app.config.get(key, default) for key, default in DEFAULTS.items()}
+        secret = app.config.get('SECRET_KEY')
+        if not secret:
+            if not app.config.get('TESTING'):
+                raise RuntimeError("SECRET_KEY não definida: configure a variável de ambiente SECRET_KEY "
+                                   "(a mesma em todos os workers) antes de iniciar a aplicação.")
+            # Só em testes: chave aleatória, válida apenas neste processo
+            secret = uuid.uuid4().hex
+        self.access = URLSafeTimedSerializer(secret, salt='gbl-access')
+        self.refresh = URLSafeTimedSerializer(secret, salt='gbl-refresh')
+        self.revoked = RevocationStore(self.config['AUTH_REVOCATION_CACHE_TTL'])
+        self.kdf = KdfPool(self.config['AUTH_KDF_WORKERS'], self.config['AUTH_KDF_MAX_PENDING'],
+                           self.config['AUTH_KDF_TIMEOUT'], self.config['WEB_THREADS'])
+        self._dummy_hash = None
+
+    # --- Senhas ---
+    def hash_password(self, password):
+        return self.kdf.run(generate_password_hash, password)
+
+    def check_password(self, password_hash, password):
+        if password_hash is None:
+            # Usuário inexistente: gasta o mesmo tempo para não revelar quais usuários existem
+            if self._dummy_hash is None:
+                self._dummy_hash = self.hash_password(uuid.uuid4().hex)
+            self.kdf.run(check_password_hash, self._dummy_hash, password)
+            return False
+        return self.kdf.run(check_password_hash, password_hash, password)
+
+    # --- Tokens ---
+    def issue(self, user_id, username, role, generation):
+        claims = {'uid': user_id, 'username': username, 'role': role, 'gen': generation or 0}
+        access_token = self.access.dumps({**claims, 'jti': uuid.uuid4().hex})
+        refresh_token = self.refresh.dumps({'uid': user_id, 'gen': generation or 0, 'jti': uuid.uuid4().hex})
+        return {
+            'access_token': access_token, 'refresh_token': refresh_token,
+            'token_type': 'Bearer', 'expires_in': self.config['ACCESS_TOKEN_TTL'],
+        }
+
+    def _load(self, serializer, token, ttl):
+        try:
+            claims, issued_at = serializer.loads(token, max_age=ttl, return_timestamp=True)
+        except SignatureExpired:
+            raise AuthError('Token expirado')
+        except BadSignature:
+            raise AuthError('Token inválido')
+        issued_at = issued_at.timestamp()
+        # Tokens sem geração são anteriores a ela e valem como geração 0
+        if self.revoked.is_revoked(claims['jti'], claims['uid'], claims.get('gen', 0)):
+            raise AuthError('Token revogado')
+        claims['exp'] = issued_at + ttl
+        return claims
+
+    def verify_access(self, token):
+        return self._load(self.access, token, self.config['ACCESS_TOKEN_TTL'])
+
+    def verify_refresh(self, token):
+        return self._load(self.refresh, token, self.config['REFRESH_TOKEN_TTL'])
+
+    def revoke(self, claims):
+        self.revoked.revoke(claims['jti'], claims['uid'], claims['exp'])
+
+    def revoke_user(self, user_id):
+        self.revoked.revoke_user(user_id)
+
+
+def init_auth(app):
+    for key, default in DEFAULTS.items():
+        app.config.setdefault(key, default)
+    app.extensions['token_auth'] = TokenAuth(app)
+
+
+def get_auth():
+    return current_app.extensions['token_auth']
+
+
+def public(view):
+    """Libera a view da exigência de token (login, refresh)."""
+    _public_views.add(view.__name__)
+    return view
+
+
+def bearer_token():
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[7:].strip()
+    return None
+
+
+def require_token():
+    """before_request do blueprint: exige access token válido em todas as rotas /api/*."""
+    if request.method == 'OPTIONS' or not request.path.startswith('/api/'):
+        return None
+    if not current_app.config['AUTH_REQUIRED']:
+        return None
+    endpoint = (request.endpoint or '').rsplit('.', 1)[-1]
+    if endpoint in _public_views:
+        return None
+    token = bearer_token()
+    if not token:
+        return jsonify({'message': 'Autenticação necessária'}), 401
+    try:
+        g.user = get_auth().verify_access(token)
+    except AuthError as e:
+        return jsonify({'message': str(e)}), e.status, e.headers
+    return None
+
@@ -0,0 +1,89 @@
+"""Mede o custo da autenticação por token em cada requisição.
+
+Uso (a partir de backend/): python benchmarks/bench_auth.py [--requests 2000]
+
+Compara a mesma rota com AUTH_REQUIRED ligado e desligado, mede a verificação do
+token isolada (HMAC + consulta de revogação no banco) e, como referência, o login (KDF).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+from app import create_app
+from auth import get_auth
+from database import db, User
+
+
+def make_app(auth_required):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite://", "SECRET_KEY": "bench", "ORDER_WEBHOOK_URL": None,
+        "AUTH_REQUIRED": auth_required, "HTTP_CACHE_BACKEND": "none",
+    })
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username="bench", password=generate_password_hash("bench"), role="admin"))
+        db.session.commit()
+    return app
+
+
+def timed_requests(client, n, headers):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        response = client.get("/api/users", headers=headers)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+    return samples
+
+
+def describe(samples):
+    ordered = sorted(samples)
+    p = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e6
+    return f"média {statistics.mean(samples) * 1e6:8.1f} µs  p50 {p(0.50):8.1f} µs  p95 {p(0.95):8.1f} µs"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    open_app = make_app(auth_required=False)
+    secured_app = make_app(auth_required=True)
+    open_client = open_app.test_client()
+    secured_client = secured_app.test_client()
+
+    start = time.perf_counter()
+    login = secured_client.post("/api/login", json={"username": "bench", "password": "bench"})
+    login_time = time.perf_counter() - start
+    headers = {"Authorization": f"Bearer {login.json['access_token']}"}
+
+    # Aquecimento
+    timed_requests(open_client, 100, {})
+    timed_requests(secured_client, 100, headers)
+
+    without_auth = timed_requests(open_client, args.requests, {})
+    with_auth = timed_requests(secured_client, args.requests, headers)
+
+    with secured_app.app_context():
+        auth = get_auth()
+        token = login.json["access_token"]
+        start = time.perf_counter()
+        for _ in range(args.requests * 10):
+            auth.verify_access(token)
+        verify_us = (time.perf_counter() - start) / (args.requests * 10) * 1e6
+
+    print(f"GET /api/users sem autenticação: {describe(without_auth)}")
+    print(f"GET /api/users com token:        {describe(with_auth)}")
+    overhead = (statistics.median(with_auth) - statistics.median(without_auth)) * 1e6
+    print(f"Overhead por requisição (p50):   {overhead:8.1f} µs")
+    print(f"verify_access isolado:           {verify_us:8.1f} µs")
+    print(f"Login (KDF no pool dedicado):    {login_time * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Operações em lote de pedidos contra uma requisição por pedido.
+
+Uso (a partir de backend/): python benchmarks/bench_bulk_orders.py [--orders 100,1000] [--repeat 3]
+
+Num SQLite em arquivo (cada commit vai para o disco), compara para cada total de `--orders`:
+  - criação: N x POST /api/orders contra POST /api/orders/batch;
+  - status: N x PUT /api/orders/<id> contra POST /api/orders/status com a lista de ids.
+Mostra o tempo, as instruções SQL e os commits de cada forma. Confere que as duas formas
+deixam os mesmos pedidos e que o rollup continua consistente (check_rollup); sai com
+código 1 se algo não bater.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, delete, select
+from app import create_app
+from database import db, Client, Order
+from migrations import upgrade
+from rollup import check_rollup, rebuild_rollup
+
+FIELDS = (Order.client_id, Order.material, Order.thickness, Order.width, Order.length, Order.quantity,
+          Order.value, Order.status)
+
+
+class Counter:
+    """Instruções SQL e commits executados no engine."""
+
+    def __init__(self, engine):
+        self.statements = self.commits = 0
+        event.listen(engine, "before_cursor_execute", self._statement)
+        event.listen(engine, "commit", self._commit)
+
+    def _statement(self, *args):
+        self.statements += 1
+
+    def _commit(self, *args):
+        self.commits += 1
+
+    def reset(self):
+        self.statements = self.commits = 0
+
+
+def make_orders(client_ids, count):
+    return [{"client_id": client_ids[n % len(client_ids)], "material": "Aço carbono", "thickness": "2mm",
+             "width": 100 + n % 900, "length": 200 + n % 1300, "quantity": 1 + n % 20,
+             "value": round(50 + n * 1.37 % 4000, 2)} for n in range(count)]
+
+
+def reset_orders(app):
+    with app.app_context():
+        db.session.execute(delete(Order))
+        db.session.commit()
+        rebuild_rollup()
+
+
+def order_state(app):
+    with app.app_context():
+        return db.session.execute(select(*FIELDS).order_by(Order.id)).all()
+
+
+def run(label, fn, counter):
+    counter.reset()
+    start = time.perf_counter()
+    fn()
+    return label, time.perf_counter() - start, counter.statements, counter.commits
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", default="100,1000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(workdir, 'bulk.db')}", "SECRET_KEY": "bench",
+        "AUTH_REQUIRED": False, "HTTP_CACHE_BACKEND": "none", "JOB_WORKERS": 0, "METRICS_ENABLED": False,
+        "ORDER_WEBHOOK_URL": None, "ORDER_BATCH_MAX_SIZE": 100_000,
+    })
+    http = app.test_client()
+    with app.app_context():
+        upgrade()
+        clients = [Client(name=f"Cliente {n}") for n in range(20)]
+        db.session.add_all(clients)
+        db.session.commit()
+        client_ids = [client.id for client in clients]
+        counter = Counter(db.engine)
+
+    failed = False
+    print(f"{'operação':<34} {'pedidos':>8} {'melhor':>10} {'SQL':>7} {'commits':>8}")
+    for count in (int(value) for value in args.orders.split(",")):
+        orders = make_orders(client_ids, count)
+        best, states = {}, {}
+        for _ in range(args.repeat):
+            reset_orders(app)
+
+            def single_create():
+                for order in orders:
+                    assert http.post("/api/orders", json=order).status_code == 201
+
+            def batch_create():
+                response = http.post("/api/orders/batch", json={"orders": orders})
+                assert response.status_code == 201, response.json
+
+            def ids():
+                with app.app_context():
+                    return list(db.session.scalars(select(Order.id).order_by(Order.id)))
+
+            def single_status():
+                for order_id in order_ids:
+                    assert http.put(f"/api/orders/{order_id}", json={"status": "Em produção"}).status_code == 200
+
+            def batch_status():
+                response = http.post("/api/orders/status", json={"status": "Em produção", "ids": order_ids})
+                assert response.status_code == 200 and response.json["counts"] == {"updated": count}, response.json
+
+            results = []
+            for mode, create, status in (("um por requisição", single_create, single_status),
+                                         ("em lote", batch_create, batch_status)):
+                reset_orders(app)
+                results.append(run(f"criação ({mode})", create, counter))
+                order_ids = ids()
+                results.append(run(f"status ({mode})", status, counter))
+                states[mode] = order_state(app)
+                with app.app_context():
+                    if check_rollup():
+                        print(f"ERRO: rollup inconsistente depois das operações {mode}")
+                        failed = True
+            for label, elapsed, statements, commits in results:
+                if label not in best or elapsed < best[label][0]:
+                    best[label] = (elapsed, statements, commits)
+        if states["um por requisição"] != states["em lote"]:
+            print(f"ERRO: pedidos diferentes entre as duas formas ({count} pedidos)")
+            failed = True
+        for label, (elapsed, statements, commits) in best.items():
+            print(f"{label:<34} {count:>8} {elapsed * 1000:>8.0f}ms {statements:>7} {commits:>8}")
+        for kind in ("criação", "status"):
+            single, batch = best[f"{kind} (um por requisição)"][0], best[f"{kind} (em lote)"][0]
+            print(f"{kind + ': ganho do lote':<34} {count:>8} {single / batch:>9.1f}x")
+    if failed:
+        raise SystemExit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Compara o tráfego de leitura do frontend: recarregar as listas inteiras x feed de alterações.
+
+Uso (a partir de backend/): python benchmarks/bench_changes.py [--scale small] [--edits 50]
+
+Gera a base com generate_data.py e simula uma tela aberta enquanto outra pessoa faz `--edits`
+escritas (edição de cliente, saída de estoque, mudança de status de pedido). Antes, cada escrita
+fazia as telas baixarem de novo /api/clients, /api/products e /api/pedidos; com o feed, cada
+tela recebe só as linhas alteradas por /api/changes. Mostra bytes e tempo de servidor dos dois.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from database import db, Client, Order, Product
+from migrations import upgrade
+from generate_data import SCALES, generate
+
+LISTS = ("/api/clients", "/api/products", "/api/pedidos")
+STATUSES = ("Aguardando", "Em produção", "Concluído")
+
+
+def fetch(client, path):
+    start = time.perf_counter()
+    response = client.get(path)
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, (path, response.status_code)
+    return response, len(response.get_data()), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--edits", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite://", "SECRET_KEY": "bench", "AUTH_REQUIRED": False,
+        "ORDER_WEBHOOK_URL": None, "HTTP_CACHE_BACKEND": "none", "JOB_WORKERS": 0, "METRICS_ENABLED": False,
+    })
+    rng = random.Random(args.seed)
+    with app.app_context():
+        upgrade()
+        generate(args.scale, args.seed, log=lambda message: None)
+        client_ids = list(db.session.execute(db.select(Client.id)).scalars())
+        product_ids = list(db.session.execute(db.select(Product.id)).scalars())
+        order_ids = list(db.session.execute(db.select(Order.id).limit(5000)).scalars())
+        db.session.rollback()
+    http = app.test_client()
+
+    cursor = http.get("/api/changes").json["cursor"]
+    full_bytes = full_time = delta_bytes = delta_time = delivered = 0
+    for n in range(args.edits):
+        kind = n % 3
+        if kind == 0:
+            http.put(f"/api/clients/{rng.choice(client_ids)}", json={"phone": f"11 9{n:04d}-0000"})
+        elif kind == 1:
+            http.post(f"/api/products/{rng.choice(product_ids)}/stock_movements", json={"kind": "in", "quantity": 1})
+        else:
+            http.put(f"/api/orders/{rng.choice(order_ids)}", json={"status": rng.choice(STATUSES)})
+        for path in LISTS:
+            _, size, elapsed = fetch(http, path)
+            full_bytes += size
+            full_time += elapsed
+        response, size, elapsed = fetch(http, f"/api/changes?entities=clients,products,pedidos&since={cursor}")
+        cursor = response.json["cursor"]
+        delivered += len(response.json["changes"])
+        delta_bytes += size
+        delta_time += elapsed
+
+    print(f"base '{args.scale}', {args.edits} escritas; por escrita, para uma tela aberta:")
+    print(f"  listas inteiras  {full_bytes / args.edits / 1024:10.1f} KiB  {full_time / args.edits * 1000:8.1f} ms")
+    print(f"  feed /api/changes{delta_bytes / args.edits / 1024:10.1f} KiB  {delta_time / args.edits * 1000:8.1f} ms "
+          f"({delivered} alterações entregues)")
+    print(f"  redução: {full_bytes / max(delta_bytes, 1):.0f}x em bytes, {full_time / max(delta_time, 1e-9):.0f}x em tempo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Tempo e aproveitamento do plano de corte conforme o volume de peças.
+
+Uso (a partir de backend/): python benchmarks/bench_cutting.py [--pieces 1000,5000,10000]
+                            [--groups 4] [--repeat 3] [--seed 42]
+
+Gera pedidos com dimensões aleatórias (peças de 50 a 1500 mm, quantidades de 1 a 40) em
+`--groups` combinações de material/espessura e mede GET /api/cutting-plans sem cache HTTP, até
+somar cada total de `--pieces`. Também confere o layout devolvido: toda peça dentro da chapa e
+nenhuma sobreposição entre peças (com o kerf). Sai com código 1 se alguma conferência falhar.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, insert
+from app import create_app
+from database import db, Client, Order
+from migrations import upgrade
+
+MATERIALS = [("Aço carbono", "2mm"), ("Aço inox", "1.5mm"), ("Alumínio", "3mm"), ("Galvanizado", "0.9mm"),
+             ("Aço carbono", "4.75mm"), ("Aço inox", "3mm")]
+KERF = 3.0
+
+
+def make_orders(client_id, pieces, groups, rng):
+    rows, total, n = [], 0, 0
+    while total < pieces:
+        quantity = min(rng.randint(1, 40), pieces - total)
+        material, thickness = MATERIALS[n % groups]
+        rows.append({
+            "order_number": f"CUT-{n:06d}", "client_id": client_id, "material": material,
+            "thickness": thickness, "width": float(rng.randint(50, 1500)), "length": float(rng.randint(50, 1500)),
+            "quantity": quantity, "value": 100.0, "status": "Aguardando",
+        })
+        total += quantity
+        n += 1
+    return rows
+
+
+def check_layout(plan):
+    """Peças dentro da chapa e sem sobreposição (retângulos acrescidos do kerf)."""
+    problems = 0
+    for group in plan["groups"]:
+        for sheet in group["sheets"]:
+            p = np.array([[piece["x"], piece["y"], piece["width"], piece["length"]] for piece in sheet["pieces"]])
+            x, y, w, l = p.T
+            if (x < -0.05).any() or (y < -0.05).any() or (x + w > sheet["width"] + 0.05).any() \
+                    or (y + l > sheet["length"] + 0.05).any():
+                problems += 1
+            x2, y2 = x + w + KERF - 0.1, y + l + KERF - 0.1
+            overlap = (x[:, None] < x2[None, :]) & (x[None, :] < x2[:, None]) \
+                & (y[:, None] < y2[None, :]) & (y[None, :] < y2[:, None])
+            np.fill_diagonal(overlap, False)
+            problems += int(overlap.any())
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pieces", default="1000,5000,10000")
+    parser.add_argument("--groups", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite://", "SECRET_KEY": "bench", "AUTH_REQUIRED": False,
+        "ORDER_WEBHOOK_URL": None, "HTTP_CACHE_BACKEND": "none", "JOB_WORKERS": 0, "METRICS_ENABLED": False,
+        "CUTTING_KERF": KERF, "CUTTING_MAX_PIECES": 1_000_000,
+    })
+    http = app.test_client()
+    with app.app_context():
+        upgrade()
+        client = Client(name="Cliente do benchmark")
+        db.session.add(client)
+        db.session.commit()
+        client_id = client.id
+
+    failed = False
+    print(f"{'peças':>8} {'pedidos':>8} {'chapas':>7} {'aproveit.':>10} {'mediana':>10} {'melhor':>10}")
+    for pieces in (int(value) for value in args.pieces.split(",")):
+        rng = random.Random(args.seed)
+        with app.app_context():
+            db.session.execute(delete(Order))
+            rows = make_orders(client_id, pieces, args.groups, rng)
+            db.session.execute(insert(Order), rows)
+            db.session.commit()
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            response = http.get("/api/cutting-plans")
+            times.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.json
+        plan = response.json
+        totals = plan["totals"]
+        problems = check_layout(plan)
+        placed = sum(sheet["pieces_count"] for group in plan["groups"] for sheet in group["sheets"])
+        if problems or placed + totals["unplaced"] != pieces:
+            print(f"ERRO: {problems} chapa(s) com peças fora/sobrepostas; {placed} de {pieces} peças no plano")
+            failed = True
+        times.sort()
+        print(f"{pieces:>8} {len(rows):>8} {totals['sheets']:>7} {totals['utilization']:>9.1%} "
+              f"{times[len(times) // 2] * 1000:>8.0f}ms {times[0] * 1000:>8.0f}ms")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
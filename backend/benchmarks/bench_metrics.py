@@ -0,0 +1,77 @@
+"""Mede o custo das métricas por requisição (middleware + hooks de SQL).
+
+Uso (a partir de backend/): python benchmarks/bench_metrics.py [--requests 3000] [--orders 200] [--rounds 5]
+
+Compara GET /api/orders?limit=50 e GET /api/users com métricas desligadas, ligadas com
+amostragem total e com amostragem de 10% de SQL.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from database import db, Client, Order, User
+
+ROUTES = ("/api/orders?limit=50", "/api/users")
+VARIANTS = (
+    ("sem métricas", {"METRICS_ENABLED": False}),
+    ("métricas, amostragem 100%", {"METRICS_ENABLED": True, "METRICS_SAMPLE_RATE": 1.0}),
+    ("métricas, amostragem 10%", {"METRICS_ENABLED": True, "METRICS_SAMPLE_RATE": 0.1}),
+)
+
+
+def make_app(orders, extra):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite://", "SECRET_KEY": "bench", "ORDER_WEBHOOK_URL": None,
+        "AUTH_REQUIRED": False, "HTTP_CACHE_BACKEND": "none", "JOB_WORKERS": 0, **extra,
+    })
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username="bench", password="x", role="admin"))
+        client = Client(name="Cliente")
+        db.session.add(client)
+        db.session.flush()
+        db.session.add_all(Order(order_number=f"P{n}", client_id=client.id, material="Aço", thickness="2mm",
+                                 width=100, length=200, quantity=1, value=10.0) for n in range(orders))
+        db.session.commit()
+    return app
+
+
+def median_us(client, route, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        response = client.get(route)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+    return statistics.median(samples) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    clients = [(label, make_app(args.orders, extra).test_client()) for label, extra in VARIANTS]
+    for route in ROUTES:
+        # Variantes intercaladas em várias rodadas (menor mediana), para o ruído não pesar em uma só
+        best = {}
+        for _ in range(args.rounds):
+            for label, client in clients:
+                median_us(client, route, 100)  # aquecimento
+                value = median_us(client, route, args.requests // args.rounds)
+                best[label] = min(best.get(label, value), value)
+        baseline = best[VARIANTS[0][0]]
+        for label, value in best.items():
+            overhead = value - baseline
+            print(f"{label:28s} {route:22s} p50 {value:8.1f} µs  overhead {overhead:+7.1f} µs "
+                  f"({overhead / baseline * 100:+5.1f}%)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Mede a latência de /api/search com muitos clientes e produtos.
+
+Uso (a partir de backend/): python benchmarks/bench_search.py [--rows 100000] [--queries 500]
+                            [--database-url postgresql://...]
+
+Sem --database-url usa SQLite em memória (índice em memória do processo). Com um banco
+PostgreSQL vazio, aplica as migrações (índices de trigramas) antes de popular as tabelas.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from app import create_app
+from database import db, Client, Product
+from migrations import upgrade
+
+WORDS = ["Aço", "Metalúrgica", "Comércio", "Indústria", "São", "Paulo", "Chapas", "Dobra", "Corte",
+         "Inox", "Alumínio", "Galvanizado", "Ferro", "Técnica", "Brasil", "Norte", "Sul", "Ltda", "ME"]
+
+
+def seed(rows):
+    rng = random.Random(42)
+    clients = [{"name": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {n}",
+                "cnpj": f"{rng.randrange(10**8):08d}/0001-{n % 100:02d}"} for n in range(rows)]
+    products = [{"name": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {n}mm", "sku": f"SKU-{n:06d}",
+                 "price": 10.0, "stock": 5} for n in range(rows)]
+    for start in range(0, rows, 10000):
+        db.session.execute(insert(Client), clients[start:start + 10000])
+        db.session.execute(insert(Product), products[start:start + 10000])
+    db.session.commit()
+
+
+def terms(rng, n):
+    sample = []
+    for _ in range(n):
+        word = rng.choice(WORDS).lower()
+        sample.append(rng.choice([word[:2], word[:4], word, f"{word[1:4]}", str(rng.randrange(1000, 99999))]))
+    return sample
+
+
+def describe(samples):
+    ordered = sorted(samples)
+    p = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e3
+    return f"média {statistics.mean(samples) * 1e3:7.2f} ms  p50 {p(0.50):7.2f} ms  p95 {p(0.95):7.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--database-url", default="sqlite://")
+    args = parser.parse_args()
+
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": args.database_url, "SECRET_KEY": "bench", "ORDER_WEBHOOK_URL": None,
+        "AUTH_REQUIRED": False, "HTTP_CACHE_BACKEND": "none", "JOB_WORKERS": 0,
+    })
+    with app.app_context():
+        upgrade()
+        start = time.perf_counter()
+        seed(args.rows)
+        print(f"{args.rows} clientes e {args.rows} produtos inseridos em {time.perf_counter() - start:.1f} s")
+
+    client = app.test_client()
+    for search_type in ("client", "product"):
+        # A primeira busca no SQLite monta o índice em memória
+        start = time.perf_counter()
+        client.get(f"/api/search?type={search_type}&q=aco")
+        print(f"{search_type}: primeira busca (aquecimento) {(time.perf_counter() - start) * 1e3:.1f} ms")
+        samples = []
+        for q in terms(random.Random(7), args.queries):
+            start = time.perf_counter()
+            response = client.get(f"/api/search?type={search_type}&q={q}")
+            samples.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.status_code
+        print(f"{search_type}: {describe(samples)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Compara a serialização de listagens grandes: objetos ORM + jsonify x colunas + serializers.
+
+Uso (a partir de backend/): python benchmarks/bench_serialization.py [--orders 20000] [--repeat 5]
+
+O caminho antigo carrega objetos Order (com o cliente via JOIN), monta dicionários à mão e
+serializa com jsonify; o novo seleciona só as colunas (linhas do Core, sem hidratar objetos)
+e serializa com orjson quando instalado. Mostra tempo e pico de memória (tracemalloc).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import jsonify
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
+from app import create_app
+from database import db, Client, Order
+from serializers import ORDER, json_response, orjson
+
+
+def seed(orders):
+    clients = [{"name": f"Cliente {n}"} for n in range(max(1, orders // 20))]
+    db.session.execute(insert(Client), clients)
+    db.session.execute(insert(Order), [{
+        "order_number": f"P{n:07d}", "client_id": n % len(clients) + 1, "material": "Aço",
+        "thickness": "2mm", "width": 100.0, "length": 200.0, "quantity": 3, "value": 150.5,
+        "observations": "Corte e dobra",
+    } for n in range(orders)])
+    db.session.commit()
+
+
+def orm_path():
+    orders = Order.query.options(joinedload(Order.client).load_only(Client.id, Client.name)) \
+        .order_by(Order.created_at, Order.id).all()
+    return jsonify([{
+        "id": o.id, "order_number": o.order_number, "client_id": o.client_id,
+        "client": {"id": o.client.id, "name": o.client.name} if o.client else None,
+        "material": o.material, "thickness": o.thickness, "width": o.width,
+        "length": o.length, "quantity": o.quantity, "observations": o.observations,
+        "value": o.value, "status": o.status, "created_at": o.created_at.isoformat()
+    } for o in orders])
+
+
+def row_path():
+    rows = ORDER.select(Order.query).order_by(Order.created_at, Order.id).all()
+    return json_response(ORDER.rows(rows))
+
+
+def measure(path, repeat):
+    times = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        body = path().get_data()
+        times.append(time.perf_counter() - start)
+    db.session.expunge_all()
+    tracemalloc.start()
+    path()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(times), peak, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite://", "SECRET_KEY": "bench", "ORDER_WEBHOOK_URL": None,
+        "AUTH_REQUIRED": False, "HTTP_CACHE_BACKEND": "none", "JOB_WORKERS": 0,
+    })
+    with app.test_request_context():
+        db.create_all()
+        seed(args.orders)
+        print(f"{args.orders} pedidos; orjson {'instalado' if orjson else 'ausente (json da biblioteca padrão)'}")
+        results = {}
+        for label, path in (("ORM + jsonify", orm_path), ("colunas + serializer", row_path)):
+            results[label] = measure(path, args.repeat)
+            seconds, peak, size = results[label]
+            print(f"{label:22s} {seconds * 1e3:8.1f} ms  pico {peak / 2**20:7.1f} MiB  resposta {size / 2**20:.1f} MiB")
+        (old_time, old_peak, _), (new_time, new_peak, _) = results.values()
+        print(f"ganho: {old_time / new_time:.1f}x mais rápido, {old_peak / new_peak:.1f}x menos memória de pico")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Verificação e ganho do arquivamento de pedidos antigos.
+
+Uso (a partir de backend/): python benchmarks/check_archive.py [--scale small] [--keep-months 6]
+
+Gera a base com generate_data.py num SQLite temporário, tira um retrato das saídas que
+dependem de pedidos antigos e arquiva os pedidos finalizados anteriores aos últimos
+`--keep-months` meses. Confere:
+  - exportação de pedidos (CSV, por data em vários filtros e períodos) idêntica à de antes;
+  - exportação por outra ordenação recusada quando inclui meses arquivados e idêntica à de
+    antes no período não arquivado;
+  - relatórios por período com as mesmas linhas (ordem e conteúdo);
+  - vendas por mês iguais, rollup consistente (check_rollup) e igual depois de reconstruído;
+  - restauração de todos os meses devolve a tabela ao estado original.
+Mostra o tamanho dos arquivos e o tempo das consultas que varrem a tabela antes e depois.
+Sai com código 1 se algo não bater.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, func
+from werkzeug.datastructures import MultiDict
+from app import create_app
+from archive import archive_orders, restore_month, archive_listing, parse_month
+from database import db, Order, OrderArchive
+from exports import export_rows, iter_csv, export_headers
+from migrations import upgrade
+from pagination import PaginationError, filter_orders, order_filters
+from reports import order_rows
+from rollup import sales_by_month, check_rollup, rebuild_rollup
+from generate_data import SCALES, END_DATE, generate
+
+EXPORTS = [
+    {},
+    {"sort": "created_at", "order": "desc", "status": "Entregue"},
+    {"from": f"{END_DATE.year - 1}-03-01", "to": f"{END_DATE.year - 1}-05-15"},
+]
+# Ordenações que não são por data: só fora dos meses arquivados
+UNSORTED_EXPORTS = [{"sort": "value", "order": "desc"}, {"sort": "order_number", "client_id": "7"}]
+REPORT_PERIODS = [{}, {"from": f"{END_DATE.year - 1}-01-01", "to": f"{END_DATE.year - 1}-12-31"}]
+ORDER_COLUMNS = [column for column in Order.__table__.columns if column.key != "change_version"]
+
+
+def export_digest(args):
+    digest = hashlib.sha256()
+    for chunk in iter_csv(export_rows("orders", MultiDict(args)), export_headers("orders")):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def report_digest(args):
+    args = MultiDict(args)
+    digest = hashlib.sha256()
+    count = 0
+    for row in order_rows(filter_orders(Order.query, args), order_filters(args)):
+        digest.update(repr((row.id, row.order_number, row.created_at, row.name, row.value, row.status)).encode())
+        count += 1
+    return count, digest.hexdigest()
+
+
+def table_digest():
+    digest = hashlib.sha256()
+    for row in db.session.execute(select(*ORDER_COLUMNS).order_by(Order.id)):
+        digest.update(repr(tuple(row)).encode())
+    return digest.hexdigest()
+
+
+def sales():
+    return {key: (round(value, 2), count) for key, (value, count) in sales_by_month().items()}
+
+
+def snapshot(keep_from):
+    recent = {"from": f"{keep_from:%Y-%m-%d}"}
+    return {
+        "exports": [export_digest(args) for args in EXPORTS + [dict(args, **recent) for args in UNSORTED_EXPORTS]],
+        "reports": [report_digest(args) for args in REPORT_PERIODS],
+        "sales": sales(),
+    }
+
+
+def timed(label, fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return label, best
+
+
+def scans(keep_from):
+    """Consultas que varrem a tabela de pedidos (período recente, como no dia a dia)."""
+    recent = MultiDict({"from": f"{keep_from:%Y-%m-%d}"})
+    return [
+        timed("contagem por status", lambda: db.session.execute(
+            select(Order.status, func.count()).group_by(Order.status)).all()),
+        timed("exportação do período recente", lambda: export_digest(recent)),
+        timed("pedidos em aberto por cliente", lambda: db.session.execute(
+            select(Order.client_id, func.sum(Order.value)).where(Order.status.in_(["Aguardando", "Em Produção"]))
+            .group_by(Order.client_id)).all()),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--keep-months", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(workdir, 'archive.db')}", "SECRET_KEY": "bench",
+        "AUTH_REQUIRED": False, "HTTP_CACHE_BACKEND": "none", "JOB_WORKERS": 0, "METRICS_ENABLED": False,
+        "ORDER_WEBHOOK_URL": None, "ARCHIVE_DIR": os.path.join(workdir, "archive"),
+    })
+    failed = False
+    with app.app_context():
+        upgrade()
+        generate(args.scale, args.seed, log=lambda message: None)
+        month = END_DATE.month - args.keep_months
+        cutoff = parse_month(f"{END_DATE.year + (month - 1) // 12}-{(month - 1) % 12 + 1:02d}")
+        total = db.session.scalar(select(func.count()).select_from(Order))
+        before = snapshot(cutoff)
+        table = table_digest()
+        scans_before = scans(cutoff)
+        db.session.rollback()
+
+        start = time.perf_counter()
+        archived = archive_orders(cutoff, log=lambda message: None)
+        elapsed = time.perf_counter() - start
+        listing = archive_listing()
+        size = sum(entry["size_bytes"] for entry in listing)
+        live = db.session.scalar(select(func.count()).select_from(Order))
+        print(f"{archived} de {total} pedidos arquivados em {len(listing)} meses ({elapsed:.1f}s); "
+              f"{size / 1024 / 1024:.1f} MiB compactados; {live} na tabela")
+
+        after = snapshot(cutoff)
+        for args in UNSORTED_EXPORTS:
+            try:
+                export_digest(args)
+                print(f"ERRO: exportação com meses arquivados aceitou a ordenação {args}")
+                failed = True
+            except PaginationError:
+                pass
+        for name in ("exports", "reports"):
+            for params, old, new in zip(EXPORTS + UNSORTED_EXPORTS if name == "exports" else REPORT_PERIODS,
+                                        before[name], after[name]):
+                if old != new:
+                    print(f"ERRO: {name} diferente depois do arquivamento: {params}")
+                    failed = True
+        if before["sales"] != after["sales"]:
+            print("ERRO: vendas por mês mudaram depois do arquivamento")
+            failed = True
+        if check_rollup():
+            print("ERRO: check_rollup encontrou divergências com pedidos arquivados")
+            failed = True
+        rebuild_rollup()
+        if sales() != before["sales"]:
+            print("ERRO: rollup reconstruído não inclui os pedidos arquivados")
+            failed = True
+
+        print(f"{'consulta':<32} {'antes':>10} {'depois':>10}")
+        for (label, old), (_, new) in zip(scans_before, scans(cutoff)):
+            print(f"{label:<32} {old * 1000:>8.1f}ms {new * 1000:>8.1f}ms")
+        db.session.rollback()
+
+        start = time.perf_counter()
+        for entry in listing:
+            restore_month(parse_month(entry["month"]))
+        print(f"restauração de {len(listing)} meses em {time.perf_counter() - start:.1f}s")
+        if table_digest() != table or db.session.scalar(select(func.count()).select_from(OrderArchive)):
+            print("ERRO: tabela de pedidos diferente depois da restauração")
+            failed = True
+        if check_rollup():
+            print("ERRO: rollup inconsistente depois da restauração")
+            failed = True
+        db.session.rollback()
+    if failed:
+        raise SystemExit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Verificação da entrega de webhooks de pedidos pela outbox.
+
+Uso (a partir de backend/): python benchmarks/check_outbox.py [--orders 40] [--updates 3]
+                            [--fail-first 15] [--delay-ms 30] [--concurrency 4] [--batch-size 1]
+
+Sobe um receptor local (stub do n8n) que recusa as primeiras `--fail-first` requisições com 503
+e responde as demais com atraso aleatório de até `--delay-ms`. Cria pedidos pela API, altera
+cada um `--updates` vezes e apaga alguns, com o dispatcher rodando no próprio processo. Confere:
+  - todo evento gravado chega ao receptor (entrega pelo menos uma vez: duplicatas são contadas);
+  - para cada pedido, os eventos chegam na ordem em que foram gravados;
+  - o último estado recebido de cada pedido é o do banco;
+  - com o receptor sempre fora do ar os eventos vão para 'dead' após OUTBOX_MAX_ATTEMPTS e
+    POST /api/outbox/dead/retry os entrega quando ele volta.
+Essa parte usa o formato envelope com todos os tipos de evento. Depois, com a configuração
+padrão (formato pedido, só order.created), confere que cada pedido novo chega num POST próprio
+com o corpo plano que a tela de pedidos mandava ao n8n, e que alterações não são enviadas.
+Sai com código 1 se algo não bater.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from database import db, Client, Order, OutboxEvent
+from migrations import upgrade
+
+STATUSES = ("Em produção", "Concluído", "Entregue")
+
+
+class Receiver:
+    """Estado do stub: requisições recusadas, eventos recebidos e a ordem de chegada por pedido."""
+
+    def __init__(self, fail_first, delay_ms):
+        self.lock = threading.Lock()
+        self.fail_first = fail_first
+        self.always_fail = False
+        self.delay_ms = delay_ms
+        self.requests = 0
+        self.rejected = 0
+        self.received = {}      # id do evento -> envelope
+        self.duplicates = 0
+        self.by_order = {}      # id do pedido -> ids dos eventos na ordem de chegada
+        self.raw = False        # formato pedido: guarda os corpos como chegaram
+        self.bodies = []
+
+    def handle(self, body):
+        with self.lock:
+            self.requests += 1
+            if self.always_fail or self.requests <= self.fail_first:
+                self.rejected += 1
+                return 503
+        time.sleep(random.uniform(0, self.delay_ms) / 1000)
+        payload = json.loads(body)
+        with self.lock:
+            if self.raw:
+                self.bodies.append(payload)
+                return 200
+            for envelope in payload.get("events", [payload]):
+                if envelope["id"] in self.received:
+                    self.duplicates += 1
+                    continue
+                self.received[envelope["id"]] = envelope
+                self.by_order.setdefault(envelope["order_id"], []).append(envelope["id"])
+        return 200
+
+
+def start_stub(receiver):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            status = receiver.handle(body)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b'{"ok": true}' if status == 200 else b'{"ok": false}')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def wait_drained(http, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = http.get("/api/outbox/status").json
+        if status["backlog"] == 0:
+            return status
+        time.sleep(0.1)
+    return http.get("/api/outbox/status").json
+
+
+def check_pedido_format(server, receiver):
+    """Configuração padrão: um POST por pedido novo, com o pedido plano e a data sem horário."""
+    receiver.raw = True
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'pedido.db')}",
+        "SECRET_KEY": "bench", "AUTH_REQUIRED": False, "HTTP_CACHE_BACKEND": "none", "JOB_WORKERS": 0,
+        "METRICS_ENABLED": False, "ORDER_WEBHOOK_URL": f"http://127.0.0.1:{server.server_port}/webhook",
+        "ORDER_WEBHOOK_FORMAT": "pedido", "ORDER_WEBHOOK_EVENTS": "order.created", "ORDER_WEBHOOK_BATCH_SIZE": 10,
+        "OUTBOX_POLL_INTERVAL": 0.05,
+    })
+    with app.app_context():
+        upgrade()
+        client = Client(name="Cliente do n8n")
+        db.session.add(client)
+        db.session.commit()
+        client_id = client.id
+    http = app.test_client()
+    created = []
+    for n in range(3):
+        response = http.post("/api/pedidos", json={
+            "cliente_id": client_id, "material": "Aço", "espessura": "2mm", "largura": 100 + n,
+            "comprimento": 200, "quantidade": 1, "valor": 10.0,
+        })
+        created.append(response.json["order"]["id"])
+    http.put(f"/api/pedidos/{created[0]}", json={"status": "Em produção"})
+    wait_drained(http, 30)
+    bodies = sorted(receiver.bodies, key=lambda body: body.get("id", 0))
+    print(f"  formato pedido: {len(bodies)} POST(s) para {len(created)} pedidos novos e 1 alteração")
+    ok = (len(bodies) == len(created) and [body.get("id") for body in bodies] == created
+          and all(body.get("cliente_nome") == "Cliente do n8n" and body.get("status") == "Aguardando"
+                  and len(body.get("data") or "") == 10 for body in bodies))
+    if not ok:
+        print(f"ERRO: corpo do formato pedido inesperado: {bodies[:1]}")
+    return not ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=40)
+    parser.add_argument("--updates", type=int, default=3)
+    parser.add_argument("--fail-first", type=int, default=15)
+    parser.add_argument("--delay-ms", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=1)
+    args = parser.parse_args()
+
+    receiver = Receiver(args.fail_first, args.delay_ms)
+    server = start_stub(receiver)
+    path = os.path.join(tempfile.mkdtemp(), "outbox.db")
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "SECRET_KEY": "bench", "AUTH_REQUIRED": False,
+        "HTTP_CACHE_BACKEND": "none", "JOB_WORKERS": 0, "METRICS_ENABLED": False,
+        "ORDER_WEBHOOK_URL": f"http://127.0.0.1:{server.server_port}/webhook", "ORDER_WEBHOOK_FORMAT": "envelope",
+        "ORDER_WEBHOOK_EVENTS": "order.created,order.updated,order.deleted",
+        "ORDER_WEBHOOK_BATCH_SIZE": args.batch_size, "OUTBOX_CONCURRENCY": args.concurrency,
+        "OUTBOX_POLL_INTERVAL": 0.05, "OUTBOX_BACKOFF_BASE": 0.05, "OUTBOX_BACKOFF_MAX": 0.5,
+        "OUTBOX_MAX_ATTEMPTS": 6,
+    })
+    with app.app_context():
+        upgrade()
+        client = Client(name="Cliente do teste")
+        db.session.add(client)
+        db.session.commit()
+        client_id = client.id
+    http = app.test_client()
+
+    failed = False
+    start = time.perf_counter()
+    order_ids = []
+    for n in range(args.orders):
+        response = http.post("/api/pedidos", json={
+            "cliente_id": client_id, "material": "Aço", "espessura": "2mm", "largura": 100,
+            "comprimento": 200, "quantidade": 1, "valor": 10.0,
+        })
+        assert response.status_code == 201, response.json
+        order_ids.append(response.json["order"]["id"])
+    for round_ in range(args.updates):
+        for order_id in order_ids:
+            http.put(f"/api/pedidos/{order_id}", json={"status": STATUSES[round_ % len(STATUSES)],
+                                                       "quantidade": round_ + 2})
+    deleted = order_ids[::7]
+    for order_id in deleted:
+        http.delete(f"/api/pedidos/{order_id}")
+    written = time.perf_counter() - start
+
+    status = wait_drained(http, 60)
+    with app.app_context():
+        expected = {row.id: row for row in db.session.execute(
+            db.select(OutboxEvent.id, OutboxEvent.order_id, OutboxEvent.status, OutboxEvent.attempts)
+        )}
+        final = {order.id: order.status for order in db.session.execute(db.select(Order)).scalars()}
+        db.session.rollback()
+
+    missing = set(expected) - set(receiver.received)
+    print(f"{len(expected)} eventos gravados em {written:.2f}s; {receiver.requests} requisições "
+          f"({receiver.rejected} recusadas, {receiver.duplicates} duplicatas)")
+    latency = status["delivery_latency_seconds"]
+    print(f"  latência de entrega: p50 {latency['p50']}s, p95 {latency['p95']}s, máx {latency['max']}s")
+    print(f"  situação: {status['counts']}")
+    if missing or status["backlog"]:
+        print(f"ERRO: {len(missing)} eventos não entregues, backlog {status['backlog']}")
+        failed = True
+    out_of_order = [order_id for order_id, ids in receiver.by_order.items() if ids != sorted(ids)]
+    if out_of_order:
+        print(f"ERRO: eventos fora de ordem nos pedidos {out_of_order[:10]}")
+        failed = True
+    for order_id in order_ids:
+        last = receiver.received[receiver.by_order[order_id][-1]]
+        if order_id in deleted:
+            ok = last["event"] == "order.deleted"
+        else:
+            ok = last["event"] == "order.updated" and last["data"]["status"] == final[order_id]
+        if not ok:
+            print(f"ERRO: último evento do pedido {order_id} não bate com o banco: {last['event']}")
+            failed = True
+            break
+
+    # Receptor fora do ar: eventos esgotam as tentativas e vão para 'dead'
+    receiver.always_fail = True
+    http.put(f"/api/pedidos/{order_ids[1]}", json={"status": "Aguardando"})
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline and http.get("/api/outbox/status").json["counts"]["dead"] == 0:
+        time.sleep(0.1)
+    dead = http.get("/api/outbox/status").json
+    print(f"  receptor fora do ar: {dead['counts']['dead']} evento(s) em 'dead', último erro: "
+          f"{(dead['last_error'] or {}).get('message')}")
+    if dead["counts"]["dead"] != 1:
+        print("ERRO: evento não foi para 'dead'")
+        failed = True
+    receiver.always_fail = False
+    requeued = http.post("/api/outbox/dead/retry").json["requeued"]
+    after = wait_drained(http, 30)
+    if requeued != 1 or after["backlog"] or after["counts"]["dead"]:
+        print(f"ERRO: reenvio dos eventos 'dead' falhou: {after['counts']}")
+        failed = True
+
+    failed = check_pedido_format(server, receiver) or failed
+    server.shutdown()
+    if failed:
+        raise SystemExit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Gera uma base sintética e reprodutível para benchmarks (usuários, clientes, produtos, pedidos).
+
+Uso (a partir de backend/): python benchmarks/generate_data.py --database-url sqlite:////tmp/bench.db
+                            [--scale small|medium|full] [--seed 42] [--reset]
+
+Escalas: small (2 mil clientes, 100 mil pedidos), medium (5 mil, 300 mil) e full (10 mil
+clientes, 1 milhão de pedidos em 4 anos). A mesma semente gera sempre os mesmos dados, com
+datas contadas a partir de END_DATE (e não de hoje), para os resultados serem comparáveis
+entre commits. Aplica as migrações, insere em lotes sem passar pelo ORM e depois recalcula
+os rollups de vendas e as versões de dados. Funciona com SQLite ou PostgreSQL local.
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, func, select
+from app import create_app
+from auth import get_auth
+from database import db, User, Client, Product, Order
+from data_versions import bump_data_versions
+from migrations import upgrade, schema_metadata
+from rollup import rebuild_rollup
+from stock import record_opening_balances
+
+SCALES = {
+    "small": {"users": 5, "clients": 2000, "products": 500, "orders": 100000, "years": 2},
+    "medium": {"users": 10, "clients": 5000, "products": 1000, "orders": 300000, "years": 3},
+    "full": {"users": 20, "clients": 10000, "products": 2000, "orders": 1000000, "years": 4},
+}
+END_DATE = datetime(2025, 12, 31, 18, 0)
+BATCH_SIZE = 10000
+BENCH_USER = ("bench", "bench")
+
+FIRST = ["Metalúrgica", "Serralheria", "Indústria", "Comércio", "Construtora", "Estruturas", "Caldeiraria",
+         "Ferragens", "Esquadrias", "Usinagem", "Montagens", "Máquinas", "Oficina", "Distribuidora"]
+SECOND = ["São Jorge", "Paulista", "Aço Forte", "Real", "Horizonte", "Nova Era", "União", "Progresso",
+          "Santa Luzia", "Ipiranga", "Vale Verde", "Três Irmãos", "Boa Vista", "Central", "Itaú"]
+SUFFIX = ["Ltda", "ME", "EIRELI", "S.A.", "EPP"]
+CITIES = ["São Paulo/SP", "Campinas/SP", "Curitiba/PR", "Joinville/SC", "Belo Horizonte/MG",
+          "Porto Alegre/RS", "Goiânia/GO", "Ribeirão Preto/SP", "Caxias do Sul/RS", "Betim/MG"]
+MATERIALS = [("Aço carbono", 1.0), ("Aço inox 304", 3.2), ("Alumínio", 2.1), ("Galvanizado", 1.3),
+             ("Aço inox 430", 2.4), ("Latão", 4.0), ("Cobre", 5.5)]
+THICKNESSES = ["0.5mm", "0.75mm", "1mm", "1.2mm", "1.5mm", "2mm", "3mm", "4.75mm", "6.3mm", "8mm"]
+PRODUCTS = ["Chapa", "Bobina", "Tubo", "Perfil U", "Cantoneira", "Barra chata", "Tela", "Telha",
+            "Calha", "Rufo", "Parafuso", "Rebite", "Disco de corte", "Eletrodo"]
+UNITS = ["un", "kg", "m", "m²", "cx", "pç"]
+# Pedidos antigos já foram entregues; os recentes ainda estão em andamento
+OLD_STATUSES = [("Entregue", 0.86), ("Cancelado", 0.08), ("Concluído", 0.06)]
+RECENT_STATUSES = [("Aguardando", 0.35), ("Em Produção", 0.30), ("Pronto", 0.15), ("Entregue", 0.15),
+                   ("Cancelado", 0.05)]
+
+
+def _weighted(rng, options):
+    return rng.choices([o for o, _ in options], weights=[w for _, w in options])[0]
+
+
+def _cnpj(n):
+    return f"{n // 10000:02d}.{n % 1000:03d}.{(n * 7) % 1000:03d}/0001-{n % 97:02d}"
+
+
+def _created_at(rng, years):
+    # Volume cresce com o tempo e tem sazonalidade (menos pedidos em dezembro/janeiro)
+    span = years * 365
+    while True:
+        days_ago = int(span * (1 - math.sqrt(rng.random())))
+        moment = END_DATE - timedelta(days=days_ago, minutes=rng.randrange(10 * 60))
+        if moment.month not in (12, 1) or rng.random() < 0.6:
+            return moment
+
+
+def users(rng, count, password_hash):
+    roles = ["admin"] + ["user"] * (count - 1)
+    return [{"username": BENCH_USER[0] if n == 0 else f"usuario{n:03d}", "password": password_hash,
+             "role": roles[n]} for n in range(count)]
+
+
+def clients(rng, count, years):
+    rows = []
+    for n in range(count):
+        rows.append({
+            "name": f"{rng.choice(FIRST)} {rng.choice(SECOND)} {n:05d} {rng.choice(SUFFIX)}",
+            "contact_person": f"Contato {n}", "phone": f"(11) 9{rng.randrange(10**8):08d}",
+            "email": f"compras{n}@cliente{n}.com.br", "address": f"Rua {rng.choice(SECOND)}, {rng.randrange(1, 3000)} - {rng.choice(CITIES)}",
+            "cnpj": _cnpj(n), "observations": None if rng.random() < 0.7 else "Pagamento em 28 dias",
+            "created_at": END_DATE - timedelta(days=rng.randrange(years * 365 + 180)),
+        })
+    return rows
+
+
+def products(rng, count, years):
+    rows = []
+    for n in range(count):
+        material, factor = rng.choice(MATERIALS)
+        rows.append({
+            "name": f"{rng.choice(PRODUCTS)} {material} {rng.choice(THICKNESSES)} {n:05d}",
+            "description": f"{material} para corte e dobra", "price": round(rng.uniform(5, 400) * factor, 2),
+            "unit": rng.choice(UNITS), "sku": f"SKU-{n:06d}",
+            # Uma parte com estoque baixo, para o painel ter o que mostrar
+            "stock": rng.randrange(0, 10) if rng.random() < 0.1 else rng.randrange(10, 5000),
+            "created_at": END_DATE - timedelta(days=rng.randrange(years * 365)),
+        })
+    return rows
+
+
+def orders(rng, count, client_count, years):
+    """Lotes de pedidos; poucos clientes concentram boa parte do volume (como na vida real)."""
+    batch = []
+    recent = END_DATE - timedelta(days=45)
+    for n in range(count):
+        created_at = _created_at(rng, years)
+        material, factor = rng.choice(MATERIALS)
+        width, length = rng.choice([100, 150, 200, 300, 500, 1000, 1200]), rng.choice([200, 500, 1000, 2000, 3000, 6000])
+        quantity = rng.choice([1, 1, 2, 5, 10, 20, 50, 100])
+        area = width * length / 1e6
+        batch.append({
+            "order_number": f"PED-{created_at:%Y%m%d}-{n:06X}",
+            "client_id": int(client_count * rng.paretovariate(1.2)) % client_count + 1,
+            "material": material, "thickness": rng.choice(THICKNESSES), "width": float(width),
+            "length": float(length), "quantity": quantity,
+            "observations": None if rng.random() < 0.8 else "Entregar com nota fiscal",
+            "value": round(area * quantity * 180 * factor + 15, 2),
+            "status": _weighted(rng, RECENT_STATUSES if created_at >= recent else OLD_STATUSES),
+            "created_at": created_at,
+        })
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def counts():
+    return {name: db.session.scalar(select(func.count()).select_from(model))
+            for name, model in (("users", User), ("clients", Client), ("products", Product), ("orders", Order))}
+
+
+def generate(scale, seed=42, log=print):
+    """Insere a base da escala informada no banco do app atual (que deve estar vazio)."""
+    sizes = SCALES[scale]
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    password_hash = get_auth().hash_password(BENCH_USER[1])
+    # Versão incrementada antes dos inserts: as linhas gravam change_version > 0 (feed de alterações)
+    bump_data_versions(db.session.connection(), ["users", "clients", "products", "orders"])
+    db.session.execute(insert(User), users(rng, sizes["users"], password_hash))
+    db.session.execute(insert(Client), clients(rng, sizes["clients"], sizes["years"]))
+    db.session.execute(insert(Product), products(rng, sizes["products"], sizes["years"]))
+    db.session.commit()
+    inserted = 0
+    for batch in orders(rng, sizes["orders"], sizes["clients"], sizes["years"]):
+        db.session.execute(insert(Order), batch)
+        db.session.commit()
+        inserted += len(batch)
+        if inserted % (BATCH_SIZE * 10) == 0:
+            log(f"  {inserted} pedidos...")
+    # Inserts em lote não passam pelos listeners do ORM: rollups, saldos e versões são refeitos aqui
+    rebuild_rollup()
+    record_opening_balances(db.session.connection())
+    bump_data_versions(db.session.connection(), ["users", "clients", "products", "orders"])
+    db.session.commit()
+    log(f"Base '{scale}' gerada em {time.perf_counter() - start:.1f} s: {counts()}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="Apaga as tabelas antes de gerar.")
+    args = parser.parse_args()
+
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": args.database_url, "SECRET_KEY": "bench", "ORDER_WEBHOOK_URL": None,
+        "HTTP_CACHE_BACKEND": "none", "JOB_WORKERS": 0,
+    })
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+            schema_metadata.drop_all(db.engine)
+        upgrade()
+        existing = counts()
+        if any(existing.values()):
+            raise SystemExit(f"Banco já tem dados ({existing}); use --reset para recriar.")
+        generate(args.scale, args.seed)
+
+
+if __name__ == "__main__":
+    main()
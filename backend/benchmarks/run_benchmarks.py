@@ -0,0 +1,506 @@
+"""Benchmark de todas as rotas principais, pelo test client do Flask e por um gunicorn local.
+
+Uso (a partir de backend/):
+    python benchmarks/run_benchmarks.py [--scale small|medium|full] [--database-url URL]
+                                        [--targets test_client,gunicorn] [--requests 200]
+                                        [--output resultado.json] [--only orders_page,login]
+    python benchmarks/run_benchmarks.py --compare antes.json depois.json
+
+Sem --database-url usa um arquivo SQLite no diretório temporário, gerado na primeira execução
+por generate_data.py (mesma escala e semente = mesmos dados). Para PostgreSQL, aponte para um
+banco local vazio. Não usa rede além de 127.0.0.1.
+
+Para cada rota mede percentis de latência, vazão e códigos de resposta. Rotas de importação,
+exportação e relatórios em segundo plano são medidas de ponta a ponta (POST, acompanhamento
+do job e download). O pico de memória (RSS) é o do processo do benchmark no test client e o
+de cada processo do gunicorn. O JSON sai com chaves ordenadas, para ser comparado entre
+commits com --compare (ou com diff).
+"""
+import argparse
+import io
+import csv
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from generate_data import SCALES, BENCH_USER, FIRST, SECOND, END_DATE
+
+FINISHED_JOB_STATUSES = ("succeeded", "failed", "cancelled")
+JOB_POLL_SECONDS = 0.05
+# Tokens longos: uma rodada completa não pode esbarrar na expiração do access token. O relatório
+# de vendas do último mês passa do limite do GET na escala full; o cenário mede o PDF, não o 413
+BENCH_ENV = {"SECRET_KEY": "bench", "AUTH_REQUIRED": "1", "ACCESS_TOKEN_TTL": "86400", "ORDER_WEBHOOK_URL": "",
+             "REPORT_SYNC_MAX_ROWS": "1000000"}
+
+
+# --- Cenários ---
+class Scenario:
+    """Uma rota a medir. `path` pode ser uma função (rng, dataset) -> caminho, para variar ids e termos.
+
+    Cenários `heavy` (login com KDF, jobs, PDFs) usam --heavy-requests em vez de --requests.
+    """
+
+    def __init__(self, name, method, path, body=None, content_type=None, job=False, heavy=False, auth=True):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.content_type = content_type
+        self.job = job
+        self.heavy = heavy or job
+        self.auth = auth
+
+    def build(self, rng, dataset):
+        path = self.path(rng, dataset) if callable(self.path) else self.path
+        # Termos com acento e espaço: a linha de requisição HTTP precisa ser ASCII
+        path = quote(path, safe="/?&=:-_.")
+        body = self.body(rng, dataset) if callable(self.body) else self.body
+        return path, body
+
+
+def _search_term(rng, dataset):
+    word = rng.choice(FIRST + SECOND).split()[0].lower()
+    return word[:rng.choice([2, 3, 4, len(word)])]
+
+
+def _clients_csv(rng, dataset, rows=1000):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["Nome", "Pessoa de Contato", "Telefone", "Email", "CNPJ"])
+    for n in range(rows):
+        writer.writerow([f"Importado {rng.randrange(10**9)} {n}", "Contato", "(11) 3333-4444",
+                         f"importado{n}@exemplo.com.br", f"99.{n:03d}.000/0001-00"])
+    return out.getvalue().encode("utf-8")
+
+
+def _multipart(filename, content):
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: text/csv\r\n\r\n").encode("utf-8") + content + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+_LAST_MONTH = f"{END_DATE:%Y-%m}-01"
+_YEAR_START = f"{END_DATE.year}-01"
+
+SCENARIOS = [
+    Scenario("login", "POST", "/api/login",
+             body=json.dumps({"username": BENCH_USER[0], "password": BENCH_USER[1]}).encode("utf-8"),
+             content_type="application/json", heavy=True, auth=False),
+    Scenario("clients_list", "GET", "/api/clients"),
+    Scenario("clients_page", "GET", "/api/clients?limit=50&sort=name"),
+    Scenario("products_list", "GET", "/api/products"),
+    Scenario("orders_page", "GET", "/api/orders?limit=100&sort=created_at&order=desc"),
+    Scenario("orders_filtered", "GET", f"/api/orders?limit=100&status=Aguardando&from={_LAST_MONTH}"),
+    Scenario("order_detail", "GET", lambda rng, d: f"/api/orders/{rng.randrange(1, d['orders'] + 1)}"),
+    Scenario("pedidos_page", "GET", "/api/pedidos?limit=100&sort=value&order=desc"),
+    Scenario("users_list", "GET", "/api/users"),
+    Scenario("dashboard_sales", "GET", f"/api/dashboard/sales_by_month?from={_YEAR_START}&breakdown=status"),
+    Scenario("dashboard_low_stock", "GET", "/api/dashboard/low_stock_products"),
+    Scenario("search_clients", "GET", lambda rng, d: f"/api/search?type=client&q={_search_term(rng, d)}"),
+    Scenario("search_products", "GET", lambda rng, d: f"/api/search?type=product&q=chapa {rng.randrange(100)}"),
+    Scenario("cutting_plan", "GET", lambda rng, d: "/api/cutting-plans?" + "&".join(
+        f"order_id={rng.randrange(1, d['orders'] + 1)}" for _ in range(200)), heavy=True),
+    Scenario("report_sales_pdf", "GET", f"/api/reports/sales?from={_LAST_MONTH}", heavy=True),
+    Scenario("import_clients", "POST", "/api/clients/import?dry_run=1", body=_clients_csv,
+             content_type="multipart", job=True),
+    Scenario("export_clients", "POST", "/api/clients/export", job=True),
+    Scenario("export_orders", "POST", f"/api/orders/export?from={_LAST_MONTH}", job=True),
+]
+
+
+# --- Clientes HTTP (mesma interface para test client e gunicorn) ---
+class TestClientDriver:
+    name = "test_client"
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None, headers=None):
+        response = self.client.open(path, method=method, data=body, headers=headers or {})
+        return response.status_code, response.headers, response.get_data()
+
+
+class HttpDriver:
+    """Uma conexão keep-alive por thread com o gunicorn local."""
+    name = "gunicorn"
+
+    def __init__(self, port):
+        import http.client
+        self._connect = lambda: http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        for attempt in (1, 2):
+            connection = getattr(self._local, "connection", None) or self._connect()
+            self._local.connection = connection
+            try:
+                connection.request(method, path, body=body, headers=headers or {})
+                response = connection.getresponse()
+                return response.status, response.headers, response.read()
+            except (ConnectionError, OSError):
+                # Worker fechou a conexão keep-alive: reconecta uma vez
+                connection.close()
+                self._local.connection = None
+                if attempt == 2:
+                    raise
+
+
+# --- Execução ---
+def login(driver):
+    status, _, body = driver.request("POST", "/api/login", json.dumps(
+        {"username": BENCH_USER[0], "password": BENCH_USER[1]}).encode("utf-8"), {"Content-Type": "application/json"})
+    if status != 200:
+        raise SystemExit(f"Login do usuário de benchmark falhou ({status}): {body[:200]!r}")
+    return {"Authorization": f"Bearer {json.loads(body)['access_token']}"}
+
+
+def run_job(driver, method, path, body, headers):
+    """POST do job, acompanhamento até terminar e download do resultado. Devolve o status final."""
+    status, _, response = driver.request(method, path, body, headers)
+    if status != 202:
+        return status
+    job = json.loads(response)
+    while job["status"] not in FINISHED_JOB_STATUSES:
+        time.sleep(JOB_POLL_SECONDS)
+        status, _, response = driver.request("GET", job["status_url"], None, headers)
+        if status != 200:
+            return status
+        job = json.loads(response)
+    if job["status"] != "succeeded":
+        return 500
+    if job["download_url"]:
+        status, _, _ = driver.request("GET", job["download_url"], None, headers)
+    return status
+
+
+def call(driver, scenario, rng, dataset, auth_headers):
+    path, body = scenario.build(rng, dataset)
+    headers = dict(auth_headers) if scenario.auth else {}
+    if scenario.content_type == "multipart":
+        body, content_type = _multipart("clientes.csv", body)
+        headers["Content-Type"] = content_type
+    elif scenario.content_type:
+        headers["Content-Type"] = scenario.content_type
+    if scenario.job:
+        return run_job(driver, scenario.method, path, body, headers)
+    return driver.request(scenario.method, path, body, headers)[0]
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(samples, statuses, wall):
+    ordered = sorted(samples)
+    ms = lambda seconds: round(seconds * 1e3, 3)
+    return {
+        "requests": len(samples),
+        "errors": sum(n for status, n in statuses.items() if status >= 400),
+        "status_codes": {str(status): n for status, n in sorted(statuses.items())},
+        "mean_ms": ms(statistics.mean(ordered)),
+        "p50_ms": ms(percentile(ordered, 0.50)), "p90_ms": ms(percentile(ordered, 0.90)),
+        "p95_ms": ms(percentile(ordered, 0.95)), "p99_ms": ms(percentile(ordered, 0.99)),
+        "max_ms": ms(ordered[-1]),
+        "throughput_rps": round(len(samples) / wall, 2) if wall else None,
+    }
+
+
+def run_scenario(driver, scenario, count, warmup, concurrency, dataset, auth_headers, seed):
+    rng = random.Random(f"{seed}:{scenario.name}")
+    for _ in range(warmup):
+        call(driver, scenario, rng, dataset, auth_headers)
+    samples, statuses = [], Counter()
+    lock = threading.Lock()
+    remaining = [count]
+
+    def worker():
+        local_rng = random.Random(f"{seed}:{scenario.name}:{threading.get_ident()}")
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            status = call(driver, scenario, local_rng, dataset, auth_headers)
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples.append(elapsed)
+                statuses[status] += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, statuses, time.perf_counter() - start)
+
+
+def run_target(driver, scenarios, args, dataset, concurrency, log):
+    auth_headers = login(driver)
+    results = {}
+    for scenario in scenarios:
+        count = args.heavy_requests if scenario.heavy else args.requests
+        warmup = 1 if scenario.heavy else args.warmup
+        results[scenario.name] = run_scenario(driver, scenario, count, warmup, concurrency,
+                                              dataset, auth_headers, args.seed)
+        r = results[scenario.name]
+        log(f"  {scenario.name:22s} p50 {r['p50_ms']:9.2f} ms  p95 {r['p95_ms']:9.2f} ms  "
+            f"{r['throughput_rps']:8.1f} req/s  erros {r['errors']}")
+    return results
+
+
+# --- Memória ---
+def _proc_peak_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+def _children(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        children.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    return children
+
+
+def self_peak_rss_mb():
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# --- Alvos ---
+def make_config(args, job_dir, report_dir):
+    return {
+        "SQLALCHEMY_DATABASE_URI": args.database_url, "SECRET_KEY": BENCH_ENV["SECRET_KEY"],
+        "AUTH_REQUIRED": True, "ACCESS_TOKEN_TTL": int(BENCH_ENV["ACCESS_TOKEN_TTL"]),
+        "HTTP_CACHE_BACKEND": args.http_cache, "JOB_DIR": job_dir, "REPORT_CACHE_DIR": report_dir,
+        "ORDER_WEBHOOK_URL": None, "REPORT_SYNC_MAX_ROWS": int(BENCH_ENV["REPORT_SYNC_MAX_ROWS"]),
+    }
+
+
+def bench_test_client(scenarios, args, dataset, workdir, log):
+    from app import create_app
+    app = create_app(make_config(args, os.path.join(workdir, "jobs"), os.path.join(workdir, "reports")))
+    log("test_client (em processo, sequencial):")
+    results = run_target(TestClientDriver(app), scenarios, args, dataset, 1, log)
+    return {"concurrency": 1, "peak_rss_mb": {"benchmark_process": self_peak_rss_mb()}, "scenarios": results}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(driver, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("gunicorn terminou ao iniciar; veja o log em --workdir")
+        try:
+            if driver.request("GET", "/healthz")[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit("gunicorn não respondeu em /healthz a tempo")
+
+
+def bench_gunicorn(scenarios, args, dataset, workdir, log):
+    port = _free_port()
+    env = {
+        **os.environ, **BENCH_ENV,
+        "DATABASE_URL": args.database_url, "HTTP_CACHE_BACKEND": args.http_cache,
+        "JOB_DIR": os.path.join(workdir, "jobs"), "REPORT_CACHE_DIR": os.path.join(workdir, "reports"),
+        "GUNICORN_BIND": f"127.0.0.1:{port}", "GUNICORN_WORKERS": str(args.gunicorn_workers),
+        "GUNICORN_THREADS": str(args.gunicorn_threads),
+        # Sem reciclagem de workers, para o pico de memória cobrir a rodada inteira; os jobs
+        # rodam nos próprios workers (em produção ficam em `flask run-jobs`)
+        "GUNICORN_MAX_REQUESTS": "0", "GUNICORN_ACCESSLOG": "/dev/null", "JOB_WORKERS": "2",
+    }
+    log_path = os.path.join(workdir, "gunicorn.log")
+    with open(log_path, "ab") as log_file:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:create_app()"],
+            cwd=BACKEND_DIR, env=env, stdout=log_file, stderr=log_file,
+        )
+    try:
+        driver = HttpDriver(port)
+        _wait_ready(driver, process)
+        log(f"gunicorn ({args.gunicorn_workers} workers x {args.gunicorn_threads} threads, "
+            f"{args.concurrency} clientes simultâneos):")
+        results = run_target(driver, scenarios, args, dataset, args.concurrency, log)
+        workers = [_proc_peak_rss_mb(pid) for pid in _children(process.pid)]
+        workers = [mb for mb in workers if mb is not None]
+        master = _proc_peak_rss_mb(process.pid)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    peak = {"master": master, "workers": sorted(workers, reverse=True),
+            "total": round((master or 0) + sum(workers), 1) if master is not None else None}
+    return {"concurrency": args.concurrency, "workers": args.gunicorn_workers, "threads": args.gunicorn_threads,
+            "peak_rss_mb": peak, "scenarios": results}
+
+
+TARGETS = {"test_client": bench_test_client, "gunicorn": bench_gunicorn}
+
+
+# --- Base de dados ---
+def prepare_database(args, log):
+    """Gera a base (em outro processo, para não pesar no RSS medido) se ainda estiver vazia."""
+    from app import create_app
+    from database import db
+    from generate_data import counts
+    from migrations import upgrade
+    app = create_app({"SQLALCHEMY_DATABASE_URI": args.database_url, "SECRET_KEY": "bench",
+                      "HTTP_CACHE_BACKEND": "none", "JOB_WORKERS": 0})
+    with app.app_context():
+        upgrade()
+        dataset = counts()
+    if args.regenerate or not dataset["orders"]:
+        log(f"Gerando a base '{args.scale}' em {args.database_url} ...")
+        subprocess.run([sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "generate_data.py"),
+                        "--database-url", args.database_url, "--scale", args.scale,
+                        "--seed", str(args.seed), "--reset"], check=True)
+        with app.app_context():
+            dataset = counts()
+    with app.app_context():
+        dataset["dialect"] = db.engine.dialect.name
+        db.engine.dispose()
+    return dataset
+
+
+def git_revision():
+    def git(*command):
+        try:
+            return subprocess.run(["git", *command], cwd=BACKEND_DIR, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+# --- Comparação ---
+def compare(base_path, new_path):
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"base: {base['meta']['git']['commit']}  nova: {new['meta']['git']['commit']}")
+    for target, result in new["targets"].items():
+        previous = base["targets"].get(target)
+        if not previous:
+            continue
+        rss = lambda peak: peak.get("total", peak.get("benchmark_process"))
+        print(f"\n{target}  (pico RSS {rss(previous['peak_rss_mb'])} -> {rss(result['peak_rss_mb'])} MiB)")
+        print(f"  {'cenário':22s} {'p50 ms':>19s} {'p95 ms':>19s} {'req/s':>17s}")
+        for name, current in result["scenarios"].items():
+            old = previous["scenarios"].get(name)
+            if not old:
+                continue
+            cells = []
+            for key in ("p50_ms", "p95_ms", "throughput_rps"):
+                change = (current[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+                cells.append(f"{current[key]:9.2f} ({change:+6.1f}%)")
+            print(f"  {name:22s} {cells[0]:>19s} {cells[1]:>19s} {cells[2]:>17s}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="Padrão: SQLite em <tmp>/bench-<escala>.db")
+    parser.add_argument("--regenerate", action="store_true", help="Recria a base mesmo se já existir.")
+    parser.add_argument("--targets", default="test_client,gunicorn")
+    parser.add_argument("--only", help="Cenários separados por vírgula (padrão: todos).")
+    parser.add_argument("--requests", type=int, default=200, help="Requisições por cenário.")
+    parser.add_argument("--heavy-requests", type=int, default=5, help="Requisições por cenário pesado (login, jobs, PDF).")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=4, help="Clientes simultâneos contra o gunicorn.")
+    parser.add_argument("--gunicorn-workers", type=int, default=2)
+    parser.add_argument("--gunicorn-threads", type=int, default=4)
+    parser.add_argument("--http-cache", choices=["none", "local"], default="none",
+                        help="Cache HTTP do servidor; 'none' mede o trabalho real de cada rota.")
+    parser.add_argument("--workdir", help="Arquivos de jobs, relatórios e log do gunicorn.")
+    parser.add_argument("--output", help="Arquivo JSON (padrão: bench-<commit>.json).")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NOVO"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    args.database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.gettempdir(), f'bench-{args.scale}.db')}"
+    targets = [t for t in args.targets.split(",") if t]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"alvos desconhecidos: {', '.join(sorted(unknown))}")
+    if "gunicorn" in targets and args.database_url in ("sqlite://", "sqlite:///:memory:"):
+        parser.error("o gunicorn roda em outros processos: use um banco em arquivo ou PostgreSQL")
+    scenarios = SCENARIOS
+    if args.only:
+        names = set(args.only.split(","))
+        scenarios = [s for s in SCENARIOS if s.name in names]
+        if len(scenarios) != len(names):
+            parser.error(f"cenários desconhecidos: {', '.join(sorted(names - {s.name for s in SCENARIOS}))}")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench-")
+    dataset = prepare_database(args, print)
+    print(f"Base: {dataset}")
+    revision = git_revision()
+    report = {
+        "meta": {
+            "git": revision, "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "dataset": {**dataset, "scale": args.scale, "seed": args.seed},
+            "options": {key: getattr(args, key) for key in (
+                "requests", "heavy_requests", "warmup", "concurrency", "gunicorn_workers",
+                "gunicorn_threads", "http_cache")},
+        },
+        "targets": {},
+    }
+    for target in targets:
+        report["targets"][target] = TARGETS[target](scenarios, args, dataset, workdir, print)
+
+    output = args.output or f"bench-{(revision['commit'] or 'local')[:10]}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True, ensure_ascii=False)
+        f.write("\n")
+    print(f"Resultados gravados em {output}")
+
+
+if __name__ == "__main__":
+    main()
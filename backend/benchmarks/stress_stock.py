@@ -0,0 +1,170 @@
+"""Teste de estresse das movimentações de estoque concorrentes.
+
+Uso (a partir de backend/): python benchmarks/stress_stock.py [--processes 2] [--threads 4]
+                            [--movements 2000] [--products 5] [--database-url postgresql://...]
+
+Vários processos, cada um com várias threads, fazem entradas e saídas aleatórias em poucos
+produtos (muita disputa pela mesma linha) usando move_stock, como a rota POST
+/api/products/<id>/stock_movements. No fim confere que nenhuma unidade se perdeu:
+  - estoque final = estoque inicial + soma das movimentações aceitas (contadas pelos workers);
+  - estoque = soma do livro razão em todos os produtos (check_stock_ledger);
+  - nenhum estoque negativo.
+Sai com código 1 se algo não bater. Sem --database-url usa um SQLite novo no diretório temporário.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INITIAL_STOCK = 50
+
+
+def make_app(database_url):
+    from app import create_app
+    return create_app({
+        "SQLALCHEMY_DATABASE_URI": database_url, "SECRET_KEY": "bench", "AUTH_REQUIRED": False,
+        "ORDER_WEBHOOK_URL": None, "HTTP_CACHE_BACKEND": "none", "JOB_WORKERS": 0, "METRICS_ENABLED": False,
+    })
+
+
+def setup(database_url, products):
+    from sqlalchemy import insert
+    from database import db, Product
+    from migrations import upgrade, schema_metadata
+    from stock import record_opening_balances
+    app = make_app(database_url)
+    with app.app_context():
+        db.drop_all()
+        schema_metadata.drop_all(db.engine)
+        upgrade()
+        db.session.execute(insert(Product), [{"name": f"Produto {n}", "price": 1.0, "stock": INITIAL_STOCK}
+                                             for n in range(products)])
+        record_opening_balances(db.session.connection())
+        db.session.commit()
+        ids = list(db.session.execute(db.select(Product.id)).scalars())
+        db.engine.dispose()
+    return ids
+
+
+def worker(database_url, product_ids, threads, movements, seed, results):
+    """Processo: `threads` threads, cada uma com `movements` movimentações."""
+    from sqlalchemy.exc import OperationalError
+    from database import db
+    from stock import StockError, move_stock
+    app = make_app(database_url)
+    lock = threading.Lock()
+    totals = {"accepted": 0, "rejected": 0, "retries": 0, "net": {pid: 0 for pid in product_ids}}
+
+    def run(thread_seed):
+        rng = random.Random(thread_seed)
+        accepted = rejected = retries = 0
+        net = {pid: 0 for pid in product_ids}
+        with app.app_context():
+            for _ in range(movements):
+                # Metade das movimentações no primeiro produto: a linha mais disputada
+                product_id = product_ids[0] if rng.random() < 0.5 else rng.choice(product_ids)
+                kind = "out" if rng.random() < 0.55 else "in"
+                quantity = rng.randint(1, 5)
+                delta = -quantity if kind == "out" else quantity
+                while True:
+                    try:
+                        move_stock(product_id, kind, delta, note="estresse")
+                        db.session.commit()
+                        accepted += 1
+                        net[product_id] += delta
+                    except StockError:
+                        db.session.rollback()
+                        rejected += 1
+                    except OperationalError:
+                        # SQLite: banco travado por outro escritor além do timeout; tenta de novo
+                        db.session.rollback()
+                        retries += 1
+                        continue
+                    break
+            db.session.remove()
+        with lock:
+            totals["accepted"] += accepted
+            totals["rejected"] += rejected
+            totals["retries"] += retries
+            for pid, value in net.items():
+                totals["net"][pid] += value
+
+    pool = [threading.Thread(target=run, args=(f"{seed}:{n}",)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(totals)
+
+
+def verify(database_url, product_ids, net):
+    from database import db, Product
+    from stock import check_stock_ledger
+    app = make_app(database_url)
+    with app.app_context():
+        stocks = dict(db.session.execute(db.select(Product.id, Product.stock)).all())
+        ledger_mismatches = check_stock_ledger()
+    problems = []
+    for pid in product_ids:
+        expected = INITIAL_STOCK + net[pid]
+        if stocks[pid] != expected:
+            problems.append(f"Produto {pid}: estoque {stocks[pid]}, esperado {expected}")
+        if stocks[pid] < 0:
+            problems.append(f"Produto {pid}: estoque negativo ({stocks[pid]})")
+    problems += [f"Produto {pid}: estoque {stock}, livro razão {total}" for pid, stock, total in ledger_mismatches]
+    return stocks, problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--movements", type=int, default=2000, help="Movimentações por thread.")
+    parser.add_argument("--products", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='stock-'), 'stress.db')}"
+    product_ids = setup(database_url, args.products)
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(database_url, product_ids, args.threads, args.movements,
+                                                      f"{args.seed}:{n}", results))
+                 for n in range(args.processes)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    totals = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+
+    accepted = sum(t["accepted"] for t in totals)
+    rejected = sum(t["rejected"] for t in totals)
+    retries = sum(t["retries"] for t in totals)
+    net = {pid: sum(t["net"][pid] for t in totals) for pid in product_ids}
+    stocks, problems = verify(database_url, product_ids, net)
+
+    attempts = accepted + rejected
+    print(f"{args.processes} processos x {args.threads} threads, {args.products} produtos, "
+          f"{attempts} movimentações em {elapsed:.1f} s")
+    print(f"aceitas {accepted}, recusadas por estoque insuficiente {rejected}, novas tentativas (banco travado) {retries}")
+    print(f"vazão: {attempts / elapsed:.0f} movimentações/s ({accepted / elapsed:.0f} aceitas/s)")
+    print(f"estoque final: {stocks}")
+    if problems:
+        print("FALHOU:")
+        for problem in problems:
+            print(f"  {problem}")
+        raise SystemExit(1)
+    print("OK: nenhuma unidade perdida; estoque = inicial + movimentações = livro razão")
+
+
+if __name__ == "__main__":
+    main()
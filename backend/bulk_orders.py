@@ -0,0 +1,279 @@
+from flask import current_app
+from sqlalchemy import select, insert, update, tuple_
+from werkzeug.datastructures import MultiDict
+from database import db, Client, Order
+from data_versions import bump_data_versions
+from orders import parse_order, new_order_number, OrderError
+from outbox import queue_session_events
+from pagination import filter_orders
+from rollup import add_delta, apply_deltas
+from serializers import ORDER, PEDIDO
+
+DEFAULTS = {
+    'ORDER_BATCH_MAX_SIZE': 1000,           # pedidos por POST /api/orders/batch e por transição de status
+    # Transições permitidas: "De>Para1,Para2;..." (nomes sem diferença de maiúsculas/minúsculas)
+    'ORDER_STATUS_TRANSITIONS': (
+        'Aguardando>Em produção,Cancelado;'
+        'Em produção>Pronto,Concluído,Aguardando,Cancelado;'
+        'Pronto>Concluído,Entregue,Em produção;'
+        'Concluído>Entregue;'
+        'Entregue>;'
+        'Cancelado>Aguardando'
+    ),
+}
+
+# Tentativas de gerar números de pedido livres antes de desistir
+NUMBER_ATTEMPTS = 5
+
+
+class BulkOrderError(ValueError):
+    """Lote rejeitado, com o status HTTP e os erros por item ({index, message})."""
+
+    def __init__(self, message, status=400, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.errors = errors or []
+
+
+def _key(status):
+    return status.strip().casefold()
+
+
+def parse_transitions(text):
+    """Lê o grafo de status da configuração: {status: (nome, {destinos})}, chaves sem caixa."""
+    graph = {}
+    for part in filter(None, (part.strip() for part in text.split(';'))):
+        source, _, targets = part.partition('>')
+        names = [name.strip() for name in targets.split(',') if name.strip()]
+        graph[_key(source)] = (source.strip(), {_key(name) for name in names})
+        for name in names:
+            graph.setdefault(_key(name), (name, set()))
+    return graph
+
+
+def _check_size(items, config):
+    limit = config['ORDER_BATCH_MAX_SIZE']
+    if not items:
+        raise BulkOrderError("Nenhum pedido informado")
+    if len(items) > limit:
+        raise BulkOrderError(f"No máximo {limit} pedidos por requisição")
+
+
+# --- Criação em lote ---
+def _taken_numbers(numbers):
+    return set(db.session.scalars(select(Order.order_number).where(Order.order_number.in_(numbers))))
+
+
+def _assign_numbers(orders, errors):
+    """Gera os números que faltam e confere todos contra o banco numa única consulta.
+
+    Números informados em duplicidade (no lote ou no banco) viram erro do item; números
+    gerados que colidirem com o banco são trocados e só eles são conferidos de novo.
+    """
+    owners = {}
+    for index, values in orders.items():
+        number = values.get('order_number')
+        if number is None:
+            continue
+        if number in owners:
+            errors.append({'index': index, 'message': f"Número {number} repetido no lote (item {owners[number]})"})
+        else:
+            owners[number] = index
+    generated = {index for index, values in orders.items() if values.get('order_number') is None}
+    pending, check = set(generated), list(owners)
+    for _ in range(NUMBER_ATTEMPTS):
+        for index in pending:
+            number = new_order_number()
+            while number in owners:
+                number = new_order_number()
+            orders[index]['order_number'] = number
+            owners[number] = index
+            check.append(number)
+        pending = set()
+        for number in _taken_numbers(check) if check else ():
+            index = owners[number]
+            if index in generated:
+                pending.add(index)
+            else:
+                errors.append({'index': index, 'message': f"Já existe um pedido com o número {number}"})
+        check = []
+        if not pending:
+            return
+    raise BulkOrderError("Não foi possível gerar números de pedido livres", 409)
+
+
+def create_orders(items, config):
+    """Cria todos os pedidos do lote numa única transação (da sessão; quem chama faz o commit).
+
+    Valida tudo antes de gravar (inclusive o status, contra ORDER_STATUS_TRANSITIONS): se algum
+    item tiver erro nada é criado e BulkOrderError traz os erros por item. Clientes e números são conferidos com uma consulta cada, e os pedidos
+    entram num único INSERT com RETURNING (rollup, versão e outbox na mesma transação).
+    """
+    if not isinstance(items, list):
+        raise BulkOrderError("Informe os pedidos em 'orders' (lista)")
+    _check_size(items, config)
+    orders, errors = {}, []
+    for index, item in enumerate(items):
+        try:
+            orders[index] = parse_order(item)
+        except OrderError as e:
+            errors.append({'index': index, 'message': str(e)})
+    # Status informado precisa existir no grafo de transições; grava o nome como está na configuração
+    graph = parse_transitions(config['ORDER_STATUS_TRANSITIONS'])
+    for index, values in orders.items():
+        status = values.get('status')
+        if status is None:
+            continue
+        if _key(status) not in graph:
+            known = ', '.join(name for name, _ in graph.values())
+            errors.append({'index': index, 'message': f"Status inválido: {status}. Use um de: {known}"})
+        else:
+            values['status'] = graph[_key(status)][0]
+    client_ids = {values['client_id'] for values in orders.values()}
+    clients = dict(db.session.execute(select(Client.id, Client.name).where(Client.id.in_(client_ids))).all()) \
+        if client_ids else {}
+    for index, values in orders.items():
+        if values['client_id'] not in clients:
+            errors.append({'index': index, 'message': "Cliente não encontrado"})
+    _assign_numbers(orders, errors)
+    if errors:
+        errors.sort(key=lambda error: error['index'])
+        status = 409 if all(error['message'].startswith(("Já existe", "Número")) for error in errors) else 400
+        raise BulkOrderError(f"{len(errors)} pedido(s) com erro; nenhum pedido foi criado", status, errors)
+
+    # Mesmas chaves em todas as linhas (executemany); status vazio fica com o padrão do modelo
+    rows = [{field: values.get(field) for field in ('order_number', 'client_id', 'material', 'thickness', 'width',
+                                                   'length', 'quantity', 'value', 'observations')}
+            | {'status': values.get('status') or 'Aguardando'}
+            for values in (orders[index] for index in sorted(orders))]
+    connection = db.session.connection()
+    bump_data_versions(connection, ['orders'])
+    # Sem sort_by_parameter_order (no SQLite ele volta a um INSERT por linha): a ordem do
+    # lote é refeita pelo número do pedido, que é único
+    created = {row['order_number']: row for row in connection.execute(
+        insert(Order).returning(*Order.__table__.columns), rows
+    ).mappings()}
+    deltas, events, result = {}, [], []
+    for row in (created[values['order_number']] for values in rows):
+        values = dict(row, client_name=clients[row['client_id']])
+        add_delta(deltas, row['created_at'], row['status'], row['value'], 1)
+        events.append(('order.created', row['id'], PEDIDO.from_mapping(values)))
+        result.append(ORDER.from_mapping(values))
+    apply_deltas(connection, deltas)
+    queue_session_events(db.session, events)
+    return result
+
+
+# --- Transição de status em lote ---
+def _parse_ids(value, limit):
+    if not isinstance(value, list) or not value:
+        raise BulkOrderError("'ids' deve ser uma lista de ids de pedidos")
+    ids = []
+    for item in value:
+        if isinstance(item, bool):
+            raise BulkOrderError(f"Id de pedido inválido: {item}")
+        try:
+            ids.append(int(item))
+        except (TypeError, ValueError):
+            raise BulkOrderError(f"Id de pedido inválido: {item}")
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > limit:
+        raise BulkOrderError(f"No máximo {limit} pedidos por requisição")
+    return ids
+
+
+def parse_transition(data, config):
+    """Corpo de POST /api/orders/status: {"status", "ids": [...]} ou {"status", "filter": {...}}.
+
+    O filtro usa os mesmos parâmetros da listagem (status, client_id, from, to).
+    Levanta PaginationError para filtros inválidos.
+    """
+    if not isinstance(data, dict):
+        raise BulkOrderError("Corpo da requisição inválido")
+    graph = parse_transitions(config['ORDER_STATUS_TRANSITIONS'])
+    target = data.get('status')
+    if not isinstance(target, str) or _key(target) not in graph:
+        known = ', '.join(name for name, _ in graph.values())
+        raise BulkOrderError(f"Status de destino inválido: {target}. Use um de: {known}")
+    if ('ids' in data) == ('filter' in data):
+        raise BulkOrderError("Informe 'ids' ou 'filter'")
+    limit = config['ORDER_BATCH_MAX_SIZE']
+    if 'ids' in data:
+        return graph, target, _parse_ids(data['ids'], limit), None
+    if not isinstance(data['filter'], dict):
+        raise BulkOrderError("'filter' deve ser um objeto")
+    args = MultiDict({key: value for key, value in data['filter'].items() if value not in (None, '', [])})
+    if not args:
+        raise BulkOrderError("'filter' vazio: informe ao menos um filtro")
+    # Valida o filtro antes de começar a transação
+    filter_orders(Order.query, args)
+    return graph, target, None, args
+
+
+def transition_orders(graph, target, ids=None, args=None, limit=None):
+    """Aplica a transição de status aos pedidos com um único UPDATE (na transação da sessão).
+
+    Lê o status atual dos pedidos (uma consulta), separa os que podem ir para `target`
+    pelo grafo e atualiza só esses, com a condição (id, status lido): um pedido alterado
+    por outra requisição no meio do caminho fica de fora e aparece como 'conflict'.
+    Retorna o resultado por id, na ordem dos ids informados (ou por id, com filtro).
+    """
+    name, _ = graph[_key(target)]
+    query = PEDIDO.select(Order.query)
+    if ids is not None:
+        query = query.filter(Order.id.in_(ids))
+    else:
+        limit = limit or current_app.config['ORDER_BATCH_MAX_SIZE']
+        query = filter_orders(query, args).order_by(Order.id).limit(limit + 1)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        query = query.with_for_update(of=Order)
+    found = {row.id: row for row in query}
+    if ids is None:
+        if len(found) > limit:
+            raise BulkOrderError(f"O filtro seleciona mais de {limit} pedidos; refine o filtro")
+        ids = sorted(found)
+
+    results, eligible = {}, {}
+    for order_id in ids:
+        row = found.get(order_id)
+        if row is None:
+            results[order_id] = {'id': order_id, 'result': 'not_found'}
+            continue
+        current = _key(row.status)
+        result = {'id': order_id, 'from': row.status, 'to': name}
+        if current == _key(name):
+            result['result'] = 'unchanged'
+        elif current not in graph or _key(name) not in graph[current][1]:
+            result['result'] = 'invalid_transition'
+            result['message'] = f"Transição de '{row.status}' para '{name}' não permitida"
+        else:
+            result['result'] = 'updated'
+            eligible[order_id] = row
+        results[order_id] = result
+
+    if eligible:
+        connection = db.session.connection()
+        bump_data_versions(connection, ['orders'])
+        updated = connection.execute(
+            update(Order)
+            .where(tuple_(Order.id, Order.status).in_([(order_id, row.status) for order_id, row in eligible.items()]))
+            .values(status=name)
+            .returning(Order.id)
+        ).scalars().all()
+        deltas, events = {}, []
+        for order_id in updated:
+            row = eligible[order_id]
+            add_delta(deltas, row.created_at, row.status, row.value, -1)
+            add_delta(deltas, row.created_at, name, row.value, 1)
+            events.append(('order.updated', order_id, PEDIDO.from_mapping(dict(row._mapping, status=name))))
+        for order_id in eligible.keys() - set(updated):
+            results[order_id]['result'] = 'conflict'
+            results[order_id]['message'] = "Pedido alterado por outra requisição; tente de novo"
+        apply_deltas(connection, {key: delta for key, delta in deltas.items() if delta != (0.0, 0)})
+        queue_session_events(db.session, sorted(events, key=lambda event: event[1]))
+    return [results[order_id] for order_id in ids]
+
+
+def init_bulk_orders(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
@@ -0,0 +1,221 @@
+import os
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, has_app_context, request, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+from data_versions import data_versions
+
+# Entidades com versão em data_version (incrementada na transação de cada escrita, ver
+# data_versions.py); cada rota de leitura declara de quais depende.
+ENTITIES = ('users', 'clients', 'products', 'orders')
+
+DEFAULTS = {
+    'HTTP_CACHE_BACKEND': 'local',          # local | redis | none
+    'HTTP_CACHE_REDIS_URL': 'redis://localhost:6379/0',
+    'HTTP_CACHE_MAX_ENTRIES': 512,
+    'HTTP_CACHE_MAX_BYTES': 64 * 1024 * 1024,
+    'HTTP_CACHE_MAX_ENTRY_BYTES': 4 * 1024 * 1024,
+    'HTTP_CACHE_TTL': 300,                  # segundos (só no backend redis; o local usa LRU)
+    'HTTP_CACHE_VERSION_TTL': 2,            # segundos que as versões lidas do banco são reaproveitadas
+}
+
+
+class LocalCacheBackend:
+    """Payloads em memória do processo, com LRU limitado por entradas e bytes.
+
+    A chave inclui as versões das entidades. Cada worker guarda as versões lidas do banco por
+    `version_ttl` segundos (as escritas do próprio processo as descartam no commit), então
+    uma escrita feita por outro processo aparece aqui em até `version_ttl` segundos.
+    """
+
+    def __init__(self, max_entries, max_bytes, max_entry_bytes, version_ttl):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.version_ttl = version_ttl
+        self._entries = OrderedDict()
+        self._size = 0
+        self._versions = {}     # entidade -> (expira em, versão)
+        self._forgotten = 0     # descartes até agora: leitura anterior a um descarte não é guardada
+        self._lock = threading.Lock()
+
+    def versions(self, entities, load):
+        now = time.monotonic()
+        cached = [self._versions.get(entity) for entity in entities]
+        if all(entry is not None and entry[0] > now for entry in cached):
+            return [version for _, version in cached]
+        forgotten = self._forgotten
+        versions = load(entities)
+        with self._lock:
+            if forgotten == self._forgotten:
+                for entity, version in zip(entities, versions):
+                    self._versions[entity] = (now + self.version_ttl, version)
+        return versions
+
+    def forget_versions(self, entities):
+        with self._lock:
+            self._forgotten += 1
+            for entity in entities:
+                self._versions.pop(entity, None)
+
+    def get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+            return payload
+
+    def set(self, key, payload):
+        if len(payload) > self.max_entry_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = payload
+            self._size += len(payload)
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+class RedisCacheBackend:
+    """Payloads e versões compartilhados entre workers/processos via Redis (dependência opcional).
+
+    As escritas de qualquer processo com este backend apagam as versões no commit; o
+    `version_ttl` só limita o atraso para escritas feitas por fora (ex.: SQL manual).
+    """
+
+    PREFIX = 'gbl:http-cache:'
+
+    def __init__(self, url, ttl, max_entry_bytes, version_ttl):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("HTTP_CACHE_BACKEND=redis requer o pacote 'redis' (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.version_ttl = version_ttl
+
+    def versions(self, entities, load):
+        keys = [self.PREFIX + 'version:' + entity for entity in entities]
+        cached = self.client.mget(keys)
+        if all(version is not None for version in cached):
+            return [int(version) for version in cached]
+        versions = load(entities)
+        pipeline = self.client.pipeline()
+        for key, version in zip(keys, versions):
+            pipeline.set(key, version, ex=self.version_ttl)
+        pipeline.execute()
+        return versions
+
+    def forget_versions(self, entities):
+        self.client.delete(*[self.PREFIX + 'version:' + entity for entity in entities])
+
+    def get(self, key):
+        return self.client.get(self.PREFIX + 'entry:' + key)
+
+    def set(self, key, payload):
+        if len(payload) <= self.max_entry_bytes:
+            self.client.set(self.PREFIX + 'entry:' + key, payload, ex=self.ttl)
+
+
+def _setting(app, key):
+    value = app.config.get(key, os.environ.get(key, DEFAULTS[key]))
+    return value if isinstance(DEFAULTS[key], str) else int(value)
+
+
+def init_cache(app):
+    backend = _setting(app, 'HTTP_CACHE_BACKEND')
+    if backend == 'none':
+        cache = None
+    elif backend == 'redis':
+        cache = RedisCacheBackend(_setting(app, 'HTTP_CACHE_REDIS_URL'), _setting(app, 'HTTP_CACHE_TTL'),
+                                  _setting(app, 'HTTP_CACHE_MAX_ENTRY_BYTES'), _setting(app, 'HTTP_CACHE_VERSION_TTL'))
+    elif backend == 'local':
+        cache = LocalCacheBackend(_setting(app, 'HTTP_CACHE_MAX_ENTRIES'), _setting(app, 'HTTP_CACHE_MAX_BYTES'),
+                                  _setting(app, 'HTTP_CACHE_MAX_ENTRY_BYTES'), _setting(app, 'HTTP_CACHE_VERSION_TTL'))
+    else:
+        raise ValueError(f"HTTP_CACHE_BACKEND inválido: {backend}")
+    app.extensions['http_cache'] = cache
+    return cache
+
+
+def _check_entities(entities):
+    unknown = set(entities) - set(ENTITIES)
+    if unknown:
+        raise ValueError(f"Entidades de cache desconhecidas: {', '.join(sorted(unknown))}")
+
+
+def get_cache():
+    return current_app.extensions.get('http_cache')
+
+
+# Versões incrementadas (bump_data_versions anota na conexão) são descartadas do cache quando a
+# conexão volta ao pool: o evento de commit do SQLAlchemy roda antes do COMMIT no banco, e uma
+# leitura entre os dois guardaria a versão antiga.
+@event.listens_for(Engine, 'commit')
+def _versions_committed(connection):
+    entities = connection.info.pop('bumped_entities', None)
+    if entities:
+        connection.info.setdefault('committed_entities', set()).update(entities)
+
+
+@event.listens_for(Engine, 'rollback')
+def _versions_rolled_back(connection):
+    connection.info.pop('bumped_entities', None)
+
+
+@event.listens_for(Pool, 'checkin')
+def _forget_versions(dbapi_connection, connection_record):
+    if connection_record is None:
+        return
+    connection_record.info.pop('bumped_entities', None)
+    entities = connection_record.info.pop('committed_entities', None)
+    if entities and has_app_context() and get_cache() is not None:
+        get_cache().forget_versions(sorted(entities))
+
+
+def cached(*entities):
+    """Cache de GET com ETag forte derivada das versões das entidades e da URL.
+
+    As versões vêm da tabela data_version, então valem para todos os workers e para escritas
+    feitas fora do processo web (jobs, CLI); o backend as guarda por HTTP_CACHE_VERSION_TTL
+    segundos. Com If-None-Match igual responde 304 sem rodar a view nem consultar o banco;
+    senão tenta o payload serializado do cache antes de chamar a view.
+    """
+    _check_entities(entities)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            if cache is None:
+                return view(*args, **kwargs)
+            versions = cache.versions(entities, lambda names: data_versions(*names))
+            query = '&'.join(sorted(f"{k}={v}" for k, v in request.args.items(multi=True)))
+            etag = hashlib.sha1(f"{request.path}?{query}|{'|'.join(map(str, versions))}".encode('utf-8')).hexdigest()
+
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                payload = cache.get(etag)
+                if payload is not None:
+                    response = Response(payload, mimetype='application/json')
+                else:
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or not response.is_json:
+                        return response
+                    cache.set(etag, response.get_data())
+            response.set_etag(etag)
+            # O navegador guarda a resposta mas revalida sempre (recebendo 304 se nada mudou)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,247 @@
+import base64
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, delete, and_, or_
+from database import db, Client, Product, Order, Tombstone
+from data_versions import CHANGE_TRACKED, data_versions
+from serializers import CLIENT, PRODUCT, ORDER, PEDIDO
+
+DEFAULTS = {
+    'CHANGES_MAX_WAIT': 25,                 # segundos máximos de um long-poll (abaixo do timeout do gunicorn)
+    'CHANGES_POLL_INTERVAL': 1.0,           # segundos entre conferências das versões durante a espera
+    # Long-polls simultâneos por processo: cada um ocupa uma thread durante a espera (o
+    # gunicorn.conf.py reserva uma por long-poll além das threads das requisições comuns).
+    # Acima do limite a resposta volta na hora, com retry_after para o cliente consultar depois.
+    'CHANGES_MAX_WAITERS': 32,
+    'CHANGES_BUSY_RETRY': 5,
+    'CHANGES_TOMBSTONE_DAYS': 30,           # exclusões guardadas; cursores mais antigos recarregam as listas
+}
+
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 1000
+
+# Nome no feed -> (entidade do cursor, modelo, serializer)
+FEEDS = {
+    'clients': ('clients', Client, CLIENT),
+    'products': ('products', Product, PRODUCT),
+    'orders': ('orders', Order, ORDER),
+    # Pedidos com os nomes de campos da tela de pedidos (/api/pedidos)
+    'pedidos': ('orders', Order, PEDIDO),
+}
+
+# Ordem das alterações dentro da mesma versão: exclusões antes das gravações, porque o SQLite
+# pode reutilizar o id de uma linha excluída. END marca a versão inteira como entregue.
+DELETED, UPSERTED, END = 0, 1, 2
+
+
+class ChangesError(ValueError):
+    """Parâmetro inválido do feed de alterações, com o status HTTP (410 para cursor expirado)."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# --- Cursor: posição (versão, ordem, id) por entidade ---
+def encode_cursor(positions):
+    payload = json.dumps({"t": int(time.time()), "p": positions}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, retention_days):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        issued = float(payload["t"])
+        positions = {entity: [int(value) for value in position] for entity, position in payload["p"].items()
+                     if entity in CHANGE_TRACKED}
+        if any(len(position) != 3 for position in positions.values()):
+            raise ValueError
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise ChangesError("Cursor inválido")
+    # Tombstones mais antigos já podem ter sido apagados: o cliente não saberia das exclusões
+    if time.time() - issued > retention_days * 86400:
+        raise ChangesError("Cursor expirado: recarregue as listas e peça um novo cursor (sem 'since')", 410)
+    return positions
+
+
+def parse_changes_args(args, max_wait):
+    """entities, since, limit e wait da query string."""
+    names = [name.strip() for name in args.get("entities", "clients,products,orders").split(",") if name.strip()]
+    unknown = [name for name in names if name not in FEEDS]
+    if unknown or not names:
+        raise ChangesError(f"Entidade inválida: '{', '.join(unknown)}'. Permitidas: {', '.join(FEEDS)}")
+    entities = [FEEDS[name][0] for name in names]
+    if len(set(entities)) != len(entities):
+        raise ChangesError("Use 'orders' ou 'pedidos', não os dois")
+    try:
+        limit = int(args.get("limit", DEFAULT_LIMIT))
+        wait = float(args.get("wait", 0))
+    except ValueError:
+        raise ChangesError("'limit' e 'wait' devem ser números")
+    if limit < 1 or limit > MAX_LIMIT:
+        raise ChangesError(f"'limit' deve estar entre 1 e {MAX_LIMIT}")
+    return names, args.get("since"), limit, min(max(wait, 0), max_wait)
+
+
+# --- Leitura ---
+def _after(version, key, rank, position):
+    """(versão, ordem, id) > posição, para uma fonte cuja ordem é fixa (`rank`)."""
+    value, position_rank, position_key = position
+    if rank > position_rank:
+        return version >= value
+    if rank < position_rank:
+        return version > value
+    return or_(version > value, and_(version == value, key > position_key))
+
+
+def _entity_changes(name, position, upper, limit):
+    entity, model, serializer = FEEDS[name]
+    query = model.query.filter(_after(model.change_version, model.id, UPSERTED, position),
+                               model.change_version <= upper)
+    rows = (serializer.select(query).add_columns(model.change_version)
+            .order_by(model.change_version, model.id).limit(limit).all())
+    deleted = db.session.execute(
+        select(Tombstone.id, Tombstone.row_id, Tombstone.version)
+        .where(Tombstone.entity == entity, _after(Tombstone.version, Tombstone.id, DELETED, position),
+               Tombstone.version <= upper)
+        .order_by(Tombstone.version, Tombstone.id).limit(limit)
+    ).all()
+    items = [((version, DELETED, tombstone_id), {"entity": name, "op": "delete", "id": row_id})
+             for tombstone_id, row_id, version in deleted]
+    items += [((row[-1], UPSERTED, row.id), {"entity": name, "op": "upsert", "data": serializer.row(row)})
+              for row in rows]
+    items.sort(key=lambda item: item[0])
+    return items
+
+
+def read_changes(names, positions, limit):
+    """Alterações depois das posições do cursor, até `limit` no total.
+
+    Cada página vai só até a versão atual de cada entidade, lida antes das consultas: uma versão
+    visível garante que todas as anteriores já foram confirmadas (data_version fica travada até
+    o commit de quem a incrementou), então nenhuma alteração fica para trás do cursor.
+    """
+    entities = [FEEDS[name][0] for name in names]
+    upper = dict(zip(entities, data_versions(*entities)))
+    positions = dict(positions)
+    changes = []
+    has_more = False
+    for name, entity in zip(names, entities):
+        budget = limit - len(changes)
+        if budget <= 0:
+            has_more = True
+            break
+        position = positions.get(entity, [0, DELETED - 1, 0])
+        items = _entity_changes(name, position, upper[entity], budget + 1)
+        if len(items) > budget:
+            has_more = True
+            items = items[:budget]
+            positions[entity] = list(items[-1][0])
+        else:
+            positions[entity] = [max(upper[entity], position[0]), END, 0]
+        changes.extend(change for _, change in items)
+    return changes, positions, has_more
+
+
+def current_positions():
+    """Posições no fim de todas as entidades (cursor inicial, antes de carregar as listas)."""
+    return {entity: [version, END, 0] for entity, version in zip(CHANGE_TRACKED, data_versions(*CHANGE_TRACKED))}
+
+
+# --- Long-poll ---
+class ChangeWaiters:
+    """Long-polls em espera no processo. As versões são lidas do banco no máximo uma vez por
+    intervalo e compartilhadas entre as esperas, então centenas de painéis abertos custam uma
+    consulta por segundo por processo, não uma por painel."""
+
+    def __init__(self, max_waiters, interval):
+        self.max_waiters = max_waiters
+        self.interval = interval
+        self.waiting = 0
+        self._lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._versions = {}
+        self._read_at = 0.0
+
+    def acquire(self):
+        with self._lock:
+            if self.waiting >= self.max_waiters:
+                return False
+            self.waiting += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.waiting -= 1
+
+    def versions(self):
+        with self._read_lock:
+            if time.monotonic() - self._read_at >= self.interval:
+                self._versions = dict(zip(CHANGE_TRACKED, data_versions(*CHANGE_TRACKED)))
+                db.session.rollback()
+                self._read_at = time.monotonic()
+            return self._versions
+
+    def wait(self, positions, entities, deadline):
+        """Dorme até alguma entidade passar da posição do cursor ou o prazo acabar."""
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.interval, remaining))
+            versions = self.versions()
+            if any(versions.get(entity, 0) > positions[entity][0] for entity in entities):
+                return True
+
+
+def poll_changes(names, since, limit, wait):
+    """Corpo da resposta de /api/changes: alterações, novo cursor e se há mais páginas.
+
+    Sem `since` devolve só o cursor atual: o cliente o pede antes de carregar as listas e
+    depois acompanha as alterações a partir dele.
+    """
+    config = current_app.config
+    if not since:
+        return {"changes": [], "cursor": encode_cursor(current_positions()), "has_more": False, "retry_after": 0}
+    positions = decode_cursor(since, config['CHANGES_TOMBSTONE_DAYS'])
+    changes, positions, has_more = read_changes(names, positions, limit)
+    retry_after = 0
+    if not changes and not has_more and wait > 0:
+        waiters = get_change_waiters()
+        if waiters.acquire():
+            try:
+                # Sem segurar conexão do pool durante a espera
+                db.session.rollback()
+                entities = [FEEDS[name][0] for name in names]
+                deadline = time.monotonic() + wait
+                while not changes and waiters.wait(positions, entities, deadline):
+                    changes, positions, has_more = read_changes(names, positions, limit)
+                    db.session.rollback()
+            finally:
+                waiters.release()
+        else:
+            retry_after = config['CHANGES_BUSY_RETRY']
+    return {"changes": changes, "cursor": encode_cursor(positions), "has_more": has_more, "retry_after": retry_after}
+
+
+# --- Manutenção ---
+def purge_tombstones(connection, retention_days):
+    """Apaga registros de exclusão mais antigos que a validade dos cursores."""
+    limit = datetime.utcnow() - timedelta(days=retention_days)
+    return connection.execute(delete(Tombstone).where(Tombstone.deleted_at < limit)).rowcount
+
+
+def get_change_waiters():
+    return current_app.extensions['change_waiters']
+
+
+def init_changes(app):
+    for key, default in DEFAULTS.items():
+        app.config.setdefault(key, default)
+    app.extensions['change_waiters'] = ChangeWaiters(
+        int(app.config['CHANGES_MAX_WAITERS']), float(app.config['CHANGES_POLL_INTERVAL'])
+    )
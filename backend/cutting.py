@@ -0,0 +1,307 @@
+from flask import current_app
+from sqlalchemy import select
+from database import db, Order
+
+try:
+    import numpy as np
+except ImportError:  # dependência opcional: sem ela /api/cutting-plans responde 503
+    np = None
+
+DEFAULTS = {
+    'CUTTING_SHEETS': '3000x1500,3000x1200,2000x1000',     # chapas em estoque (mm), na ordem de preferência
+    'CUTTING_KERF': 3.0,                    # mm entre peças (largura do corte + margem)
+    'CUTTING_ALLOW_ROTATION': True,         # peças podem girar 90° (chapa sem sentido de laminação)
+    'CUTTING_OPEN_STATUSES': 'Aguardando,Em produção,Em Produção',
+    'CUTTING_MAX_PIECES': 20000,            # peças por plano (quantidade somada dos pedidos)
+}
+
+MAX_ORDER_IDS = 2000
+
+
+class CuttingPlanError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# --- Parâmetros ---
+def parse_sheet(text):
+    try:
+        width, length = (float(part.replace(',', '.')) for part in text.lower().split('x'))
+    except ValueError:
+        raise CuttingPlanError(f"Chapa inválida: '{text}' (use LARGURAxCOMPRIMENTO em mm, ex.: 3000x1500)")
+    if width <= 0 or length <= 0:
+        raise CuttingPlanError(f"Chapa inválida: '{text}'")
+    return width, length
+
+
+def parse_cutting_args(args, config):
+    """Lê order_id (repetível), status (repetível), sheet (repetível), kerf e rotate da query string."""
+    try:
+        order_ids = [int(value) for value in args.getlist('order_id')]
+    except ValueError:
+        raise CuttingPlanError("Valor inválido para 'order_id'")
+    if len(order_ids) > MAX_ORDER_IDS:
+        raise CuttingPlanError(f"No máximo {MAX_ORDER_IDS} pedidos por plano")
+    statuses = [s for s in args.getlist('status') if s] or [
+        s.strip() for s in config['CUTTING_OPEN_STATUSES'].split(',') if s.strip()
+    ]
+    sheets = [parse_sheet(text) for text in (args.getlist('sheet') or config['CUTTING_SHEETS'].split(','))]
+    try:
+        kerf = float(args.get('kerf', config['CUTTING_KERF']))
+    except ValueError:
+        raise CuttingPlanError(f"Valor inválido para 'kerf': {args.get('kerf')}")
+    if kerf < 0:
+        raise CuttingPlanError("'kerf' não pode ser negativo")
+    rotate = args.get('rotate')
+    allow_rotation = config['CUTTING_ALLOW_ROTATION'] if rotate is None else rotate.lower() in ('1', 'true', 'yes')
+    return order_ids, statuses, sheets, kerf, allow_rotation
+
+
+# --- Empacotamento (MaxRects) ---
+class SheetPacker:
+    """MaxRects com Best Short Side Fit sobre todas as chapas abertas de um grupo.
+
+    Os retângulos livres de todas as chapas ficam num único array (chapa, x, y, largura,
+    comprimento), então a escolha da posição de cada peça é uma operação vetorizada sobre
+    todas as chapas. Retângulos em que nenhuma peça restante cabe são descartados, o que
+    mantém o array pequeno mesmo com centenas de chapas fechadas.
+    """
+
+    def __init__(self, sheets, kerf, allow_rotation):
+        # O kerf é somado à peça e à chapa: entre duas peças sobra `kerf`, na borda não
+        self.sheets = sheets
+        self.kerf = kerf
+        self.allow_rotation = allow_rotation
+        self.free = np.empty((0, 5))
+        self.sheet_sizes = []
+        self._pruned_below = 0.0
+
+    def _open_sheet(self, width, length):
+        for w, l in self.sheets:
+            if (width <= w and length <= l) or (self.allow_rotation and length <= w and width <= l):
+                self.sheet_sizes.append((w, l))
+                sheet = [len(self.sheet_sizes) - 1, 0.0, 0.0, w + self.kerf, l + self.kerf]
+                self.free = np.vstack([self.free, sheet])
+                return
+
+    def _best(self, width, length):
+        free = self.free
+        best, best_score, rotated = -1, np.inf, False
+        for rotate, (w, l) in ((False, (width, length)), (True, (length, width))):
+            if rotate and (not self.allow_rotation or width == length):
+                continue
+            dw, dl = free[:, 3] - w, free[:, 4] - l
+            short = np.where((dw >= 0) & (dl >= 0), np.minimum(dw, dl), np.inf)
+            if not short.size:
+                continue
+            # Desempate pelo lado longo e, por fim, pela chapa mais antiga (argmin pega o primeiro)
+            score = short * 1e6 + np.maximum(dw, dl)
+            index = int(np.argmin(score))
+            if score[index] < best_score:
+                best, best_score, rotated = index, score[index], rotate
+        return best, rotated
+
+    def place(self, width, length, count, min_side):
+        """Posiciona até `count` peças iguais num bloco em grade dentro do retângulo livre
+        escolhido para uma delas; `min_side` é o menor lado entre as peças seguintes à
+        primeira do bloco. Retorna (chapa, xs, ys, girada) das peças posicionadas."""
+        w, l = width + self.kerf, length + self.kerf
+        index, rotated = self._best(w, l)
+        if index < 0:
+            self._open_sheet(width, length)
+            index, rotated = self._best(w, l)
+        if rotated:
+            w, l = l, w
+        sheet, x, y, free_w, free_l = self.free[index]
+        columns = min(count, int(free_w // w))
+        rows = min(count // columns, int(free_l // l))
+        # Só linhas completas: o que sobra do lote vai para o próximo retângulo livre
+        self._split(sheet, x, y, columns * w, rows * l, min_side + self.kerf)
+        grid_x, grid_y = np.meshgrid(np.arange(columns), np.arange(rows))
+        return int(sheet), x + grid_x.ravel() * w, y + grid_y.ravel() * l, rotated
+
+    def _split(self, sheet, x, y, w, l, min_side):
+        free = self.free
+        fx, fy, fw, fl = free[:, 1], free[:, 2], free[:, 3], free[:, 4]
+        hit = (free[:, 0] == sheet) & (fx < x + w) & (fx + fw > x) & (fy < y + l) & (fy + fl > y)
+        kept, cut = free[~hit], free[hit]
+        # Até quatro sobras maximais de cada retângulo atingido: esquerda, direita, abaixo, acima
+        k = len(cut)
+        parts = np.tile(cut, (4, 1))
+        parts[:k, 3] = x - cut[:, 1]
+        parts[k:2 * k, 1] = x + w
+        parts[k:2 * k, 3] = cut[:, 1] + cut[:, 3] - (x + w)
+        parts[2 * k:3 * k, 4] = y - cut[:, 2]
+        parts[3 * k:, 2] = y + l
+        parts[3 * k:, 4] = cut[:, 2] + cut[:, 4] - (y + l)
+        parts = parts[(parts[:, 3] > 0) & (parts[:, 4] > 0) & (parts[:, 3] >= min_side) & (parts[:, 4] >= min_side)]
+        if parts.size:
+            parts = parts[~self._contained(parts, kept[kept[:, 0] == sheet])]
+        if min_side > self._pruned_below:
+            kept = kept[np.minimum(kept[:, 3], kept[:, 4]) >= min_side]
+            self._pruned_below = min_side
+        self.free = np.vstack([kept, parts])
+
+    @staticmethod
+    def _contained(parts, others):
+        """Sobras contidas em outro retângulo livre da mesma chapa (ou repetidas) não são maximais."""
+        def inside(a, b):
+            return ((b[None, :, 1] <= a[:, None, 1]) & (b[None, :, 2] <= a[:, None, 2])
+                    & (b[None, :, 1] + b[None, :, 3] >= a[:, None, 1] + a[:, None, 3])
+                    & (b[None, :, 2] + b[None, :, 4] >= a[:, None, 2] + a[:, None, 4]))
+        contained = inside(parts, others).any(axis=1) if others.size else np.zeros(len(parts), bool)
+        among = inside(parts, parts)
+        same = among & among.T
+        # Entre duas sobras iguais fica a primeira
+        among &= ~same | np.tri(len(parts), k=-1, dtype=bool)
+        return contained | among.any(axis=1)
+
+
+def pack(widths, lengths, sheets, kerf, allow_rotation):
+    """Empacota as peças nas chapas. Retorna (arrays das posições, tamanhos das chapas abertas,
+    índices das peças que não cabem em nenhuma chapa)."""
+    packer = SheetPacker(sheets, kerf, allow_rotation)
+    n = len(widths)
+    fits = np.zeros(n, dtype=bool)
+    for w, l in sheets:
+        fits |= (widths <= w) & (lengths <= l)
+        if allow_rotation:
+            fits |= (lengths <= w) & (widths <= l)
+    # Maiores primeiro: área e, no empate, lado maior
+    order = np.lexsort((-np.maximum(widths, lengths), -(widths * lengths)))
+    order = order[fits[order]]
+    # Menor lado entre as peças que ainda faltam, para descartar sobras inúteis
+    min_sides = np.minimum.accumulate(np.minimum(widths, lengths)[order][::-1])[::-1]
+    placed_sheet = np.zeros(n, dtype=np.int64)
+    placed_x = np.zeros(n)
+    placed_y = np.zeros(n)
+    placed_rotated = np.zeros(n, dtype=bool)
+    # Peças iguais ficam juntas na ordenação e são posicionadas em lotes
+    sizes = np.column_stack([widths[order], lengths[order]])
+    run_ends = np.append(np.flatnonzero((sizes[1:] != sizes[:-1]).any(axis=1)) + 1, len(order))
+    position = 0
+    for end in run_ends.tolist():
+        while position < end:
+            piece = order[position]
+            after = position + 1
+            sheet, xs, ys, rotated = packer.place(widths[piece], lengths[piece], end - position,
+                                                  min_sides[after] if after < len(order) else 0.0)
+            block = order[position:position + len(xs)]
+            placed_sheet[block], placed_x[block], placed_y[block], placed_rotated[block] = sheet, xs, ys, rotated
+            position += len(xs)
+    placed = np.zeros(n, dtype=bool)
+    placed[order] = True
+    return (placed, placed_sheet, placed_x, placed_y, placed_rotated), packer.sheet_sizes, np.flatnonzero(~fits)
+
+
+def smallest_sheet(sheets, width, length):
+    """Menor chapa configurada que comporta o retângulo ocupado (a última chapa costuma sobrar)."""
+    candidates = [(w * l, w, l) for w, l in sheets if w >= width and l >= length]
+    return min(candidates)[1:] if candidates else None
+
+
+def _m2(value):
+    return round(float(value) / 1_000_000, 4)
+
+
+def plan_group(pieces, sheets, kerf, allow_rotation):
+    """Plano de um grupo material/espessura. `pieces` = (order_ids, larguras, comprimentos) por peça."""
+    order_ids, widths, lengths = pieces
+    (placed, sheet, x, y, rotated), sizes, unplaced = pack(widths, lengths, sheets, kerf, allow_rotation)
+    placed_w = np.where(rotated, lengths, widths)
+    placed_l = np.where(rotated, widths, lengths)
+    result_sheets = []
+    used_total = area_total = 0.0
+    by_sheet = np.argsort(np.where(placed, sheet, -1), kind='stable')
+    by_sheet = by_sheet[placed[by_sheet]]
+    bounds = np.searchsorted(sheet[by_sheet], np.arange(len(sizes) + 1))
+    for index, (w, l) in enumerate(sizes):
+        members = by_sheet[bounds[index]:bounds[index + 1]]
+        used = float((placed_w[members] * placed_l[members]).sum())
+        extent_w = float((x[members] + placed_w[members]).max())
+        extent_l = float((y[members] + placed_l[members]).max())
+        w, l = smallest_sheet(sheets, extent_w, extent_l) or (w, l)
+        used_total += used
+        area_total += w * l
+        result_sheets.append({
+            "index": index + 1, "width": w, "length": l, "pieces_count": len(members),
+            "area_m2": _m2(w * l), "used_m2": _m2(used), "waste_m2": _m2(w * l - used),
+            "utilization": round(used / (w * l), 4),
+            "pieces": [
+                {"order_id": int(order_ids[p]), "x": round(float(x[p]), 1), "y": round(float(y[p]), 1),
+                 "width": float(placed_w[p]), "length": float(placed_l[p]), "rotated": bool(rotated[p])}
+                for p in members.tolist()
+            ],
+        })
+    missing = {}
+    for p in unplaced.tolist():
+        key = (int(order_ids[p]), float(widths[p]), float(lengths[p]))
+        missing[key] = missing.get(key, 0) + 1
+    return result_sheets, used_total, area_total, [
+        {"order_id": order_id, "width": w, "length": l, "quantity": quantity,
+         "reason": "Peça maior que todas as chapas configuradas"}
+        for (order_id, w, l), quantity in missing.items()
+    ]
+
+
+# --- Plano ---
+def load_pieces(order_ids, statuses):
+    """Pedidos selecionados agrupados por (material, espessura), uma linha por pedido."""
+    query = select(Order.id, Order.material, Order.thickness, Order.width, Order.length, Order.quantity)
+    if order_ids:
+        query = query.where(Order.id.in_(order_ids))
+    else:
+        query = query.where(Order.status.in_(statuses))
+    groups = {}
+    for row in db.session.execute(query.order_by(Order.id)):
+        key = ((row.material or '').strip(), (row.thickness or '').strip())
+        groups.setdefault(key, []).append((row.id, row.width, row.length, row.quantity))
+    return groups
+
+
+def cutting_plan(order_ids, statuses, sheets, kerf, allow_rotation):
+    if np is None:
+        raise CuttingPlanError("O plano de corte requer o pacote 'numpy' (pip install numpy)", 503)
+    groups = load_pieces(order_ids, statuses)
+    total_pieces = sum(max(quantity or 0, 0) for rows in groups.values() for *_, quantity in rows)
+    max_pieces = int(current_app.config['CUTTING_MAX_PIECES'])
+    if total_pieces > max_pieces:
+        raise CuttingPlanError(f"{total_pieces} peças excedem o limite de {max_pieces} por plano; "
+                               "filtre por pedido (order_id) ou status", 413)
+    result_groups = []
+    totals = {"orders": 0, "pieces": 0, "sheets": 0, "used": 0.0, "area": 0.0, "unplaced": 0}
+    for (material, thickness), rows in sorted(groups.items()):
+        ids, widths, lengths, quantities = (np.array(column) for column in zip(*rows))
+        valid = (quantities > 0) & (widths > 0) & (lengths > 0)
+        quantities = np.where(valid, quantities, 0)
+        pieces = (np.repeat(ids, quantities), np.repeat(widths.astype(float), quantities),
+                  np.repeat(lengths.astype(float), quantities))
+        if not len(pieces[0]):
+            continue
+        plan_sheets, used, area, unplaced = plan_group(pieces, sheets, kerf, allow_rotation)
+        result_groups.append({
+            "material": material, "thickness": thickness, "orders": int(valid.sum()),
+            "pieces": len(pieces[0]), "sheets_count": len(plan_sheets),
+            "area_m2": _m2(area), "used_m2": _m2(used), "waste_m2": _m2(area - used),
+            "utilization": round(used / area, 4) if area else 0.0,
+            "sheets": plan_sheets, "unplaced": unplaced,
+        })
+        totals["orders"] += int(valid.sum())
+        totals["pieces"] += len(pieces[0])
+        totals["sheets"] += len(plan_sheets)
+        totals["used"] += used
+        totals["area"] += area
+        totals["unplaced"] += sum(item["quantity"] for item in unplaced)
+    used, area = totals.pop("used"), totals.pop("area")
+    totals.update({"area_m2": _m2(area), "used_m2": _m2(used), "waste_m2": _m2(area - used),
+                   "utilization": round(used / area, 4) if area else 0.0})
+    return {
+        "sheet_sizes": [{"width": w, "length": l} for w, l in sheets],
+        "kerf": kerf, "allow_rotation": allow_rotation, "totals": totals, "groups": result_groups,
+    }
+
+
+def init_cutting(app):
+    for key, default in DEFAULTS.items():
+        app.config.setdefault(key, default)
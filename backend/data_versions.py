@@ -0,0 +1,77 @@
+from datetime import datetime
+from sqlalchemy import event, select, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+from database import db, User, Client, Order, Product, DataVersion, Tombstone
+
+# Modelo -> nome da entidade (os mesmos nomes usados pelo cache HTTP)
+TRACKED_MODELS = {User: 'users', Client: 'clients', Product: 'products', Order: 'orders'}
+# Entidades com updated_at/change_version e tombstones (feed /api/changes)
+CHANGE_TRACKED = ('clients', 'products', 'orders')
+
+
+def bump_data_versions(connection, entities):
+    """Incrementa a versão das entidades na transação da conexão informada.
+
+    Escritas set-based (bulk UPDATE/INSERT fora do ORM) devem chamar esta função antes de
+    gravar: as linhas recebem a nova versão em change_version (ver database.entity_version).
+    A linha de data_version fica travada até o commit, então as versões de uma entidade
+    ficam visíveis na mesma ordem em que são atribuídas. As entidades ficam anotadas na
+    conexão para o cache HTTP descartar as versões guardadas depois do commit (cache.py).
+    """
+    if not entities:
+        return
+    connection.info.setdefault('bumped_entities', set()).update(entities)
+    table = DataVersion.__table__
+    rows = [{'entity': entity, 'version': 1} for entity in sorted(entities)]
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        stmt = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+        stmt = stmt.on_conflict_do_update(index_elements=[table.c.entity],
+                                          set_={'version': table.c.version + 1})
+        connection.execute(stmt, rows)
+        return
+    for row in rows:
+        if connection.execute(table.update().where(table.c.entity == row['entity'])
+                              .values(version=table.c.version + 1)).rowcount == 0:
+            connection.execute(table.insert().values(**row))
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_on_flush(session, flush_context, instances):
+    # Antes do flush, para os INSERT/UPDATE do flush já gravarem a nova versão
+    entities = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        entity = TRACKED_MODELS.get(type(obj))
+        if entity and (obj not in session.dirty or session.is_modified(obj, include_collections=False)):
+            entities.add(entity)
+    if not entities:
+        return
+    connection = session.connection()
+    bump_data_versions(connection, entities)
+    deleted = [(TRACKED_MODELS[type(obj)], obj.id) for obj in session.deleted
+               if TRACKED_MODELS.get(type(obj)) in CHANGE_TRACKED]
+    if deleted:
+        record_tombstones(connection, deleted)
+
+
+def record_tombstones(connection, rows):
+    """Registra exclusões [(entidade, id)] com a versão atual da entidade (já incrementada na transação)."""
+    table = Tombstone.__table__
+    versions = dict(zip(CHANGE_TRACKED, _versions_on(connection, CHANGE_TRACKED)))
+    now = datetime.utcnow()
+    connection.execute(insert(table), [
+        {'entity': entity, 'row_id': row_id, 'version': versions[entity], 'deleted_at': now} for entity, row_id in rows
+    ])
+
+
+def _versions_on(connection, entities):
+    rows = dict(connection.execute(
+        select(DataVersion.entity, DataVersion.version).where(DataVersion.entity.in_(entities))
+    ).all())
+    return [rows.get(entity, 0) for entity in entities]
+
+
+def data_versions(*entities):
+    """Versões atuais das entidades, na ordem pedida (0 se nunca houve escrita)."""
+    return _versions_on(db.session.connection(), entities)
@@ -4,15 +4,47 @@ from datetime import datetime
 
 db = SQLAlchemy()
 
+# Limite de "estoque baixo" do dashboard; o índice parcial de produtos usa o mesmo valor
+LOW_STOCK_THRESHOLD = 10
+
+
+def entity_version(entity):
+    """Versão atual da entidade em data_version, como expressão SQL. Quem escreve incrementa a
+    versão antes de gravar (ver data_versions.py), então as linhas da transação recebem a nova
+    versão e o feed /api/changes as encontra com change_version > cursor."""
+    return db.text(f"(SELECT COALESCE(MAX(version), 0) FROM data_version WHERE entity = '{entity}')")
+
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(50), nullable=False, default='admin')
+    # Obsoleta (migração 15): substituída por token_generation
+    tokens_valid_after = db.Column(db.DateTime, nullable=True)
+    # Geração gravada nos tokens; a troca de senha/perfil incrementa e invalida os anteriores
+    token_generation = db.Column(db.Integer, nullable=False, default=0)
 
     def __repr__(self):
         return f'<User {self.username}>'
 
+# MODELO: Tokens revogados (logout e rotação do refresh token), compartilhados entre os
+# processos. A linha só precisa existir até o token expirar.
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_token'
+
+    jti = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        # Limpeza dos expirados
+        db.Index('ix_revoked_token_expires_at', 'expires_at'),
+    )
+
+    def __repr__(self):
+        return f'<RevokedToken {self.jti}>'
+
 class Client(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), unique=True, nullable=False)
@@ -22,10 +54,19 @@ class Client(db.Model):
     address = db.Column(db.String(200), nullable=True)
     cnpj = db.Column(db.String(20), nullable=True)
     observations = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_version = db.Column(db.Integer, default=entity_version('clients'), onupdate=entity_version('clients'))
     # NOVO: Adicionado backref e cascade para deleção de pedidos
     orders = db.relationship('Order', backref='client', lazy=True, cascade='all, delete-orphan')
 
+    # Índices criados pela migração 3 (ver migrations.py)
+    __table_args__ = (
+        db.Index('ix_client_created_at_id', 'created_at', 'id'),
+        # Feed de alterações (migração 9)
+        db.Index('ix_client_change_version_id', 'change_version', 'id'),
+    )
+
     def __repr__(self):
         return f'<Client {self.name}>'
 
@@ -41,7 +82,18 @@ class Order(db.Model):
     observations = db.Column(db.Text, nullable=True)
     value = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(50), nullable=False, default='Aguardando')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_version = db.Column(db.Integer, default=entity_version('orders'), onupdate=entity_version('orders'))
+
+    __table_args__ = (
+        # Pedidos de um cliente em ordem cronológica (também atende filtros só por client_id)
+        db.Index('ix_order_client_id_created_at', 'client_id', 'created_at'),
+        # Paginação por keyset e filtros por período
+        db.Index('ix_order_created_at_id', 'created_at', 'id'),
+        db.Index('ix_order_status_created_at', 'status', 'created_at'),
+        db.Index('ix_order_change_version_id', 'change_version', 'id'),
+    )
 
     # A linha abaixo foi removida pois o backref foi movido para o modelo Client
     # client = db.relationship('Client', backref=db.backref('orders', lazy=True))
@@ -58,7 +110,176 @@ class Product(db.Model):
     unit = db.Column(db.String(20), nullable=True)
     sku = db.Column(db.String(50), unique=True, nullable=True)
     stock = db.Column(db.Integer, nullable=False, default=0)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_version = db.Column(db.Integer, default=entity_version('products'), onupdate=entity_version('products'))
+
+    __table_args__ = (
+        db.Index('ix_product_created_at_id', 'created_at', 'id'),
+        # Índice parcial: só produtos com estoque baixo (consulta do dashboard)
+        db.Index('ix_product_low_stock', 'stock',
+                 postgresql_where=stock <= LOW_STOCK_THRESHOLD,
+                 sqlite_where=stock <= LOW_STOCK_THRESHOLD),
+        db.Index('ix_product_change_version_id', 'change_version', 'id'),
+    )
 
     def __repr__(self):
         return f'<Product {self.name}>'
+
+# MODELOS: Resumo de vendas (rollup) mantido na mesma transação das alterações de pedidos
+class SalesDaily(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    total_value = db.Column(db.Float, nullable=False, default=0)
+    total_orders = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<SalesDaily {self.day} {self.status}>'
+
+class SalesMonthly(db.Model):
+    # Primeiro dia do mês
+    month = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    total_value = db.Column(db.Float, nullable=False, default=0)
+    total_orders = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<SalesMonthly {self.month} {self.status}>'
+
+# MODELO: Versão dos dados por entidade, incrementada na mesma transação de cada escrita.
+# Usada como parte da chave de caches persistentes (ex.: PDFs de relatórios).
+class DataVersion(db.Model):
+    entity = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DataVersion {self.entity}={self.version}>'
+
+# MODELO: Job em segundo plano (importações, exportações, relatórios). A tabela é a fila:
+# os workers reivindicam jobs 'queued' com um UPDATE condicional, sem broker externo.
+class Job(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    # queued | running | succeeded | failed | cancelled
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    params = db.Column(db.Text, nullable=True)
+    input_path = db.Column(db.String(500), nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    result_path = db.Column(db.String(500), nullable=True)
+    result_name = db.Column(db.String(200), nullable=True)
+    result_mimetype = db.Column(db.String(100), nullable=True)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    errors_count = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Text, nullable=True)
+    message = db.Column(db.Text, nullable=True)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    created_by = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # Próximo job da fila e limpeza de jobs antigos
+        db.Index('ix_job_status_created_at', 'status', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} {self.status}>'
+
+# MODELO: Movimentação de estoque (livro razão só de inserção). Product.stock muda apenas por
+# UPDATE condicional (stock = stock + delta) na mesma transação que grava a movimentação,
+# então a soma de quantity por produto é sempre igual ao estoque atual.
+class StockMovement(db.Model):
+    __tablename__ = 'stock_movement'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # RESTRICT: excluir o produto apagaria o histórico (a rota recusa produtos com movimentações)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='RESTRICT'), nullable=False)
+    # in | out | adjust
+    kind = db.Column(db.String(10), nullable=False)
+    # Variação com sinal (saídas negativas)
+    quantity = db.Column(db.Integer, nullable=False)
+    # Estoque logo após a movimentação (nulo em ajustes de importações antigas)
+    stock_after = db.Column(db.Integer, nullable=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id', ondelete='SET NULL'), nullable=True)
+    note = db.Column(db.Text, nullable=True)
+    created_by = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_stock_movement_product_id_id', 'product_id', 'id'),
+        db.Index('ix_stock_movement_order_id', 'order_id'),
+    )
+
+    def __repr__(self):
+        return f'<StockMovement {self.product_id} {self.kind} {self.quantity}>'
+
+# MODELO: Registro de exclusão (tombstone) de clientes, produtos e pedidos, para o feed de
+# alterações informar o que sumiu. `version` é a versão da entidade na transação da exclusão.
+class Tombstone(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_tombstone_entity_version_id', 'entity', 'version', 'id'),
+        # Limpeza dos antigos (flask purge-tombstones)
+        db.Index('ix_tombstone_deleted_at', 'deleted_at'),
+    )
+
+    def __repr__(self):
+        return f'<Tombstone {self.entity} {self.row_id}>'
+
+# MODELO: Outbox de eventos de pedidos (webhooks). O evento é gravado na mesma transação da
+# alteração do pedido e entregue depois pelo dispatcher (outbox.py), com novas tentativas.
+class OutboxEvent(db.Model):
+    __tablename__ = 'outbox_event'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # order.created | order.updated | order.deleted
+    event_type = db.Column(db.String(50), nullable=False)
+    # Sem chave estrangeira: o evento de exclusão sobrevive ao pedido
+    order_id = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    # pending | sending | delivered | dead
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Prazo do envio em andamento: passado dele, outro dispatcher pode reivindicar o evento
+    locked_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    delivered_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # Próximos eventos a enviar
+        db.Index('ix_outbox_event_status_next_attempt_at', 'status', 'next_attempt_at'),
+        # Ordem por pedido: um evento só sai depois dos anteriores do mesmo pedido
+        db.Index('ix_outbox_event_order_id_id', 'order_id', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<OutboxEvent {self.id} {self.event_type} {self.status}>'
+
+# MODELO: Arquivo de pedidos antigos. Cada mês arquivado é um CSV compactado (archive.py) e
+# esta tabela é o índice: arquivo, período, contagem e o resumo de vendas por dia/status.
+class OrderArchive(db.Model):
+    __tablename__ = 'order_archive'
+
+    # Primeiro dia do mês arquivado
+    month = db.Column(db.Date, primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    rows = db.Column(db.Integer, nullable=False)
+    first_created_at = db.Column(db.DateTime, nullable=False)
+    last_created_at = db.Column(db.DateTime, nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    # JSON [[dia, status, valor, quantidade], ...]: mantém rollup e conferências sem ler o arquivo
+    summary = db.Column(db.Text, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<OrderArchive {self.month:%Y-%m} {self.rows}>'
@@ -0,0 +1,124 @@
+import io
+import csv
+from datetime import datetime
+from database import Client, Order, Product
+from pagination import (
+    PaginationError, parse_sort, apply_sort, filter_clients, filter_products, filter_orders, order_filters,
+    CLIENT_SORT_KEYS, PRODUCT_SORT_KEYS, ORDER_SORT_KEYS
+)
+from archive import archived_months, iter_archived, merge_archived
+
+# Quantidade de linhas lidas do cursor do banco (e escritas no buffer) por vez
+EXPORT_CHUNK_SIZE = 1000
+
+# Cabeçalhos do CSV -> colunas do modelo. Os cabeçalhos são os mesmos aceitos pela importação.
+CLIENT_EXPORT_COLUMNS = [
+    ('ID', Client.id), ('Nome', Client.name), ('Pessoa de Contato', Client.contact_person),
+    ('Telefone', Client.phone), ('Email', Client.email), ('Endereço', Client.address),
+    ('CNPJ', Client.cnpj), ('Observações', Client.observations), ('Criado Em', Client.created_at),
+]
+PRODUCT_EXPORT_COLUMNS = [
+    ('ID', Product.id), ('Nome', Product.name), ('Descrição', Product.description),
+    ('Preço', Product.price), ('Unidade', Product.unit), ('SKU', Product.sku),
+    ('Estoque', Product.stock), ('Criado Em', Product.created_at),
+]
+ORDER_EXPORT_COLUMNS = [
+    ('ID', Order.id), ('Número do Pedido', Order.order_number), ('ID do Cliente', Order.client_id),
+    ('Material', Order.material), ('Espessura', Order.thickness), ('Largura', Order.width),
+    ('Comprimento', Order.length), ('Quantidade', Order.quantity), ('Observações', Order.observations),
+    ('Valor', Order.value), ('Status', Order.status), ('Criado Em', Order.created_at),
+]
+
+EXPORTS = {
+    'clients': (Client, CLIENT_EXPORT_COLUMNS, filter_clients, CLIENT_SORT_KEYS, 'clientes'),
+    'products': (Product, PRODUCT_EXPORT_COLUMNS, filter_products, PRODUCT_SORT_KEYS, 'produtos'),
+    'orders': (Order, ORDER_EXPORT_COLUMNS, filter_orders, ORDER_SORT_KEYS, 'pedidos'),
+}
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def build_export_query(entity, args):
+    """Monta a consulta de exportação com os mesmos filtros/ordenação das listagens.
+
+    Levanta PaginationError para parâmetros inválidos, antes de começar o streaming.
+    """
+    model, columns, filter_fn, sort_keys, _ = EXPORTS[entity]
+    sort_key, direction = parse_sort(args, sort_keys)
+    if entity == 'orders' and sort_key != 'created_at':
+        _, _, start, end, _ = order_filters(args)
+        if archived_months(start, end):
+            # Os arquivos mensais estão em ordem de data: outra ordenação exigiria todos em memória
+            raise PaginationError(f"Ordenação por '{sort_key}' não inclui os meses arquivados: use "
+                                  f"sort=created_at ou um período (from/to) fora dos meses arquivados")
+    query = filter_fn(model.query, args)
+    query = apply_sort(query, model, sort_keys, sort_key, direction)
+    # Seleciona só as colunas exportadas (sem hidratar objetos ORM)
+    return query.with_entities(*[column for _, column in columns])
+
+
+def export_rows(entity, args, chunk_size=EXPORT_CHUNK_SIZE):
+    """Linhas da exportação, lidas do banco com cursor do lado do servidor.
+
+    Pedidos incluem os meses arquivados que caem no período, intercalados na mesma ordem
+    (só com ordenação por data; ver build_export_query), lidos em streaming um mês por vez.
+    """
+    rows = build_export_query(entity, args).yield_per(chunk_size)
+    if entity != 'orders':
+        return rows
+    _, columns, _, sort_keys, _ = EXPORTS[entity]
+    sort_key, direction = parse_sort(args, sort_keys)
+    if sort_key != 'created_at':
+        return rows
+    descending = direction == 'desc'
+    fields = [column.key for _, column in columns]
+    position, id_position = fields.index('created_at'), fields.index('id')
+
+    def key(row):
+        return row[position], row[id_position]
+
+    archived = (tuple(getattr(row, field) for field in fields)
+                for row in iter_archived(order_filters(args), descending))
+    return merge_archived(rows, archived, key, descending)
+
+
+def iter_csv(rows, headers, chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+    """Gera o CSV em blocos de bytes a partir das linhas (ver export_rows).
+
+    O buffer é esvaziado a cada bloco, então a memória fica constante
+    independentemente do número de linhas exportadas. `progress`, se informado,
+    recebe o total de linhas escritas a cada bloco.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    pending = written = 0
+    for row in rows:
+        writer.writerow([_cell(value) for value in row])
+        pending += 1
+        if pending >= chunk_size:
+            written += pending
+            if progress:
+                progress(written)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+    if progress:
+        progress(written + pending)
+    yield buffer.getvalue().encode('utf-8')
+
+
+def export_filename(entity):
+    prefix = EXPORTS[entity][4]
+    return f'{prefix}_exportados_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+
+
+def export_headers(entity):
+    return [header for header, _ in EXPORTS[entity][1]]
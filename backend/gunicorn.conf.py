@@ -0,0 +1,60 @@
+# Configuração do gunicorn para produção: gunicorn -c gunicorn.conf.py "app:create_app()"
+# Todos os valores podem ser ajustados por variáveis de ambiente.
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Workers pela quantidade de CPUs; threads por worker para absorver espera de I/O (banco).
+# Cada worker tem seu próprio pool: mantenha DB_POOL_SIZE próximo de GUNICORN_THREADS e
+# workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) abaixo do max_connections do Postgres.
+# O que precisa valer entre workers fica no banco (versões do cache HTTP, tokens revogados).
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+# Long-polls de /api/changes esperam dormindo, sem conexão do banco, mas cada um prende uma
+# thread: o worker ganha CHANGES_MAX_WAITERS threads além das GUNICORN_THREADS das requisições
+# comuns (o app lê o mesmo limite da variável de ambiente).
+changes_waiters = int(os.environ.setdefault("CHANGES_MAX_WAITERS", "32"))
+threads = int(os.environ.get("GUNICORN_THREADS", 4)) + changes_waiters
+worker_class = "gthread" if threads > 1 else "sync"
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Jobs (importações, exportações, relatórios) rodam fora do gunicorn, em `flask --app app run-jobs`:
+# a reciclagem de workers abaixo mataria um job no meio. Com JOB_WORKERS > 0 explícito, os
+# workers não são reciclados.
+job_workers = int(os.environ.setdefault("JOB_WORKERS", "0"))
+
+# Recicla workers periodicamente para conter crescimento de memória
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0 if job_workers else 2000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+# Sem preload: cada worker cria o app (e o pool de conexões) depois do fork
+preload_app = False
+
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-")
+errorlog = os.environ.get("GUNICORN_ERRORLOG", "-")
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
+
+# Métricas (/metrics) somadas entre os workers: cada um grava os contadores em METRICS_DIR
+# (padrão: um diretório temporário por execução), limpo na partida. Ao sair, o worker soma os
+# seus ao total dos encerrados, então os totais não voltam na reciclagem.
+metrics_dir = os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"gbl-metrics-{os.getpid()}"))
+
+
+def on_starting(server):
+    from metrics import reset_directory
+    reset_directory(metrics_dir)
+
+
+def worker_exit(server, worker):
+    metrics = getattr(worker.wsgi, "extensions", {}).get("metrics")
+    if metrics is not None:
+        metrics.retire()
+
+
+def on_exit(server):
+    shutil.rmtree(metrics_dir, ignore_errors=True)
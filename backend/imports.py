@@ -0,0 +1,280 @@
+import io
+import csv
+from datetime import datetime
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects import postgresql, sqlite
+from database import db, Client, Product, entity_version
+from data_versions import bump_data_versions
+from stock import StockError, set_stock_levels, record_opening_balances
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_IMPORT_CHUNK_SIZE = 10000
+
+
+class ImportFileError(ValueError):
+    """Arquivo de importação inválido (vazio ou sem cabeçalho)."""
+
+
+class RowError(ValueError):
+    """Linha do CSV com dados inválidos; a mensagem vai para o relatório de erros."""
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.updated = 0
+        self.errors = []
+        # Nomes que seriam inseridos em blocos anteriores (só usado em dry_run, já que nada é gravado)
+        self.planned_names = set()
+
+
+class ImportSpec:
+    def __init__(self, model, entity, column_mapping, optional_keys, normalize, unique_keys, missing_name_message,
+                 tracks_stock=False):
+        self.model = model
+        self.entity = entity
+        self.column_mapping = column_mapping
+        self.optional_keys = optional_keys
+        self.normalize = normalize
+        # Colunas únicas usadas para localizar registros existentes (além do id), em ordem de prioridade
+        self.unique_keys = unique_keys
+        self.missing_name_message = missing_name_message
+        # Estoque só muda por movimentações (stock.py): existentes recebem um ajuste pela diferença
+        self.tracks_stock = tracks_stock
+
+
+def _parse_created_at(data):
+    if data.get('created_at'):
+        try:
+            data['created_at'] = datetime.fromisoformat(data['created_at'])
+        except ValueError:
+            raise RowError("Formato de data inválido para 'Criado Em'.")
+    else:
+        data.pop('created_at', None)
+
+
+def _parse_id(data):
+    if data.get('id'):
+        try:
+            data['id'] = int(data['id'])
+        except ValueError:
+            raise RowError(f"ID inválido '{data['id']}'.")
+    else:
+        data.pop('id', None)
+
+
+def normalize_client(data):
+    _parse_created_at(data)
+    _parse_id(data)
+    return data
+
+
+def normalize_product(data):
+    if data.get('price'):
+        try:
+            data['price'] = float(str(data['price']).replace(',', '.'))
+        except ValueError:
+            raise RowError(f"Formato de preço inválido para '{data['price']}'.")
+    else:
+        raise RowError("Preço é obrigatório e não fornecido.")
+    if data.get('stock'):
+        try:
+            data['stock'] = int(data['stock'])
+        except ValueError:
+            raise RowError(f"Formato de estoque inválido para '{data['stock']}'.")
+        if data['stock'] < 0:
+            raise RowError("Estoque não pode ser negativo.")
+    else:
+        data['stock'] = 0
+    _parse_created_at(data)
+    _parse_id(data)
+    return data
+
+
+CLIENT_IMPORT = ImportSpec(
+    model=Client,
+    entity='clients',
+    column_mapping={
+        'ID': 'id', 'Nome': 'name', 'Pessoa de Contato': 'contact_person',
+        'Telefone': 'phone', 'Email': 'email', 'Endereço': 'address',
+        'CNPJ': 'cnpj', 'Observações': 'observations', 'Criado Em': 'created_at'
+    },
+    optional_keys=['contact_person', 'email', 'phone', 'address', 'cnpj', 'observations'],
+    normalize=normalize_client,
+    unique_keys=['name'],
+    missing_name_message="Nome do cliente é obrigatório e não fornecido.",
+)
+
+PRODUCT_IMPORT = ImportSpec(
+    model=Product,
+    entity='products',
+    column_mapping={
+        'ID': 'id', 'Nome': 'name', 'Descrição': 'description',
+        'Preço': 'price', 'Unidade': 'unit', 'SKU': 'sku',
+        'Estoque': 'stock',
+        'Criado Em': 'created_at'
+    },
+    optional_keys=['description', 'unit', 'sku'],
+    normalize=normalize_product,
+    unique_keys=['name', 'sku'],
+    missing_name_message="Nome do produto é obrigatório e não fornecido.",
+    tracks_stock=True,
+)
+
+
+def parse_chunk_size(value):
+    if value in (None, ''):
+        return IMPORT_CHUNK_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        raise ImportFileError(f"Valor inválido para 'chunk_size': {value}")
+    if size < 1 or size > MAX_IMPORT_CHUNK_SIZE:
+        raise ImportFileError(f"'chunk_size' deve estar entre 1 e {MAX_IMPORT_CHUNK_SIZE}")
+    return size
+
+
+def _group_by_keys(rows):
+    # executemany exige o mesmo conjunto de colunas em todos os parâmetros
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    return groups.values()
+
+
+def _upsert_statement(model, keys, entity):
+    """INSERT ... ON CONFLICT (name) DO UPDATE, para novos registros inseridos em paralelo.
+
+    O estoque não é sobrescrito no conflito: o produto já existente tem seu livro razão.
+    O ON CONFLICT não aplica os onupdate do modelo, então updated_at e change_version vão explícitos.
+    """
+    table = model.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        stmt = postgresql.insert(table)
+    elif dialect == 'sqlite':
+        stmt = sqlite.insert(table)
+    else:
+        return table.insert()
+    update_cols = {key: stmt.excluded[key] for key in keys if key not in ('name', 'stock')}
+    if not update_cols:
+        return stmt.on_conflict_do_nothing(index_elements=[table.c.name])
+    update_cols.update(updated_at=datetime.utcnow(), change_version=entity_version(entity))
+    return stmt.on_conflict_do_update(index_elements=[table.c.name], set_=update_cols)
+
+
+def _prefetch(spec, chunk):
+    """Busca em lote os registros existentes referenciados pelo bloco (por id e colunas únicas)."""
+    model = spec.model
+    ids = {data['id'] for _, data in chunk if 'id' in data}
+    existing_ids = set()
+    if ids:
+        existing_ids = set(db.session.execute(select(model.id).where(model.id.in_(ids))).scalars())
+    by_key = {}
+    for key in spec.unique_keys:
+        column = getattr(model, key)
+        values = {data[key] for _, data in chunk if data.get(key)}
+        by_key[key] = {}
+        if values:
+            rows = db.session.execute(select(column, model.id).where(column.in_(values)))
+            by_key[key] = {value: row_id for value, row_id in rows}
+    return existing_ids, by_key
+
+
+def _process_chunk(spec, chunk, dry_run, result):
+    existing_ids, by_key = _prefetch(spec, chunk)
+    updates = {}
+    inserts = {}
+    imported = updated = 0
+    for line, data in chunk:
+        row_id = data.pop('id', None)
+        target = row_id if row_id in existing_ids else None
+        for key in spec.unique_keys:
+            if target is None and data.get(key):
+                target = by_key[key].get(data[key])
+        if target is not None:
+            if not data.get('name'):
+                data.pop('name', None)
+            updates.setdefault(target, {'id': target}).update(data)
+            updated += 1
+        elif not data.get('name'):
+            result.errors.append(f"Linha {line}: {spec.missing_name_message}")
+        elif data['name'] in inserts:
+            # Nome repetido no mesmo bloco: a última linha prevalece, como no fluxo linha a linha
+            inserts[data['name']].update(data)
+            updated += 1
+        elif dry_run and data['name'] in result.planned_names:
+            updated += 1
+        else:
+            inserts[data['name']] = data
+            imported += 1
+
+    if dry_run:
+        result.planned_names.update(inserts)
+    elif updates or inserts:
+        try:
+            # Escritas em massa não passam pelo flush do ORM; a versão sobe antes, para as linhas gravarem a nova
+            bump_data_versions(db.session.connection(), [spec.entity])
+            stock_targets = {}
+            if spec.tracks_stock:
+                stock_targets = {row['id']: row.pop('stock') for row in updates.values() if 'stock' in row}
+            for rows in _group_by_keys(row for row in updates.values() if len(row) > 1):
+                db.session.execute(update(spec.model), rows)
+            for rows in _group_by_keys(inserts.values()):
+                db.session.execute(_upsert_statement(spec.model, rows[0].keys(), spec.entity), rows)
+            if spec.tracks_stock:
+                connection = db.session.connection()
+                set_stock_levels(connection, stock_targets, note='Importação de produtos')
+                if inserts:
+                    record_opening_balances(connection, spec.model.name.in_(list(inserts)), note='Importação de produtos')
+            db.session.commit()
+        except (SQLAlchemyError, StockError) as e:
+            db.session.rollback()
+            first, last = chunk[0][0], chunk[-1][0]
+            result.errors.append(f"Linhas {first}-{last}: lote não gravado: {getattr(e, 'orig', None) or e}")
+            return
+    result.imported += imported
+    result.updated += updated
+
+
+def run_import(binary_stream, spec, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False, progress=None):
+    """Importa um CSV em blocos: lê o arquivo como stream, valida cada linha,
+    busca os existentes em lote e grava cada bloco com um commit próprio.
+
+    Em dry_run apenas valida e classifica as linhas, sem gravar nada. `progress`, se
+    informado, é chamado após cada bloco com (linhas lidas, ImportResult parcial).
+    """
+    reader = csv.reader(io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline=''))
+    header = next(reader, None)
+    if not header:
+        raise ImportFileError('Arquivo CSV vazio ou sem cabeçalho')
+    mapped_indices = {col_name: header.index(csv_header) for csv_header, col_name in spec.column_mapping.items() if csv_header in header}
+
+    result = ImportResult()
+    chunk = []
+    rows_read = 0
+    for row_num, row in enumerate(reader):
+        if not row:
+            continue
+        line = row_num + 2
+        rows_read += 1
+        data = {model_col: row[idx] for model_col, idx in mapped_indices.items() if idx < len(row)}
+        for key in spec.optional_keys:
+            if data.get(key, '') == '':
+                data[key] = None
+        try:
+            chunk.append((line, spec.normalize(data)))
+        except RowError as e:
+            result.errors.append(f"Linha {line}: {e}")
+            continue
+        if len(chunk) >= chunk_size:
+            _process_chunk(spec, chunk, dry_run, result)
+            chunk = []
+            if progress:
+                progress(rows_read, result)
+    if chunk:
+        _process_chunk(spec, chunk, dry_run, result)
+    if progress:
+        progress(rows_read, result)
+    return result
@@ -0,0 +1,405 @@
+import os
+import json
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import uuid
+import multiprocessing
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, select, update
+from werkzeug.datastructures import MultiDict
+from database import db, Job
+from exports import export_rows, iter_csv, export_filename, export_headers
+from imports import run_import, CLIENT_IMPORT, PRODUCT_IMPORT
+from reports import get_report, report_filename
+from changes import purge_tombstones
+
+DEFAULTS = {
+    'JOB_WORKERS': 2,                       # threads no processo web; 0 = só `flask run-jobs`
+    'JOB_DIR': None,                        # arquivos enviados e resultados (padrão: diretório temporário)
+    'JOB_POLL_INTERVAL': 2.0,               # segundos entre consultas à fila quando ociosa
+    'JOB_STALE_SECONDS': 300,               # job 'running' sem heartbeat por esse tempo é dado como falho
+    'JOB_RETENTION_SECONDS': 24 * 3600,     # jobs finalizados (e seus arquivos) são apagados depois disso
+    'JOB_MAX_ERRORS': 500,                  # erros guardados por job (o total fica em errors_count)
+}
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# kind -> função(JobContext) que devolve um dict com o resultado
+HANDLERS = {}
+
+
+class JobCancelled(Exception):
+    """Levantada pelo progresso quando o cancelamento do job foi pedido."""
+
+
+def job_handler(kind):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def _now():
+    return datetime.utcnow()
+
+
+class JobContext:
+    """O que o handler recebe: parâmetros, arquivo de entrada e como reportar progresso."""
+
+    def __init__(self, job, directory, max_errors):
+        self.id = job.id
+        self.kind = job.kind
+        self.params = json.loads(job.params or '{}')
+        self.input_path = job.input_path
+        self.directory = directory
+        self.max_errors = max_errors
+        self.result_path = None
+        self.result_name = None
+        self.result_mimetype = None
+
+    @property
+    def args(self):
+        """Parâmetros de query string da requisição original (lista de pares)."""
+        return MultiDict(self.params.get('args', []))
+
+    def output(self, suffix, name, mimetype):
+        """Caminho do arquivo de resultado, servido depois em /api/jobs/<id>/download."""
+        self.result_path = os.path.join(self.directory, f'{self.id}.result{suffix}')
+        self.result_name = name
+        self.result_mimetype = mimetype
+        return self.result_path
+
+    def progress(self, processed, errors=None):
+        """Grava o progresso numa conexão própria (fora da transação do handler) e
+        interrompe o handler se o cancelamento foi pedido."""
+        values = {'processed': processed, 'heartbeat_at': _now()}
+        if errors is not None:
+            values['errors_count'] = len(errors)
+            values['errors'] = json.dumps(errors[:self.max_errors], ensure_ascii=False)
+        with db.engine.begin() as connection:
+            connection.execute(update(Job).where(Job.id == self.id).values(**values))
+            cancel = connection.execute(select(Job.cancel_requested).where(Job.id == self.id)).scalar()
+        if cancel:
+            raise JobCancelled()
+
+
+# --- Fila ---
+def job_directory(app=None):
+    app = app or current_app
+    directory = app.config.get('JOB_DIR') or os.path.join(tempfile.gettempdir(), 'gbl_jobs')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def submit_job(kind, params=None, upload=None, created_by=None):
+    """Enfileira um job. `upload` (FileStorage) é salvo em disco antes do commit,
+    para o worker ler o arquivo sem depender da requisição."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Tipo de job desconhecido: {kind}")
+    job = Job(id=uuid.uuid4().hex, kind=kind, status='queued', created_by=created_by,
+              params=json.dumps(params or {}, ensure_ascii=False))
+    if upload is not None:
+        job.input_path = os.path.join(job_directory(), f'{job.id}.input')
+        upload.save(job.input_path)
+    db.session.add(job)
+    db.session.commit()
+    runner = current_app.extensions.get('job_runner')
+    if runner:
+        runner.wake()
+    return job
+
+
+def cancel_job(job):
+    """Cancela na hora se ainda está na fila; se está rodando, o handler para no próximo progresso."""
+    if job.status == 'queued':
+        cancelled = db.session.execute(
+            update(Job).where(Job.id == job.id, Job.status == 'queued')
+            .values(status='cancelled', message='Job cancelado', finished_at=_now())
+        ).rowcount
+        if cancelled:
+            db.session.commit()
+            _remove(job.input_path)
+            return True
+    if job.status in ACTIVE_STATUSES:
+        db.session.execute(update(Job).where(Job.id == job.id).values(cancel_requested=True))
+        db.session.commit()
+        return True
+    return False
+
+
+def claim_next(connection):
+    """Reivindica o job mais antigo da fila. O UPDATE condicional garante que só um
+    worker fica com cada job; no PostgreSQL, SKIP LOCKED evita disputa pela mesma linha."""
+    query = select(Job.id).where(Job.status == 'queued').order_by(Job.created_at).limit(1)
+    if connection.dialect.name == 'postgresql':
+        query = query.with_for_update(skip_locked=True)
+    job_id = connection.execute(query).scalar()
+    if job_id is None:
+        return None
+    now = _now()
+    claimed = connection.execute(
+        update(Job).where(Job.id == job_id, Job.status == 'queued')
+        .values(status='running', started_at=now, heartbeat_at=now)
+    ).rowcount
+    return job_id if claimed else None
+
+
+def fail_stale_jobs(connection, stale_seconds):
+    """Jobs 'running' sem heartbeat recente: o worker morreu (deploy, OOM, kill)."""
+    limit = _now() - timedelta(seconds=stale_seconds)
+    return connection.execute(
+        update(Job).where(Job.status == 'running', Job.heartbeat_at < limit)
+        .values(status='failed', message='Job interrompido: o worker parou de responder', finished_at=_now())
+    ).rowcount
+
+
+def purge_old_jobs(connection, retention_seconds):
+    limit = _now() - timedelta(seconds=retention_seconds)
+    rows = connection.execute(
+        select(Job.id, Job.input_path, Job.result_path)
+        .where(Job.status.not_in(ACTIVE_STATUSES), Job.finished_at < limit)
+    ).all()
+    for _, input_path, result_path in rows:
+        _remove(input_path)
+        _remove(result_path)
+    if rows:
+        connection.execute(Job.__table__.delete().where(Job.id.in_([row.id for row in rows])))
+    return len(rows)
+
+
+def _remove(path):
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _finish(job_id, **values):
+    with db.engine.begin() as connection:
+        connection.execute(update(Job).where(Job.id == job_id).values(finished_at=_now(), **values))
+
+
+def execute_job(job_id, directory, max_errors):
+    job = db.session.get(Job, job_id)
+    ctx = JobContext(job, directory, max_errors)
+    db.session.rollback()
+    try:
+        result = HANDLERS[ctx.kind](ctx) or {}
+    except JobCancelled:
+        db.session.rollback()
+        _remove(ctx.result_path)
+        _finish(job_id, status='cancelled', message='Job cancelado')
+        return
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erro no job {job_id} ({ctx.kind}): {str(e)}")
+        _remove(ctx.result_path)
+        _finish(job_id, status='failed', message=f'Erro ao executar job: {str(e)}')
+        return
+    except BaseException:
+        # Worker encerrado no meio do job (SIGTERM/Ctrl+C): registra antes de sair
+        db.session.rollback()
+        _finish(job_id, status='failed', message='Job interrompido: worker encerrado')
+        raise
+    finally:
+        _remove(ctx.input_path)
+        db.session.remove()
+    _finish(job_id, status='succeeded', message=result.pop('message', None),
+            result=json.dumps(result, ensure_ascii=False), result_path=ctx.result_path,
+            result_name=ctx.result_name, result_mimetype=ctx.result_mimetype)
+
+
+class JobRunner:
+    """Threads que consomem a fila do banco. Roda dentro do processo web (JOB_WORKERS)
+    ou em processos dedicados (`flask run-jobs`); as duas formas podem coexistir."""
+
+    def __init__(self, app, threads):
+        self.app = app
+        self.threads = threads
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+        self._next_maintenance = 0
+
+    def start(self):
+        with self._lock:
+            if self._started or self.threads < 1:
+                return
+            self._started = True
+        for n in range(self.threads):
+            threading.Thread(target=self._loop, name=f'job-worker-{n}', daemon=True).start()
+
+    def wake(self):
+        self.start()
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def run_forever(self):
+        """Roda na thread atual além das demais (usado pelos processos de `flask run-jobs`)."""
+        self.threads -= 1
+        self.start()
+        self._loop()
+
+    def _maintenance(self, connection):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_maintenance:
+                return
+            self._next_maintenance = now + 60
+        config = self.app.config
+        fail_stale_jobs(connection, config['JOB_STALE_SECONDS'])
+        purge_old_jobs(connection, config['JOB_RETENTION_SECONDS'])
+        purge_tombstones(connection, config['CHANGES_TOMBSTONE_DAYS'])
+
+    def _loop(self):
+        config = self.app.config
+        with self.app.app_context():
+            directory = job_directory(self.app)
+            while not self._stopping.is_set():
+                try:
+                    with db.engine.begin() as connection:
+                        self._maintenance(connection)
+                        job_id = claim_next(connection)
+                except Exception as e:
+                    print(f"Erro ao consultar a fila de jobs: {str(e)}")
+                    job_id = None
+                if job_id is None:
+                    self._wakeup.wait(config['JOB_POLL_INTERVAL'])
+                    self._wakeup.clear()
+                    continue
+                execute_job(job_id, directory, config['JOB_MAX_ERRORS'])
+
+
+def _sqlite_wal(dbapi_connection, connection_record):
+    # Em WAL leitores não bloqueiam escritores: o progresso de uma exportação é gravado
+    # enquanto o cursor da própria exportação continua aberto
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.close()
+
+
+def init_jobs(app):
+    for key, default in DEFAULTS.items():
+        app.config.setdefault(key, default)
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _sqlite_wal)
+    # As threads só sobem no primeiro uso (submissão ou consulta de job), para comandos de
+    # CLI como db-upgrade não consultarem uma fila que talvez ainda não exista
+    app.extensions['job_runner'] = JobRunner(app, int(app.config['JOB_WORKERS']))
+
+
+def ensure_runner():
+    runner = current_app.extensions.get('job_runner')
+    if runner:
+        runner.start()
+
+
+# --- Processos dedicados (flask run-jobs) ---
+def _exit_on_sigterm(signum, frame):
+    # Vira SystemExit dentro do job em andamento, que é marcado como interrompido
+    raise SystemExit(0)
+
+
+def _process_main(app_factory, threads):
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+    app = app_factory({'JOB_WORKERS': 0})
+    try:
+        JobRunner(app, threads).run_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+
+
+def run_job_processes(app_factory, processes, threads):
+    """Sobe `processes` processos (spawn) com `threads` threads cada, consumindo a fila."""
+    if processes <= 1:
+        _process_main(app_factory, threads)
+        return
+    context = multiprocessing.get_context('spawn')
+    children = [context.Process(target=_process_main, args=(app_factory, threads), name=f'jobs-{n}')
+                for n in range(processes)]
+    for child in children:
+        child.start()
+    try:
+        for child in children:
+            child.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for child in children:
+            if child.is_alive():
+                child.terminate()
+        for child in children:
+            child.join()
+
+
+# --- Serialização ---
+def job_to_dict(job):
+    return {
+        'id': job.id, 'kind': job.kind, 'status': job.status,
+        'processed': job.processed, 'errors_count': job.errors_count,
+        'errors': json.loads(job.errors) if job.errors else [],
+        'message': job.message, 'result': json.loads(job.result) if job.result else None,
+        'cancel_requested': job.cancel_requested,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'status_url': f'/api/jobs/{job.id}',
+        'download_url': f'/api/jobs/{job.id}/download' if job.status == 'succeeded' and job.result_path else None,
+    }
+
+
+# --- Tipos de job ---
+IMPORT_SPECS = {'clients': (CLIENT_IMPORT, 'clientes'), 'products': (PRODUCT_IMPORT, 'produtos')}
+
+
+@job_handler('import')
+def _import_job(ctx):
+    spec, label = IMPORT_SPECS[ctx.params['entity']]
+    dry_run = ctx.params.get('dry_run', False)
+    with open(ctx.input_path, 'rb') as f:
+        result = run_import(f, spec, ctx.params['chunk_size'], dry_run=dry_run,
+                            progress=lambda rows, partial: ctx.progress(rows, partial.errors))
+    prefix = "Simulação de importação" if dry_run else "Importação"
+    message = f"{prefix} de {label} concluída. Novos {label}: {result.imported}, {label.capitalize()} atualizados: {result.updated}."
+    if result.errors:
+        message += f" Erros encontrados: {len(result.errors)}."
+    return {'message': message, 'imported': result.imported, 'updated': result.updated, 'dry_run': dry_run}
+
+
+@job_handler('export')
+def _export_job(ctx):
+    entity = ctx.params['entity']
+    lines = export_rows(entity, ctx.args)
+    path = ctx.output('.csv', export_filename(entity), 'text/csv')
+    rows = 0
+
+    def progress(written):
+        nonlocal rows
+        rows = written
+        ctx.progress(written)
+
+    with open(path, 'wb') as f:
+        for chunk in iter_csv(lines, export_headers(entity), progress=progress):
+            f.write(chunk)
+    return {'message': f'Exportação concluída: {rows} linha(s).', 'rows': rows}
+
+
+@job_handler('report')
+def _report_job(ctx):
+    report = ctx.params['report']
+    order_id = ctx.params.get('order_id')
+    cached_path, hit = get_report(current_app.extensions['report_cache'], report, ctx.args, order_id)
+    # Copia do cache: o arquivo do cache pode ser removido pelo LRU antes do download
+    shutil.copyfile(cached_path, ctx.output('.pdf', report_filename(report), 'application/pdf'))
+    ctx.progress(1)
+    return {'message': 'Relatório gerado.', 'from_cache': hit}
@@ -0,0 +1,422 @@
+import os
+import re
+import json
+import glob
+import time
+import random
+import uuid
+import bisect
+import threading
+from flask import current_app, request, g
+from sqlalchemy import event
+from database import db
+
+DEFAULTS = {
+    'METRICS_ENABLED': True,
+    # Fração das requisições com instrumentação de SQL (consultas, tempo, linhas, consultas lentas).
+    # Latência, status e tamanho da resposta são registrados em todas.
+    'METRICS_SAMPLE_RATE': 1.0,
+    'METRICS_SLOW_QUERY_MS': 200,           # 0 desliga o log de consultas lentas
+    # Diretório compartilhado pelos workers (o gunicorn.conf.py define e limpa na partida): cada
+    # processo grava ali os seus contadores e o /metrics soma todos. Sem ele, só os do processo.
+    'METRICS_DIR': None,
+}
+
+# Segundos entre gravações dos contadores do processo em METRICS_DIR (só quando mudaram)
+FLUSH_INTERVAL = 1.0
+# Contadores de workers já encerrados (cada worker soma os seus ao sair, Metrics.retire)
+RETIRED_FILE = 'metrics-retired.json'
+LOCK_FILE = 'metrics.lock'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+# Requisições sem rota (404) ficam todas sob o mesmo rótulo, para não explodir a cardinalidade
+UNMATCHED = '<unmatched>'
+
+_local = threading.local()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def add(self, counts, total):
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.sum += total
+
+
+# Famílias expostas: (atributo, nome, ajuda, rótulos, buckets; None = contador)
+FAMILIES = (
+    ('requests', 'http_requests_total', 'Requisições atendidas.', ('endpoint', 'method', 'status'), None),
+    ('latency', 'http_request_duration_seconds', 'Latência das requisições.',
+     ('endpoint', 'method'), LATENCY_BUCKETS),
+    ('size', 'http_response_size_bytes', 'Tamanho do corpo das respostas.', ('endpoint', 'method'), SIZE_BUCKETS),
+    ('queries', 'http_request_db_queries', 'Consultas SQL por requisição (amostradas).',
+     ('endpoint',), QUERY_COUNT_BUCKETS),
+    ('sql', 'http_request_db_duration_seconds', 'Tempo total de SQL por requisição (amostradas).',
+     ('endpoint',), LATENCY_BUCKETS),
+    ('rows', 'http_request_db_rows_total', 'Linhas retornadas/afetadas informadas pelo driver (amostradas).',
+     ('endpoint',), None),
+    ('slow', 'http_request_db_slow_queries_total', 'Consultas acima de METRICS_SLOW_QUERY_MS (amostradas).',
+     ('endpoint',), None),
+)
+
+
+def empty_families():
+    return {family: {} for family, *_ in FAMILIES}
+
+
+def merge_families(families, snapshot):
+    """Soma em `families` um snapshot gravado em arquivo ({família: [[rótulos, valor], ...]})."""
+    for family, _, _, _, buckets in FAMILIES:
+        values = families[family]
+        for labels, value in snapshot.get(family, ()):
+            key = tuple(labels) if len(labels) > 1 else labels[0]
+            if buckets is None:
+                values[key] = values.get(key, 0) + value
+            else:
+                histogram = values.get(key)
+                if histogram is None:
+                    histogram = values[key] = Histogram(buckets)
+                histogram.add(*value)
+
+
+def _snapshot(families):
+    snapshot = {}
+    for family, _, _, _, buckets in FAMILIES:
+        snapshot[family] = [
+            [list(key) if isinstance(key, tuple) else [key],
+             value if buckets is None else [value.counts, value.sum]]
+            for key, value in families[family].items()
+        ]
+    return snapshot
+
+
+def _read(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        # Worker encerrado entre a listagem e a leitura (já somado em RETIRED_FILE)
+        return None
+
+
+def _write(path, snapshot):
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    os.replace(temporary, path)
+
+
+def read_directory(directory):
+    """Contadores de todos os processos em METRICS_DIR: workers ativos e já encerrados.
+
+    Os arquivos dos workers são lidos antes do de encerrados: um worker que sai entre as duas
+    leituras aparece na lista `workers` e não é contado duas vezes.
+    """
+    workers = {}
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        name = os.path.basename(path)
+        if name != RETIRED_FILE:
+            snapshot = _read(path)
+            if snapshot is not None:
+                workers[name[len('metrics-'):-len('.json')]] = snapshot
+    retired = _read(os.path.join(directory, RETIRED_FILE)) or {}
+    families = empty_families()
+    merge_families(families, retired)
+    skip = set(retired.get('workers', ()))
+    for worker, snapshot in workers.items():
+        if worker not in skip:
+            merge_families(families, snapshot)
+    return families
+
+
+def reset_directory(directory):
+    """Cria METRICS_DIR e apaga os contadores de uma execução anterior (partida do gunicorn)."""
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, 'metrics*')):
+        os.remove(path)
+
+
+class RequestTrace:
+    """Consultas SQL de uma requisição amostrada (preenchido pelos hooks do engine)."""
+
+    __slots__ = ('metrics', 'endpoint', 'queries', 'sql_seconds', 'rows', 'slow', 'started')
+
+    def __init__(self, metrics, endpoint):
+        self.metrics = metrics
+        self.endpoint = endpoint
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.slow = 0
+        self.started = None
+
+
+# --- Normalização de comandos para o log de consultas lentas ---
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAM = re.compile(r'%\([^)]*\)s|%s|(?<![:\w]):[A-Za-z_]\w*|\?')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_statement(statement):
+    """Troca literais e parâmetros por '?' e listas IN (?, ?, ...) por (...), em uma linha só."""
+    statement = _STRING.sub('?', statement)
+    statement = _PARAM.sub('?', statement)
+    statement = _NUMBER.sub('?', statement)
+    statement = _IN_LIST.sub('(...)', statement)
+    return _SPACES.sub(' ', statement).strip()
+
+
+# --- Hooks do SQLAlchemy ---
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = getattr(_local, 'trace', None)
+    if trace is not None:
+        trace.started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = getattr(_local, 'trace', None)
+    if trace is None or trace.started is None:
+        return
+    elapsed = time.perf_counter() - trace.started
+    trace.started = None
+    trace.queries += 1
+    trace.sql_seconds += elapsed
+    # SQLite não informa as linhas de um SELECT (rowcount -1): nesse caso não entram na soma
+    if cursor.rowcount and cursor.rowcount > 0:
+        trace.rows += cursor.rowcount
+    threshold = trace.metrics.slow_query_seconds
+    if threshold and elapsed >= threshold:
+        trace.slow += 1
+        trace.metrics.log_slow_query(trace.endpoint, elapsed, statement)
+
+
+class Metrics:
+    """Métricas por rota no formato de exposição do Prometheus.
+
+    Os contadores ficam em memória do processo. Com `directory` (METRICS_DIR), uma thread os
+    grava ali a cada FLUSH_INTERVAL segundos (se mudaram) e o /metrics soma os de todos os
+    workers do gunicorn, inclusive os já reciclados; sem ele, mostra só os do processo.
+    """
+
+    def __init__(self, sample_rate, slow_query_ms, logger, directory=None):
+        self.sample_rate = sample_rate
+        self.slow_query_seconds = slow_query_ms / 1000.0 if slow_query_ms else 0
+        self.logger = logger
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._dirty = False
+        self._flusher = None
+        self._worker = None     # (pid, id do arquivo): o pid sozinho pode ser reaproveitado
+        # requests: (endpoint, method, status) -> total; latency, size: (endpoint, method) -> Histogram;
+        # queries, sql: endpoint -> Histogram; rows, slow: endpoint -> total
+        self._families = empty_families()
+
+    def log_slow_query(self, endpoint, seconds, statement):
+        self.logger.warning("Consulta lenta (%.1f ms) em %s: %s", seconds * 1000, endpoint,
+                            normalize_statement(statement))
+
+    def record(self, endpoint, method, status, seconds, size, trace):
+        key = (endpoint, method)
+        families = self._families
+        with self._lock:
+            request_key = (endpoint, method, status)
+            families['requests'][request_key] = families['requests'].get(request_key, 0) + 1
+            self._histogram('latency', key, LATENCY_BUCKETS).observe(seconds)
+            if size is not None:
+                self._histogram('size', key, SIZE_BUCKETS).observe(size)
+            if trace is not None:
+                self._histogram('queries', endpoint, QUERY_COUNT_BUCKETS).observe(trace.queries)
+                self._histogram('sql', endpoint, LATENCY_BUCKETS).observe(trace.sql_seconds)
+                families['rows'][endpoint] = families['rows'].get(endpoint, 0) + trace.rows
+                families['slow'][endpoint] = families['slow'].get(endpoint, 0) + trace.slow
+            self._dirty = True
+        if self.directory and self._flusher is None:
+            self._start_flusher()
+
+    def _histogram(self, family, key, buckets):
+        histograms = self._families[family]
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(buckets)
+        return histogram
+
+    def _start_flusher(self):
+        # Na primeira requisição, já no processo do worker (depois do fork)
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            if self._dirty:
+                self.flush()
+
+    def _worker_id(self):
+        if self._worker is None or self._worker[0] != os.getpid():
+            self._worker = (os.getpid(), f'{os.getpid()}-{uuid.uuid4().hex[:8]}')
+        return self._worker[1]
+
+    def _path(self):
+        return os.path.join(self.directory, f'metrics-{self._worker_id()}.json')
+
+    def flush(self):
+        """Grava os contadores do processo em METRICS_DIR."""
+        with self._flush_lock:
+            if not self.directory:
+                return
+            with self._lock:
+                self._dirty = False
+                snapshot = _snapshot(self._families)
+            _write(self._path(), snapshot)
+
+    def retire(self):
+        """Fim do worker (gunicorn.conf.py, worker_exit): soma os contadores em RETIRED_FILE e apaga
+        o arquivo do processo, para os totais não voltarem na reciclagem nem o diretório crescer.
+
+        Workers saindo juntos se revezam pelo flock de LOCK_FILE.
+        """
+        import fcntl
+        with self._flush_lock:
+            if not self.directory:
+                return
+            with open(os.path.join(self.directory, LOCK_FILE), 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                retired_path = os.path.join(self.directory, RETIRED_FILE)
+                retired = _read(retired_path) or {}
+                families = empty_families()
+                merge_families(families, retired)
+                with self._lock:
+                    merge_families(families, _snapshot(self._families))
+                workers = sorted(set(retired.get('workers', ())) | {self._worker_id()})
+                _write(retired_path, {**_snapshot(families), 'workers': workers})
+                if os.path.exists(self._path()):
+                    os.remove(self._path())
+            # Nada mais é gravado por este processo
+            self.directory = None
+
+    def render(self, gauges=()):
+        """Texto no formato de exposição do Prometheus (text/plain; version=0.0.4)."""
+        if self.directory:
+            self.flush()
+            lines = _families_lines(read_directory(self.directory))
+        else:
+            with self._lock:
+                lines = _families_lines(self._families)
+        for name, help_text, value in gauges:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {_number(value)}']
+        return '\n'.join(lines) + '\n'
+
+
+# --- Formato de exposição ---
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, le=None):
+    values = values if isinstance(values, tuple) else (values,)
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _counter(lines, name, help_text, label_names, values):
+    lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+    for key in sorted(values):
+        lines.append(f'{name}{_labels(label_names, key)} {_number(values[key])}')
+
+
+def _families_lines(families):
+    lines = []
+    for family, name, help_text, label_names, buckets in FAMILIES:
+        if buckets is None:
+            _counter(lines, name, help_text, label_names, families[family])
+        else:
+            _histograms(lines, name, help_text, label_names, families[family])
+    return lines
+
+
+def _histograms(lines, name, help_text, label_names, histograms):
+    lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for key in sorted(histograms):
+        histogram = histograms[key]
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(label_names, key, _number(bound))} {cumulative}')
+        cumulative += histogram.counts[-1]
+        lines.append(f'{name}_bucket{_labels(label_names, key, "+Inf")} {cumulative}')
+        lines.append(f'{name}_sum{_labels(label_names, key)} {_number(histogram.sum)}')
+        lines.append(f'{name}_count{_labels(label_names, key)} {cumulative}')
+
+
+# --- Integração com o Flask ---
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    metrics = get_metrics()
+    if metrics.sample_rate >= 1 or (metrics.sample_rate > 0 and random.random() < metrics.sample_rate):
+        rule = request.url_rule
+        _local.trace = RequestTrace(metrics, rule.rule if rule else UNMATCHED)
+
+
+def _finish_request(response):
+    started = g.pop('metrics_started', None)
+    trace = getattr(_local, 'trace', None)
+    _local.trace = None
+    if started is None:
+        return response
+    rule = request.url_rule
+    get_metrics().record(rule.rule if rule else UNMATCHED, request.method, response.status_code,
+                          time.perf_counter() - started, response.content_length, trace)
+    return response
+
+
+def _clear_trace(exc=None):
+    # Garante que uma requisição interrompida não deixe o trace preso à thread
+    _local.trace = None
+
+
+def get_metrics():
+    return current_app.extensions['metrics']
+
+
+def init_metrics(app):
+    for key, default in DEFAULTS.items():
+        app.config.setdefault(key, default)
+    if not app.config['METRICS_ENABLED']:
+        app.extensions['metrics'] = None
+        return
+    directory = app.config['METRICS_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    app.extensions['metrics'] = Metrics(
+        float(app.config['METRICS_SAMPLE_RATE']), float(app.config['METRICS_SLOW_QUERY_MS']), app.logger, directory
+    )
+    with app.app_context():
+        engine = db.engine
+    # Os hooks só medem quando a thread atende uma requisição amostrada
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_clear_trace)
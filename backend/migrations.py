@@ -0,0 +1,246 @@
+from datetime import datetime
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, select, update, func, inspect, case
+from sqlalchemy.schema import CreateIndex
+from database import (
+    db, User, Client, Order, Product, SalesDaily, SalesMonthly, DataVersion, Job, StockMovement, Tombstone,
+    OutboxEvent, OrderArchive, RevokedToken, entity_version
+)
+from data_versions import bump_data_versions
+from rollup import rebuild_rollup_on
+from search import POSTGRES_SEARCH_SETUP, POSTGRES_SEARCH_INDEXES
+from stock import record_opening_balances
+
+# Controle de versão do schema. Fica fora de db.metadata para não ser criada por create_all.
+schema_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', schema_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+# Lista ordenada de (versão, descrição, função, transacional)
+MIGRATIONS = []
+
+
+def migration(version, description, transactional=True):
+    """Registra uma migração. As migrações devem ser idempotentes: num banco novo as tabelas
+    já nascem com a forma atual dos modelos, então cada passo verifica antes de alterar."""
+    def register(fn):
+        MIGRATIONS.append((version, description, fn, transactional))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+# --- Helpers ---
+def create_tables(connection, *models):
+    for model in models:
+        model.__table__.create(connection, checkfirst=True)
+
+
+def create_indexes_online(connection, model, *index_names):
+    """Cria índices sem bloquear escritas: no PostgreSQL usa CREATE INDEX CONCURRENTLY
+    (a conexão precisa estar em autocommit); nos demais bancos, CREATE INDEX IF NOT EXISTS."""
+    indexes = {index.name: index for index in model.__table__.indexes}
+    for name in index_names:
+        ddl = str(CreateIndex(indexes[name], if_not_exists=True).compile(dialect=connection.dialect))
+        if connection.dialect.name == 'postgresql':
+            # Se um CONCURRENTLY anterior falhou, o índice fica INVALID: remova-o antes de rodar de novo
+            ddl = ddl.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1)
+        connection.exec_driver_sql(ddl)
+
+
+def add_column(connection, model, column_name):
+    table = model.__table__
+    existing = {c['name'] for c in inspect(connection).get_columns(table.name)}
+    if column_name in existing:
+        return
+    column = table.c[column_name]
+    column_type = column.type.compile(dialect=connection.dialect)
+    preparer = connection.dialect.identifier_preparer
+    connection.exec_driver_sql(
+        f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column_type}"
+    )
+
+
+# --- Migrações ---
+@migration(1, 'Tabelas iniciais: user, client, order, product')
+def _initial_tables(connection):
+    create_tables(connection, User, Client, Order, Product)
+
+
+@migration(2, 'Rollup de vendas diário e mensal (com backfill)')
+def _sales_rollup(connection):
+    create_tables(connection, SalesDaily, SalesMonthly)
+    rebuild_rollup_on(connection)
+
+
+@migration(3, 'Índices das consultas mais frequentes', transactional=False)
+def _hot_path_indexes(connection):
+    create_indexes_online(connection, Order, 'ix_order_client_id_created_at', 'ix_order_created_at_id', 'ix_order_status_created_at')
+    create_indexes_online(connection, Product, 'ix_product_created_at_id', 'ix_product_low_stock')
+    create_indexes_online(connection, Client, 'ix_client_created_at_id')
+
+
+@migration(4, 'Versões de dados por entidade (chave de caches persistentes)')
+def _data_versions(connection):
+    create_tables(connection, DataVersion)
+
+
+@migration(5, 'Fila de jobs em segundo plano')
+def _jobs(connection):
+    create_tables(connection, Job)
+
+
+@migration(6, 'Índices de busca (trigramas, sem acento) de clientes e produtos', transactional=False)
+def _search_indexes(connection):
+    # Só no PostgreSQL; nos demais bancos a busca usa um índice em memória (search.py)
+    if connection.dialect.name != 'postgresql':
+        return
+    for ddl in POSTGRES_SEARCH_SETUP + POSTGRES_SEARCH_INDEXES:
+        connection.exec_driver_sql(ddl)
+
+
+
+@migration(7, 'Livro razão de movimentações de estoque (com saldo inicial dos produtos)')
+def _stock_movements(connection):
+    create_tables(connection, StockMovement)
+    record_opening_balances(connection)
+
+
+CHANGE_FEED_MODELS = ((Client, 'clients'), (Product, 'products'), (Order, 'orders'))
+
+
+@migration(8, 'Feed de alterações: updated_at, change_version e tombstones')
+def _change_feed(connection):
+    for model, _ in CHANGE_FEED_MODELS:
+        add_column(connection, model, 'updated_at')
+        add_column(connection, model, 'change_version')
+    create_tables(connection, Tombstone)
+    # Linhas existentes entram no feed com uma versão nova, posterior a qualquer cursor já emitido
+    bump_data_versions(connection, [entity for _, entity in CHANGE_FEED_MODELS])
+    for model, entity in CHANGE_FEED_MODELS:
+        table = model.__table__
+        connection.execute(update(table).where(table.c.change_version.is_(None))
+                           .values(change_version=entity_version(entity), updated_at=table.c.created_at))
+
+
+@migration(9, 'Índices do feed de alterações', transactional=False)
+def _change_feed_indexes(connection):
+    create_indexes_online(connection, Client, 'ix_client_change_version_id')
+    create_indexes_online(connection, Product, 'ix_product_change_version_id')
+    create_indexes_online(connection, Order, 'ix_order_change_version_id')
+
+
+@migration(10, 'Outbox de eventos de pedidos (webhooks)')
+def _outbox(connection):
+    create_tables(connection, OutboxEvent)
+
+
+@migration(11, 'Índice do arquivo de pedidos antigos')
+def _order_archive(connection):
+    create_tables(connection, OrderArchive)
+
+
+@migration(12, 'Revogação de tokens compartilhada entre processos')
+def _token_revocation(connection):
+    add_column(connection, User, 'tokens_valid_after')
+    create_tables(connection, RevokedToken)
+
+
+@migration(13, 'Movimentações de estoque impedem a exclusão do produto (ON DELETE RESTRICT)')
+def _stock_movement_restrict(connection):
+    # O SQLite roda sem PRAGMA foreign_keys: lá a exclusão é barrada só pela rota
+    if connection.dialect.name != 'postgresql':
+        return
+    for fk in inspect(connection).get_foreign_keys('stock_movement'):
+        if fk['referred_table'] != 'product' or (fk['options'].get('ondelete') or '').upper() == 'RESTRICT':
+            continue
+        connection.exec_driver_sql(f'ALTER TABLE stock_movement DROP CONSTRAINT "{fk["name"]}"')
+        connection.exec_driver_sql(
+            f'ALTER TABLE stock_movement ADD CONSTRAINT "{fk["name"]}" FOREIGN KEY (product_id) '
+            f'REFERENCES product (id) ON DELETE RESTRICT'
+        )
+
+
+@migration(14, 'created_at obrigatório em clientes, produtos e pedidos (paginação por keyset)')
+def _created_at_not_null(connection):
+    # O cursor compara (created_at, id): linhas com created_at nulo sumiriam das páginas.
+    # Preenche com updated_at (ou agora), com nova versão no feed, e recalcula o rollup de vendas
+    now = datetime.utcnow()
+    missing = [(model.__table__, entity) for model, entity in CHANGE_FEED_MODELS
+               if connection.execute(select(func.count()).select_from(model.__table__)
+                                     .where(model.__table__.c.created_at.is_(None))).scalar()]
+    if missing:
+        bump_data_versions(connection, [entity for _, entity in missing])
+    for table, entity in missing:
+        connection.execute(update(table).where(table.c.created_at.is_(None))
+                           .values(created_at=func.coalesce(table.c.updated_at, now),
+                                   change_version=entity_version(entity)))
+    if any(table is Order.__table__ for table, _ in missing):
+        rebuild_rollup_on(connection)
+    # No SQLite a coluna de bancos antigos continua aceitando nulo; os defaults do modelo preenchem
+    if connection.dialect.name == 'postgresql':
+        for model, _ in CHANGE_FEED_MODELS:
+            connection.exec_driver_sql(f'ALTER TABLE "{model.__tablename__}" ALTER COLUMN created_at SET NOT NULL')
+
+
+@migration(15, 'Geração de tokens por usuário (revogação exata, sem depender do relógio)')
+def _token_generation(connection):
+    add_column(connection, User, 'token_generation')
+    # Quem já teve tokens invalidados começa na geração 1: tokens antigos (sem geração) valem como 0
+    table = User.__table__
+    connection.execute(update(table).where(table.c.token_generation.is_(None)).values(
+        token_generation=case((table.c.tokens_valid_after.is_not(None), 1), else_=0)))
+    if connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql(
+            'ALTER TABLE "user" ALTER COLUMN token_generation SET DEFAULT 0, ALTER COLUMN token_generation SET NOT NULL')
+
+
+# --- Execução ---
+def applied_versions(connection):
+    schema_migrations.create(connection, checkfirst=True)
+    return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def current_version():
+    with db.engine.begin() as connection:
+        schema_migrations.create(connection, checkfirst=True)
+        return connection.execute(select(func.max(schema_migrations.c.version))).scalar() or 0
+
+
+def pending_migrations():
+    with db.engine.begin() as connection:
+        applied = applied_versions(connection)
+    return [(version, description) for version, description, _, _ in MIGRATIONS if version not in applied]
+
+
+def upgrade(target=None):
+    """Aplica as migrações pendentes até `target` (ou todas), cada uma na sua transação.
+
+    Retorna a lista de versões aplicadas.
+    """
+    with db.engine.begin() as connection:
+        applied = applied_versions(connection)
+    done = []
+    for version, description, fn, transactional in MIGRATIONS:
+        if version in applied or (target is not None and version > target):
+            continue
+        if transactional:
+            with db.engine.begin() as connection:
+                fn(connection)
+                _record(connection, version, description)
+        else:
+            with db.engine.connect() as connection:
+                fn(connection.execution_options(isolation_level='AUTOCOMMIT'))
+            with db.engine.begin() as connection:
+                _record(connection, version, description)
+        done.append(version)
+    return done
+
+
+def _record(connection, version, description):
+    connection.execute(schema_migrations.insert().values(
+        version=version, description=description, applied_at=datetime.utcnow()
+    ))
@@ -0,0 +1,81 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import select
+from database import db, Client, Order
+
+# Campos aceitos na criação/edição -> conversão
+ORDER_FIELDS = {
+    'order_number': str, 'client_id': int, 'material': str, 'thickness': str,
+    'width': float, 'length': float, 'quantity': int, 'value': float,
+    'observations': str, 'status': str,
+}
+REQUIRED_FIELDS = ('client_id', 'material', 'thickness', 'width', 'length', 'quantity', 'value')
+
+# Nomes usados pela tela de pedidos (/api/pedidos) -> nomes do modelo
+PEDIDO_FIELDS = {
+    'numero': 'order_number', 'cliente_id': 'client_id', 'material': 'material',
+    'espessura': 'thickness', 'largura': 'width', 'comprimento': 'length',
+    'quantidade': 'quantity', 'valor': 'value', 'observacoes': 'observations', 'status': 'status',
+}
+
+
+class OrderError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _convert(field, value):
+    if value is None or value == '':
+        return None
+    convert = ORDER_FIELDS[field]
+    try:
+        if convert is float:
+            return float(str(value).replace(',', '.'))
+        return convert(value)
+    except (TypeError, ValueError):
+        raise OrderError(f"Valor inválido para '{field}': {value}")
+
+
+def parse_order(data, partial=False):
+    """Valida o corpo da requisição e devolve só os campos do modelo, já convertidos."""
+    if not isinstance(data, dict):
+        raise OrderError("Corpo da requisição inválido")
+    values = {field: _convert(field, data[field]) for field in ORDER_FIELDS if field in data}
+    required = [f for f in REQUIRED_FIELDS if (f in values or not partial) and values.get(f) is None]
+    if required:
+        raise OrderError(f"Campos obrigatórios não informados: {', '.join(required)}")
+    if 'status' in values and not values['status']:
+        raise OrderError("Status não pode ser vazio")
+    for field in ('width', 'length', 'quantity'):
+        if values.get(field) is not None and values[field] <= 0:
+            raise OrderError(f"'{field}' deve ser maior que zero")
+    if 'order_number' in values and not values['order_number']:
+        # Sem número: a criação gera um; a edição mantém o atual
+        del values['order_number']
+    return values
+
+
+def pedido_to_fields(data):
+    """Converte o formato da tela de pedidos (campos em português) para o do modelo."""
+    if not isinstance(data, dict):
+        raise OrderError("Corpo da requisição inválido")
+    return {field: data[key] for key, field in PEDIDO_FIELDS.items() if key in data}
+
+
+def new_order_number():
+    return f"PED-{datetime.utcnow():%Y%m%d}-{uuid.uuid4().hex[:6].upper()}"
+
+
+def check_references(client_id, order_number, order_id=None):
+    """Valida existência do cliente e unicidade do número do pedido numa única consulta."""
+    client_exists = select(Client.id).where(Client.id == client_id).exists()
+    taken = select(Order.id).where(Order.order_number == order_number)
+    if order_id is not None:
+        taken = taken.where(Order.id != order_id)
+    row = db.session.execute(select(client_exists.label('client'), taken.exists().label('taken'))).one()
+    if not row.client:
+        raise OrderError("Cliente não encontrado")
+    if row.taken:
+        raise OrderError(f"Já existe um pedido com o número {order_number}", 409)
+
@@ -0,0 +1,392 @@
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event, select, update, insert, delete, func, exists, and_, or_
+from sqlalchemy.orm import Session, aliased
+from database import db, Client, Order, OutboxEvent
+from serializers import PEDIDO, dumps
+
+DEFAULTS = {
+    'ORDER_WEBHOOK_URL': None,              # sem URL os eventos de pedidos não são gravados
+    'ORDER_WEBHOOK_SECRET': None,           # assina o corpo com HMAC-SHA256 (X-Webhook-Signature)
+    'ORDER_WEBHOOK_TIMEOUT': 10,            # segundos por requisição
+    # pedido: corpo = o pedido plano (cliente_nome, valor, data...), um por POST, como a tela de
+    # pedidos enviava ao n8n; envelope: {id, event, order_id, occurred_at, data}, com lotes
+    'ORDER_WEBHOOK_FORMAT': 'pedido',
+    'ORDER_WEBHOOK_EVENTS': 'order.created',    # tipos gravados: order.created,order.updated,order.deleted
+    'ORDER_WEBHOOK_BATCH_SIZE': 1,          # eventos por POST (só envelope); acima de 1 o corpo é {"events": [...]}
+    'OUTBOX_DISPATCHER': True,              # thread no processo web; False = só `flask run-outbox`
+    'OUTBOX_CLAIM_SIZE': 100,               # eventos reivindicados por consulta à fila
+    'OUTBOX_CONCURRENCY': 4,                # POSTs simultâneos por dispatcher
+    'OUTBOX_MAX_ATTEMPTS': 8,               # depois disso o evento vai para 'dead'
+    'OUTBOX_BACKOFF_BASE': 2.0,             # segundos; dobra a cada falha (com jitter)
+    'OUTBOX_BACKOFF_MAX': 3600,
+    'OUTBOX_LEASE_SECONDS': 300,            # envio sem resposta por esse tempo pode ser reivindicado de novo
+    'OUTBOX_POLL_INTERVAL': 2.0,            # segundos entre consultas à fila quando ociosa
+    'OUTBOX_RETENTION_SECONDS': 7 * 24 * 3600,  # eventos entregues são apagados depois disso
+}
+
+PENDING_STATUSES = ('pending', 'sending')
+WEBHOOK_FORMATS = ('pedido', 'envelope')
+LATENCY_SAMPLE = 1000
+
+
+def _now():
+    return datetime.utcnow()
+
+
+# --- Gravação dos eventos (mesma transação da alteração) ---
+def _webhook_enabled():
+    return has_app_context() and bool(current_app.config.get('ORDER_WEBHOOK_URL'))
+
+
+def enqueue_order_events(connection, events):
+    """Grava eventos [(tipo, id do pedido, dados)] na transação da conexão informada.
+
+    Escritas de pedidos fora do ORM (UPDATE/INSERT em lote) devem chamar esta função.
+    """
+    if not events or not _webhook_enabled():
+        return 0
+    wanted = {name.strip() for name in current_app.config['ORDER_WEBHOOK_EVENTS'].split(',')}
+    events = [event for event in events if event[0] in wanted]
+    if not events:
+        return 0
+    now = _now()
+    connection.execute(insert(OutboxEvent), [
+        {'event_type': event_type, 'order_id': order_id, 'payload': dumps(data).decode('utf-8'),
+         'status': 'pending', 'attempts': 0, 'next_attempt_at': now, 'created_at': now}
+        for event_type, order_id, data in events
+    ])
+    return len(events)
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_order_events(session, flush_context):
+    if not _webhook_enabled():
+        return
+    events = []
+    created = [obj for obj in session.new if isinstance(obj, Order)]
+    if created:
+        # Pedido novo não carrega o cliente pelo relacionamento: o nome vem numa consulta só
+        names = dict(session.connection().execute(
+            select(Client.id, Client.name).where(Client.id.in_({obj.client_id for obj in created}))
+        ).all())
+        for obj in created:
+            events.append(('order.created', obj.id, PEDIDO.dump(obj) | {'cliente_nome': names.get(obj.client_id)}))
+    for obj in session.dirty:
+        if isinstance(obj, Order) and session.is_modified(obj, include_collections=False):
+            events.append(('order.updated', obj.id, PEDIDO.dump(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, Order):
+            events.append(('order.deleted', obj.id, {'id': obj.id, 'numero': obj.order_number,
+                                                     'cliente_id': obj.client_id}))
+    queue_session_events(session, events)
+
+
+def queue_session_events(session, events):
+    """Grava os eventos na transação da sessão e acorda o dispatcher depois do commit."""
+    if enqueue_order_events(session.connection(), events):
+        session.info['outbox_events'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_dispatcher(session):
+    if session.info.pop('outbox_events', False) and has_app_context():
+        dispatcher = current_app.extensions.get('outbox_dispatcher')
+        if dispatcher:
+            dispatcher.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_flag(session):
+    session.info.pop('outbox_events', None)
+
+
+# --- Fila ---
+def claim_events(connection, limit, lease_seconds):
+    """Reivindica até `limit` eventos prontos para envio, respeitando a ordem por pedido: um
+    evento só sai quando nenhum anterior do mesmo pedido está pendente ou em envio.
+
+    Eventos 'sending' com prazo vencido (dispatcher que morreu no meio) voltam a ser elegíveis;
+    a entrega é pelo menos uma vez, e o id do evento vai no header para o receptor deduplicar.
+    """
+    now = _now()
+    earlier = aliased(OutboxEvent)
+    due = or_(and_(OutboxEvent.status == 'pending', OutboxEvent.next_attempt_at <= now),
+              and_(OutboxEvent.status == 'sending', OutboxEvent.locked_until < now))
+    blocked = exists().where(earlier.order_id == OutboxEvent.order_id, earlier.id < OutboxEvent.id,
+                             earlier.status.in_(PENDING_STATUSES))
+    query = select(OutboxEvent.id).where(due, ~blocked).order_by(OutboxEvent.id).limit(limit)
+    if connection.dialect.name == 'postgresql':
+        query = query.with_for_update(of=OutboxEvent, skip_locked=True)
+    ids = list(connection.execute(query).scalars())
+    if not ids:
+        return []
+    # O UPDATE condicional garante que só um dispatcher fica com cada evento
+    rows = connection.execute(
+        update(OutboxEvent).where(OutboxEvent.id.in_(ids), due)
+        .values(status='sending', locked_until=now + timedelta(seconds=lease_seconds),
+                attempts=OutboxEvent.attempts + 1)
+        .returning(OutboxEvent.id, OutboxEvent.event_type, OutboxEvent.order_id, OutboxEvent.payload,
+                   OutboxEvent.created_at, OutboxEvent.attempts)
+    ).all()
+    return sorted(rows, key=lambda row: row.id)
+
+
+def backoff_seconds(attempts, base, maximum):
+    """Espera antes da próxima tentativa: exponencial, com jitter para não sincronizar as falhas."""
+    delay = min(maximum, base * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def record_results(connection, delivered, failed, config):
+    """Grava o resultado de um ciclo: ids entregues e [(evento, erro)] que falharam."""
+    now = _now()
+    if delivered:
+        connection.execute(
+            update(OutboxEvent).where(OutboxEvent.id.in_(delivered))
+            .values(status='delivered', delivered_at=now, locked_until=None, last_error=None)
+        )
+    for row, error in failed:
+        values = {'locked_until': None, 'last_error': error[:2000]}
+        if row.attempts >= config['OUTBOX_MAX_ATTEMPTS']:
+            values['status'] = 'dead'
+        else:
+            values['status'] = 'pending'
+            values['next_attempt_at'] = now + timedelta(seconds=backoff_seconds(
+                row.attempts, float(config['OUTBOX_BACKOFF_BASE']), float(config['OUTBOX_BACKOFF_MAX'])))
+        connection.execute(update(OutboxEvent).where(OutboxEvent.id == row.id).values(**values))
+
+
+def purge_delivered(connection, retention_seconds):
+    limit = _now() - timedelta(seconds=retention_seconds)
+    return connection.execute(
+        delete(OutboxEvent).where(OutboxEvent.status == 'delivered', OutboxEvent.delivered_at < limit)
+    ).rowcount
+
+
+def retry_dead_events():
+    """Devolve os eventos 'dead' à fila (depois de corrigir o destino)."""
+    return db.session.execute(
+        update(OutboxEvent).where(OutboxEvent.status == 'dead')
+        .values(status='pending', attempts=0, next_attempt_at=_now(), last_error=None)
+    ).rowcount
+
+
+# --- Entrega ---
+def _envelope(row):
+    return {'id': row.id, 'event': row.event_type, 'order_id': row.order_id,
+            'occurred_at': row.created_at.isoformat(), 'data': json.loads(row.payload)}
+
+
+def _pedido(row):
+    # Mesmo corpo que a tela de pedidos mandava ao n8n: o pedido plano, com a data sem horário
+    pedido = json.loads(row.payload)
+    if pedido.get('data'):
+        pedido['data'] = pedido['data'][:10]
+    return pedido
+
+
+def batch_size(config):
+    if config['ORDER_WEBHOOK_FORMAT'] == 'pedido':
+        return 1
+    return max(1, int(config['ORDER_WEBHOOK_BATCH_SIZE']))
+
+
+def post_events(rows, config):
+    """POST de um lote no webhook. Levanta exceção em erro de rede ou status fora de 2xx."""
+    if config['ORDER_WEBHOOK_FORMAT'] == 'pedido':
+        body = dumps(_pedido(rows[0]))
+    elif len(rows) == 1:
+        body = dumps(_envelope(rows[0]))
+    else:
+        body = dumps({'events': [_envelope(row) for row in rows]})
+    headers = {'Content-Type': 'application/json', 'User-Agent': 'gbl-outbox',
+               'X-Webhook-Event-Ids': ','.join(str(row.id) for row in rows)}
+    if len(rows) == 1:
+        headers['X-Webhook-Event'] = rows[0].event_type
+    secret = config.get('ORDER_WEBHOOK_SECRET')
+    if secret:
+        signature = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+        headers['X-Webhook-Signature'] = f'sha256={signature}'
+    request = urllib.request.Request(config['ORDER_WEBHOOK_URL'], data=body, headers=headers, method='POST')
+    with urllib.request.urlopen(request, timeout=float(config['ORDER_WEBHOOK_TIMEOUT'])) as response:
+        response.read()
+
+
+def _describe(error):
+    if isinstance(error, urllib.error.HTTPError):
+        return f'HTTP {error.code} {error.reason}'
+    if isinstance(error, urllib.error.URLError):
+        return f'Erro de conexão: {error.reason}'
+    return f'{type(error).__name__}: {error}'
+
+
+class OutboxDispatcher:
+    """Thread que entrega os eventos da outbox: reivindica um lote, envia com até
+    OUTBOX_CONCURRENCY POSTs simultâneos e grava os resultados. Roda no processo web
+    (OUTBOX_DISPATCHER) ou em processo dedicado (`flask run-outbox`); vários dispatchers
+    podem coexistir, porque cada evento é reivindicado por um só."""
+
+    def __init__(self, app):
+        self.app = app
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+        self._next_maintenance = 0
+        self.in_flight = 0
+
+    @property
+    def running(self):
+        return self._started and not self._stopping.is_set()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self.run_forever, name='outbox-dispatcher', daemon=True).start()
+
+    def wake(self):
+        self.start()
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def run_forever(self):
+        config = self.app.config
+        with self.app.app_context(), ThreadPoolExecutor(int(config['OUTBOX_CONCURRENCY'])) as pool:
+            while not self._stopping.is_set():
+                try:
+                    sent = self.dispatch_once(pool)
+                except Exception as e:
+                    print(f"Erro no dispatcher da outbox: {str(e)}")
+                    sent = 0
+                if not sent:
+                    self._wakeup.wait(float(config['OUTBOX_POLL_INTERVAL']))
+                    self._wakeup.clear()
+
+    def dispatch_once(self, pool):
+        """Um ciclo: reivindica, envia e grava. Retorna quantos eventos foram processados."""
+        config = self.app.config
+        with db.engine.begin() as connection:
+            self._maintenance(connection)
+            rows = claim_events(connection, int(config['OUTBOX_CLAIM_SIZE']), int(config['OUTBOX_LEASE_SECONDS']))
+        if not rows:
+            return 0
+        size = batch_size(config)
+        batches = [rows[start:start + size] for start in range(0, len(rows), size)]
+        # Eventos do mesmo pedido nunca estão no mesmo ciclo (ver claim_events), então a
+        # concorrência não troca a ordem de entrega de um pedido
+        self.in_flight = len(rows)
+        try:
+            outcomes = list(pool.map(lambda batch: self._send(batch, config), batches))
+        finally:
+            self.in_flight = 0
+        delivered, failed = [], []
+        for batch, error in zip(batches, outcomes):
+            if error is None:
+                delivered.extend(row.id for row in batch)
+            else:
+                failed.extend((row, error) for row in batch)
+        with db.engine.begin() as connection:
+            record_results(connection, delivered, failed, config)
+        return len(rows)
+
+    @staticmethod
+    def _send(batch, config):
+        try:
+            post_events(batch, config)
+            return None
+        except Exception as e:
+            return _describe(e)
+
+    def _maintenance(self, connection):
+        now = time.monotonic()
+        if now < self._next_maintenance:
+            return
+        self._next_maintenance = now + 60
+        purge_delivered(connection, self.app.config['OUTBOX_RETENTION_SECONDS'])
+
+
+# --- Situação da fila ---
+def _percentile(values, fraction):
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(fraction * len(values)))], 3)
+
+
+def outbox_status():
+    """Backlog, idade do evento pendente mais antigo e latência de entrega recente."""
+    counts = dict(db.session.execute(
+        select(OutboxEvent.status, func.count()).group_by(OutboxEvent.status)
+    ).all())
+    oldest = db.session.scalar(
+        select(func.min(OutboxEvent.created_at)).where(OutboxEvent.status.in_(PENDING_STATUSES))
+    )
+    recent = db.session.execute(
+        select(OutboxEvent.created_at, OutboxEvent.delivered_at)
+        .where(OutboxEvent.status == 'delivered')
+        .order_by(OutboxEvent.delivered_at.desc()).limit(LATENCY_SAMPLE)
+    ).all()
+    latencies = sorted((delivered - created).total_seconds() for created, delivered in recent)
+    last_error = db.session.execute(
+        select(OutboxEvent.id, OutboxEvent.last_error).where(OutboxEvent.last_error.is_not(None))
+        .order_by(OutboxEvent.id.desc()).limit(1)
+    ).first()
+    dispatcher = current_app.extensions.get('outbox_dispatcher')
+    now = _now()
+    return {
+        'enabled': bool(current_app.config.get('ORDER_WEBHOOK_URL')),
+        'counts': {status: counts.get(status, 0) for status in ('pending', 'sending', 'delivered', 'dead')},
+        'backlog': sum(counts.get(status, 0) for status in PENDING_STATUSES),
+        'oldest_pending_age_seconds': round((now - oldest).total_seconds(), 3) if oldest else None,
+        'delivery_latency_seconds': {
+            'samples': len(latencies), 'p50': _percentile(latencies, 0.5), 'p95': _percentile(latencies, 0.95),
+            'max': round(latencies[-1], 3) if latencies else None,
+        },
+        'last_error': {'event_id': last_error.id, 'message': last_error.last_error} if last_error else None,
+        'dispatcher': {'running': bool(dispatcher and dispatcher.running),
+                       'in_flight': dispatcher.in_flight if dispatcher else 0},
+    }
+
+
+def _start_dispatcher():
+    # Sobe no primeiro request do processo, para eventos pendentes de antes de um restart saírem
+    dispatcher = current_app.extensions.get('outbox_dispatcher')
+    if dispatcher:
+        dispatcher.start()
+
+
+def init_outbox(app):
+    for key, default in DEFAULTS.items():
+        app.config.setdefault(key, default)
+    if app.config['ORDER_WEBHOOK_FORMAT'] not in WEBHOOK_FORMATS:
+        raise ValueError(f"ORDER_WEBHOOK_FORMAT inválido: {app.config['ORDER_WEBHOOK_FORMAT']}")
+    if app.config['ORDER_WEBHOOK_URL'] and app.config['OUTBOX_DISPATCHER']:
+        app.extensions['outbox_dispatcher'] = OutboxDispatcher(app)
+        app.before_request(_start_dispatcher)
+    else:
+        app.extensions['outbox_dispatcher'] = None
+
+
+def run_outbox(app_factory):
+    """Dispatcher em primeiro plano (flask run-outbox), para usar com OUTBOX_DISPATCHER=0 no web."""
+    app = app_factory({'OUTBOX_DISPATCHER': False, 'JOB_WORKERS': 0})
+    if not app.config['ORDER_WEBHOOK_URL']:
+        raise SystemExit("ORDER_WEBHOOK_URL não configurada")
+    try:
+        OutboxDispatcher(app).run_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,217 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+from database import db, Client, Order, Product, StockMovement
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Chaves de ordenação permitidas por entidade (nome do parâmetro -> coluna).
+# Apenas colunas NOT NULL entram aqui, pois o cursor compara (coluna, id) e linhas com nulo
+# ficariam fora das páginas (created_at é obrigatório desde a migração 14).
+CLIENT_SORT_KEYS = {
+    "created_at": Client.created_at,
+    "name": Client.name,
+    "id": Client.id,
+}
+PRODUCT_SORT_KEYS = {
+    "created_at": Product.created_at,
+    "name": Product.name,
+    "price": Product.price,
+    "stock": Product.stock,
+    "id": Product.id,
+}
+ORDER_SORT_KEYS = {
+    "created_at": Order.created_at,
+    "order_number": Order.order_number,
+    "value": Order.value,
+    "status": Order.status,
+    "id": Order.id,
+}
+STOCK_MOVEMENT_SORT_KEYS = {
+    "id": StockMovement.id,
+    "created_at": StockMovement.created_at,
+}
+
+
+class PaginationError(ValueError):
+    """Parâmetro de listagem inválido (limite, cursor, ordenação ou filtro)."""
+
+
+class Page:
+    def __init__(self, items, paginated, next_cursor=None, total=None):
+        self.items = items
+        self.paginated = paginated
+        self.next_cursor = next_cursor
+        self.total = total
+
+    def envelope(self, serialized_items):
+        body = {"items": serialized_items, "next_cursor": self.next_cursor}
+        if self.total is not None:
+            body["total"] = self.total
+        return body
+
+
+# --- Filtros ---
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _prefix(column, value):
+    return column.ilike(f"{_escape_like(value)}%", escape="\\")
+
+
+def _parse_datetime(value, name, end_of_range=False):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise PaginationError(f"Data inválida para '{name}': {value}")
+    # Datas sem horário no fim do intervalo incluem o dia inteiro
+    if end_of_range and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def _parse_int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise PaginationError(f"Valor inteiro inválido para '{name}': {value}")
+
+
+def filter_clients(query, args):
+    if args.get("name"):
+        query = query.filter(_prefix(Client.name, args["name"]))
+    return query
+
+
+def filter_products(query, args):
+    if args.get("name"):
+        query = query.filter(_prefix(Product.name, args["name"]))
+    if args.get("sku"):
+        query = query.filter(_prefix(Product.sku, args["sku"]))
+    return query
+
+
+def order_filters(args):
+    """Filtros de pedidos da query string: (status, client_id, início, fim, fim_inclusivo).
+
+    Também usado para filtrar os pedidos arquivados (archive.py) com a mesma semântica.
+    """
+    statuses = [s for s in args.getlist("status") if s]
+    client_id = _parse_int(args["client_id"], "client_id") if args.get("client_id") else None
+    start = _parse_datetime(args["from"], "from") if args.get("from") else None
+    end, end_inclusive = None, False
+    if args.get("to"):
+        # Data sem horário: até o fim do dia (exclusivo no dia seguinte)
+        end_inclusive = len(args["to"]) != 10
+        end = _parse_datetime(args["to"], "to", end_of_range=not end_inclusive)
+    return statuses, client_id, start, end, end_inclusive
+
+
+def filter_orders(query, args):
+    statuses, client_id, start, end, end_inclusive = order_filters(args)
+    if statuses:
+        query = query.filter(Order.status.in_(statuses))
+    if client_id is not None:
+        query = query.filter(Order.client_id == client_id)
+    if start:
+        query = query.filter(Order.created_at >= start)
+    if end:
+        query = query.filter(Order.created_at <= end if end_inclusive else Order.created_at < end)
+    return query
+
+
+def filter_stock_movements(query, args):
+    for name in ("product_id", "order_id"):
+        if args.get(name):
+            query = query.filter(getattr(StockMovement, name) == _parse_int(args[name], name))
+    kinds = [k for k in args.getlist("kind") if k]
+    if kinds:
+        query = query.filter(StockMovement.kind.in_(kinds))
+    return query
+
+
+# --- Cursor ---
+def encode_cursor(sort_key, direction, value, row_id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps({"k": sort_key, "d": direction, "v": value, "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, sort_key, direction, column):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value, row_id = payload["v"], int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise PaginationError("Cursor inválido")
+    if payload.get("k") != sort_key or payload.get("d") != direction:
+        raise PaginationError("Cursor não corresponde à ordenação solicitada")
+    if isinstance(column.type, db.DateTime) and value is not None:
+        value = _parse_datetime(value, "cursor")
+    return value, row_id
+
+
+def is_paginated(args):
+    return "limit" in args or "cursor" in args
+
+
+def parse_sort(args, sort_keys, default_sort="created_at"):
+    sort_key = args.get("sort", default_sort)
+    if sort_key not in sort_keys:
+        raise PaginationError(f"Ordenação inválida: '{sort_key}'. Permitidas: {', '.join(sort_keys)}")
+    direction = args.get("order", "asc").lower()
+    if direction not in ("asc", "desc"):
+        raise PaginationError("Direção de ordenação inválida. Use 'asc' ou 'desc'.")
+    return sort_key, direction
+
+
+def apply_sort(query, model, sort_keys, sort_key, direction):
+    column = sort_keys[sort_key]
+    if direction == "desc":
+        return query.order_by(column.desc(), model.id.desc())
+    return query.order_by(column.asc(), model.id.asc())
+
+
+def paginate(query, model, args, sort_keys, default_sort="created_at"):
+    """Aplica ordenação e, se solicitado via limit/cursor, paginação por keyset.
+
+    Sem limit/cursor devolve todas as linhas no formato antigo (lista simples).
+    """
+    sort_key, direction = parse_sort(args, sort_keys, default_sort)
+    column = sort_keys[sort_key]
+    id_column = model.id
+    ordered = apply_sort(query, model, sort_keys, sort_key, direction)
+
+    if not is_paginated(args):
+        return Page(ordered.all(), paginated=False)
+
+    limit = _parse_int(args.get("limit", DEFAULT_PAGE_SIZE), "limit")
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise PaginationError(f"'limit' deve estar entre 1 e {MAX_PAGE_SIZE}")
+
+    total = None
+    if args.get("include_total", "").lower() in ("1", "true", "yes"):
+        total = query.order_by(None).count()
+
+    if args.get("cursor"):
+        value, row_id = decode_cursor(args["cursor"], sort_key, direction, column)
+        if sort_key == "id":
+            keyset = id_column < row_id if direction == "desc" else id_column > row_id
+        elif direction == "desc":
+            keyset = or_(column < value, and_(column == value, id_column < row_id))
+        else:
+            keyset = or_(column > value, and_(column == value, id_column > row_id))
+        ordered = ordered.filter(keyset)
+
+    # Busca uma linha extra para saber se existe próxima página
+    rows = ordered.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort_key, direction, getattr(last, column.key), last.id)
+    return Page(rows, paginated=True, next_cursor=next_cursor, total=total)
@@ -0,0 +1,314 @@
+import os
+import hashlib
+import tempfile
+from collections import namedtuple
+from datetime import datetime
+from fpdf import FPDF
+from database import Client, Order
+from data_versions import data_versions
+from pagination import filter_orders, order_filters
+from archive import iter_archived, merge_archived
+
+DEFAULTS = {
+    'REPORT_SYNC_MAX_ROWS': 1000,          # pedidos por relatório no GET; acima disso use o POST (job)
+}
+
+# Linhas lidas do cursor do banco por vez ao montar o PDF
+REPORT_CHUNK_SIZE = 500
+
+COMPANY_LINES = [
+    'Corte e Dobra de Chapas Metálicas',
+    'Rua John Speers nº 1370 - Pq. do Carmo - São Paulo/SP',
+    'Tel: (11) 2521-2233 | (11) 94884-8301',
+    'contato@gblcortedobra.com.br',
+]
+
+# Colunas do relatório de vendas: (título, largura em mm)
+SALES_COLUMNS = [('Pedido', 25), ('Data', 22), ('Cliente', 48), ('Material', 30), ('Qtd.', 14), ('Status', 26), ('Valor', 25)]
+
+
+class ReportError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _latin1(text):
+    # As fontes padrão do PDF só cobrem latin-1 (suficiente para português)
+    return str(text if text is not None else '').encode('latin-1', 'replace').decode('latin-1')
+
+
+def format_brl(value):
+    formatted = f"{value or 0:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+    return f"R$ {formatted}"
+
+
+def format_date(value):
+    return value.strftime('%d/%m/%Y') if value else ''
+
+
+class ReportPDF(FPDF):
+    def __init__(self, title):
+        super().__init__()
+        self.report_title = title
+        self.table_columns = None
+        self.set_auto_page_break(auto=True, margin=20)
+        self.set_margins(15, 15, 15)
+
+    def header(self):
+        self.set_font('helvetica', 'B', 14)
+        self.cell(0, 8, _latin1('GBL CORTE E DOBRA'), new_x='LMARGIN', new_y='NEXT')
+        self.set_font('helvetica', '', 9)
+        self.cell(0, 5, _latin1(self.report_title), new_x='LMARGIN', new_y='NEXT')
+        self.line(self.l_margin, self.get_y() + 2, self.w - self.r_margin, self.get_y() + 2)
+        self.ln(5)
+        # Repete o cabeçalho da tabela em cada página
+        if self.table_columns:
+            self.table_header()
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('helvetica', 'I', 8)
+        self.cell(0, 8, _latin1(f'Gerado automaticamente pelo sistema GBL - página {self.page_no()}'), align='C')
+
+    def table_header(self):
+        self.set_font('helvetica', 'B', 9)
+        self.set_fill_color(230, 230, 230)
+        for title, width in self.table_columns:
+            self.cell(width, 7, _latin1(title), border=1, fill=True)
+        self.ln()
+        self.set_font('helvetica', '', 8)
+
+    def table_row(self, values):
+        for (_, width), value in zip(self.table_columns, values):
+            text = _latin1(value)
+            # Trunca para caber na coluna em vez de quebrar linha
+            while text and self.get_string_width(text) > width - 2:
+                text = text[:-1]
+            self.cell(width, 6, text, border=1)
+        self.ln()
+
+
+def order_rows(query, filters=None):
+    """Pedidos com o nome do cliente, lidos em blocos por um cursor do lado do servidor.
+
+    Com `filters` (pagination.order_filters) intercala os pedidos arquivados do período,
+    com o nome do cliente gravado no arquivamento.
+    """
+    query = query.join(Client, Order.client_id == Client.id).with_entities(
+        Order.id, Order.order_number, Order.created_at, Client.name, Order.material, Order.thickness,
+        Order.width, Order.length, Order.quantity, Order.observations, Order.value, Order.status
+    ).order_by(Order.created_at, Order.id)
+    rows = query.yield_per(REPORT_CHUNK_SIZE)
+    if filters is None:
+        return rows
+    archived = (_ReportRow(row.id, row.order_number, row.created_at, row.client_name or '', row.material,
+                           row.thickness, row.width, row.length, row.quantity, row.observations, row.value,
+                           row.status)
+                for row in iter_archived(filters))
+    return merge_archived(rows, archived, lambda row: (row.created_at, row.id))
+
+
+# Pedido arquivado com os mesmos atributos das linhas de order_rows
+_ReportRow = namedtuple('_ReportRow', ('id', 'order_number', 'created_at', 'name', 'material', 'thickness',
+                                       'width', 'length', 'quantity', 'observations', 'value', 'status'))
+
+
+def _render_order_page(pdf, row):
+    pdf.add_page()
+    pdf.set_font('helvetica', '', 10)
+    for line in COMPANY_LINES:
+        pdf.cell(0, 5, _latin1(line), new_x='LMARGIN', new_y='NEXT')
+    pdf.ln(6)
+    pdf.set_font('helvetica', 'B', 16)
+    pdf.cell(0, 10, _latin1(f'PEDIDO {row.order_number}'), new_x='LMARGIN', new_y='NEXT')
+    pdf.set_font('helvetica', '', 11)
+    pdf.cell(0, 7, _latin1(f'Data: {format_date(row.created_at)}'), new_x='LMARGIN', new_y='NEXT')
+    pdf.ln(4)
+    pdf.set_font('helvetica', 'B', 11)
+    pdf.cell(0, 7, 'DADOS DO CLIENTE:', new_x='LMARGIN', new_y='NEXT')
+    pdf.set_font('helvetica', '', 11)
+    pdf.cell(0, 7, _latin1(f'Cliente: {row.name}'), new_x='LMARGIN', new_y='NEXT')
+    pdf.ln(4)
+    pdf.set_font('helvetica', 'B', 11)
+    pdf.cell(0, 7, _latin1('ESPECIFICAÇÕES DO PEDIDO:'), new_x='LMARGIN', new_y='NEXT')
+    pdf.set_font('helvetica', '', 11)
+    for label, value in (
+        ('Material:', row.material), ('Espessura:', row.thickness),
+        ('Dimensões:', f'{row.width:g} x {row.length:g} mm'), ('Quantidade:', f'{row.quantity} peças'),
+    ):
+        pdf.cell(40, 7, _latin1(label))
+        pdf.cell(0, 7, _latin1(value), new_x='LMARGIN', new_y='NEXT')
+    if row.observations:
+        pdf.ln(4)
+        pdf.set_font('helvetica', 'B', 11)
+        pdf.cell(0, 7, _latin1('OBSERVAÇÕES:'), new_x='LMARGIN', new_y='NEXT')
+        pdf.set_font('helvetica', '', 10)
+        pdf.multi_cell(0, 6, _latin1(row.observations), new_x='LMARGIN', new_y='NEXT')
+    pdf.ln(6)
+    pdf.set_font('helvetica', 'B', 14)
+    pdf.cell(0, 9, _latin1(f'VALOR TOTAL: {format_brl(row.value)}'), new_x='LMARGIN', new_y='NEXT')
+    pdf.set_font('helvetica', '', 11)
+    pdf.cell(0, 7, _latin1(f'Status: {row.status}'), new_x='LMARGIN', new_y='NEXT')
+
+
+def render_order_sheets(rows):
+    """Uma página por pedido (ficha de pedido), no mesmo formato do PDF gerado no navegador."""
+    pdf = ReportPDF('Ficha de pedido')
+    count = 0
+    for row in rows:
+        _render_order_page(pdf, row)
+        count += 1
+    if not count:
+        pdf.add_page()
+        pdf.set_font('helvetica', '', 11)
+        pdf.cell(0, 8, 'Nenhum pedido encontrado para os filtros informados.')
+    return bytes(pdf.output())
+
+
+def render_sales_report(rows, period_label):
+    """Relatório de vendas do período: uma linha por pedido e totais por status ao final."""
+    pdf = ReportPDF(f'Relatório de vendas - {period_label}')
+    pdf.table_columns = SALES_COLUMNS
+    pdf.add_page()
+    totals = {}
+    for row in rows:
+        pdf.table_row([
+            row.order_number, format_date(row.created_at), row.name, f'{row.material} {row.thickness}',
+            row.quantity, row.status, format_brl(row.value),
+        ])
+        count, value = totals.get(row.status, (0, 0.0))
+        totals[row.status] = (count + 1, value + (row.value or 0))
+    pdf.table_columns = None
+
+    pdf.ln(6)
+    pdf.set_font('helvetica', 'B', 11)
+    pdf.cell(0, 8, 'TOTAIS POR STATUS', new_x='LMARGIN', new_y='NEXT')
+    pdf.set_font('helvetica', '', 10)
+    for status, (count, value) in sorted(totals.items()):
+        pdf.cell(0, 6, _latin1(f'{status}: {count} pedido(s) - {format_brl(value)}'), new_x='LMARGIN', new_y='NEXT')
+    total_count = sum(c for c, _ in totals.values())
+    total_value = sum(v for _, v in totals.values())
+    pdf.set_font('helvetica', 'B', 11)
+    pdf.cell(0, 8, _latin1(f'TOTAL: {total_count} pedido(s) - {format_brl(total_value)}'), new_x='LMARGIN', new_y='NEXT')
+    return bytes(pdf.output())
+
+
+# --- Cache em disco ---
+class ReportCache:
+    """PDFs prontos em disco, com chave = tipo + parâmetros + versão dos dados.
+
+    Quando pedidos ou clientes mudam, a versão muda e a chave antiga simplesmente deixa de
+    ser usada; os arquivos mais antigos são apagados ao passar de `max_files`.
+    """
+
+    def __init__(self, directory, max_files):
+        self.directory = directory
+        self.max_files = max_files
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, report, params, versions):
+        canonical = '&'.join(f'{k}={v}' for k, v in sorted(params))
+        raw = f'{report}?{canonical}|{",".join(str(v) for v in versions)}'
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.pdf')
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Nunca gerado ou removido pelo _evict de outro processo: refaz
+            return None
+        return path
+
+    def put(self, key, content):
+        # Grava num arquivo temporário e renomeia: leitores nunca veem um PDF pela metade
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp, self.path(key))
+        self._evict()
+        return self.path(key)
+
+    def _evict(self):
+        files = [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith('.pdf')]
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=lambda f: os.path.getmtime(f))
+        for path in files[:len(files) - self.max_files]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def init_reports(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+    directory = app.config.get('REPORT_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'gbl_reports')
+    app.extensions['report_cache'] = ReportCache(directory, int(app.config.get('REPORT_CACHE_MAX_FILES', 200)))
+
+
+REPORTS = {
+    'order_sheets': lambda rows, args: render_order_sheets(rows),
+    'sales': lambda rows, args: render_sales_report(rows, _period_label(args)),
+}
+
+
+def _period_label(args):
+    start, end = args.get('from'), args.get('to')
+    if start and end:
+        return f'{start} a {end}'
+    if start:
+        return f'a partir de {start}'
+    if end:
+        return f'até {end}'
+    return 'todo o período'
+
+
+def _too_many(report, limit):
+    return ReportError(f"O relatório tem mais de {limit} pedidos: refine os filtros ou gere em segundo plano "
+                       f"(POST /api/reports/{report})", 413)
+
+
+def _capped(rows, report, limit):
+    # Os meses arquivados só são contados ao ler: o limite vale também para eles
+    for count, row in enumerate(rows, 1):
+        if count > limit:
+            raise _too_many(report, limit)
+        yield row
+
+
+def get_report(cache, report, args, order_id=None, max_rows=None):
+    """Devolve (caminho do PDF, veio_do_cache). Filtros inválidos levantam PaginationError.
+
+    Com `max_rows` (requisições síncronas) um relatório que ainda não está no cache e passa
+    desse total de pedidos levanta ReportError (413) antes de montar o PDF inteiro.
+    """
+    query = filter_orders(Order.query, args)
+    params = [(k, v) for k, v in args.items(multi=True) if k in ('from', 'to', 'status', 'client_id')]
+    if order_id is not None:
+        query = query.filter(Order.id == order_id)
+        params.append(('order_id', order_id))
+    key = cache.key(report, params, data_versions('orders', 'clients'))
+    path = cache.get(key)
+    if path:
+        return path, True
+    # Ficha de um pedido só da tabela; relatórios por período incluem os meses arquivados
+    if max_rows is not None:
+        # Só os pedidos da tabela, até max_rows + 1: não lê o período inteiro para contar
+        if query.with_entities(Order.id).order_by(None).limit(max_rows + 1).count() > max_rows:
+            raise _too_many(report, max_rows)
+    rows = order_rows(query, order_filters(args) if order_id is None else None)
+    if max_rows is not None:
+        rows = _capped(rows, report, max_rows)
+    content = REPORTS[report](rows, args)
+    return cache.put(key, content), False
+
+
+def report_filename(report):
+    prefix = {'order_sheets': 'pedidos', 'sales': 'relatorio_vendas'}[report]
+    return f'{prefix}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
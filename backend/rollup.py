@@ -0,0 +1,248 @@
+from collections import defaultdict
+from datetime import date, datetime
+from sqlalchemy import event, func, extract, delete, select, update, insert, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+from database import db, Order, SalesDaily, SalesMonthly
+from archive import archived_sales
+from data_versions import bump_data_versions
+
+# Diferença aceita entre o rollup e o agregado bruto (somas de float acumulam erro de arredondamento)
+VALUE_TOLERANCE = 0.01
+
+
+class RollupRangeError(ValueError):
+    """Parâmetro de período inválido para as consultas de vendas."""
+
+
+def _month_of(day):
+    return day.replace(day=1)
+
+
+def _committed(state, attr):
+    """Valor anterior ao flush (o que está gravado no banco) de um atributo do pedido."""
+    history = state.attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None
+
+
+def _current(state, attr):
+    history = state.attrs[attr].history
+    if history.added:
+        return history.added[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None
+
+
+def add_delta(deltas, created_at, status, value, count):
+    """Acumula em `deltas` a contribuição (valor, quantidade) de um pedido para o dia/status."""
+    if created_at is None or status is None:
+        return
+    key = (created_at.date() if isinstance(created_at, datetime) else created_at, status)
+    total_value, total_orders = deltas.get(key, (0.0, 0))
+    deltas[key] = (total_value + (value or 0) * count, total_orders + count)
+
+
+def compute_deltas(session):
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Order):
+            add_delta(deltas, obj.created_at, obj.status, obj.value, 1)
+    for obj in session.deleted:
+        if isinstance(obj, Order):
+            state = inspect(obj)
+            add_delta(deltas, _committed(state, 'created_at'), _committed(state, 'status'), _committed(state, 'value'), -1)
+    for obj in session.dirty:
+        if not isinstance(obj, Order) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[attr].history.has_changes() for attr in ('created_at', 'status', 'value')):
+            continue
+        add_delta(deltas, _committed(state, 'created_at'), _committed(state, 'status'), _committed(state, 'value'), -1)
+        add_delta(deltas, _current(state, 'created_at'), _current(state, 'status'), _current(state, 'value'), 1)
+    return {key: delta for key, delta in deltas.items() if delta != (0.0, 0)}
+
+
+def _upsert_increment(connection, model, period_column, rows):
+    """Soma os deltas às linhas do rollup: INSERT ... ON CONFLICT DO UPDATE SET x = x + excluded.x."""
+    table = model.__table__
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        stmt = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[period_column], table.c.status],
+            set_={
+                'total_value': table.c.total_value + stmt.excluded.total_value,
+                'total_orders': table.c.total_orders + stmt.excluded.total_orders,
+            },
+        )
+        connection.execute(stmt, rows)
+        return
+    for row in rows:
+        result = connection.execute(
+            update(table)
+            .where(table.c[period_column] == row[period_column], table.c.status == row['status'])
+            .values(total_value=table.c.total_value + row['total_value'],
+                    total_orders=table.c.total_orders + row['total_orders'])
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(**row))
+
+
+def apply_deltas(connection, deltas):
+    """Aplica deltas {(dia, status): (valor, quantidade)} nos rollups diário e mensal.
+
+    Operações em massa que não passam pelo ORM (UPDATE/DELETE set-based) devem chamar
+    esta função na mesma transação para manter o rollup consistente.
+    """
+    if not deltas:
+        return
+    monthly = defaultdict(lambda: [0.0, 0])
+    daily_rows = []
+    for (day, status), (total_value, total_orders) in sorted(deltas.items()):
+        daily_rows.append({'day': day, 'status': status, 'total_value': total_value, 'total_orders': total_orders})
+        monthly[(_month_of(day), status)][0] += total_value
+        monthly[(_month_of(day), status)][1] += total_orders
+    monthly_rows = [
+        {'month': month, 'status': status, 'total_value': total_value, 'total_orders': total_orders}
+        for (month, status), (total_value, total_orders) in sorted(monthly.items())
+    ]
+    _upsert_increment(connection, SalesDaily, 'day', daily_rows)
+    _upsert_increment(connection, SalesMonthly, 'month', monthly_rows)
+
+
+@event.listens_for(Session, 'after_flush')
+def _maintain_sales_rollup(session, flush_context):
+    # after_flush ainda enxerga new/dirty/deleted e o histórico dos atributos antes do flush
+    deltas = compute_deltas(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def rebuild_rollup_on(connection):
+    """Recalcula os rollups a partir da tabela de pedidos na conexão/transação informada."""
+    if connection.dialect.name == 'postgresql':
+        # Bloqueia incrementos concorrentes até o commit; pedidos não visíveis nesta leitura
+        # aplicam seus deltas depois, sobre o rollup já reconstruído
+        connection.execute(db.text('LOCK TABLE sales_daily, sales_monthly IN EXCLUSIVE MODE'))
+    day_column = func.date(Order.created_at, type_=db.Date)
+    rows = connection.execute(
+        select(day_column.label('day'), Order.status, func.sum(Order.value), func.count(Order.id))
+        .where(Order.created_at.isnot(None))
+        .group_by(day_column, Order.status)
+    )
+    # Pedidos arquivados continuam nas vendas: entram pelo resumo gravado no arquivamento
+    deltas = archived_sales(connection)
+    for day, status, total_value, total_orders in rows:
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        archived_value, archived_orders = deltas.get((day, status), (0.0, 0))
+        deltas[(day, status)] = (archived_value + float(total_value or 0), archived_orders + int(total_orders))
+    connection.execute(delete(SalesDaily.__table__))
+    connection.execute(delete(SalesMonthly.__table__))
+    apply_deltas(connection, deltas)
+    return len(deltas)
+
+
+def rebuild_rollup():
+    """Recalcula os rollups (backfill ou reparo) em uma única transação."""
+    connection = db.session.connection()
+    # O dashboard de vendas (cache HTTP de 'orders') passa a refletir o rollup refeito
+    bump_data_versions(connection, ['orders'])
+    groups = rebuild_rollup_on(connection)
+    db.session.commit()
+    return groups
+
+
+def check_rollup():
+    """Compara o rollup mensal (e a soma do diário) com o agregado bruto dos pedidos
+    (tabela e arquivo).
+
+    Retorna a lista de divergências; lista vazia significa rollup consistente.
+    """
+    raw = {}
+    rows = db.session.query(
+        extract('year', Order.created_at).label('year'),
+        extract('month', Order.created_at).label('month'),
+        Order.status, func.sum(Order.value), func.count(Order.id)
+    ).filter(Order.created_at.isnot(None)).group_by('year', 'month', Order.status)
+    for year, month, status, total_value, total_orders in rows:
+        raw[(date(int(year), int(month), 1), status)] = (float(total_value or 0), int(total_orders))
+    for (day, status), (total_value, total_orders) in archived_sales(db.session.connection()).items():
+        archived_value, archived_orders = raw.get((_month_of(day), status), (0.0, 0))
+        raw[(_month_of(day), status)] = (archived_value + total_value, archived_orders + total_orders)
+
+    monthly = {
+        (r.month, r.status): (r.total_value, r.total_orders)
+        for r in SalesMonthly.query.filter(SalesMonthly.total_orders != 0)
+    }
+    daily = defaultdict(lambda: [0.0, 0])
+    for r in SalesDaily.query.filter(SalesDaily.total_orders != 0):
+        daily[(_month_of(r.day), r.status)][0] += r.total_value
+        daily[(_month_of(r.day), r.status)][1] += r.total_orders
+
+    mismatches = []
+    for key in sorted(set(raw) | set(monthly) | set(daily)):
+        expected = raw.get(key, (0.0, 0))
+        for source, values in (('mensal', monthly.get(key, (0.0, 0))), ('diário', tuple(daily.get(key, (0.0, 0))))):
+            if values[1] != expected[1] or abs(values[0] - expected[0]) > VALUE_TOLERANCE:
+                mismatches.append({
+                    'month': key[0].strftime('%Y-%m'), 'status': key[1], 'rollup': source,
+                    'expected_value': expected[0], 'expected_orders': expected[1],
+                    'rollup_value': values[0], 'rollup_orders': values[1],
+                })
+    return mismatches
+
+
+def parse_period(value, name):
+    """Aceita YYYY-MM ou YYYY-MM-DD. Retorna (data, tem_dia)."""
+    try:
+        if len(value) == 7:
+            return date.fromisoformat(f"{value}-01"), False
+        return date.fromisoformat(value), True
+    except ValueError:
+        raise RollupRangeError(f"Período inválido para '{name}': {value}. Use YYYY-MM ou YYYY-MM-DD.")
+
+
+def sales_by_month(start=None, end=None, statuses=None):
+    """Lê o rollup e retorna {(mês, status): [valor, quantidade]}.
+
+    Se o período tiver precisão de dia usa o rollup diário; caso contrário, o mensal.
+    """
+    start_day, start_has_day = parse_period(start, 'from') if start else (None, False)
+    end_day, end_has_day = parse_period(end, 'to') if end else (None, False)
+    totals = defaultdict(lambda: [0.0, 0])
+    if start_has_day or end_has_day:
+        query = SalesDaily.query
+        if start_day:
+            query = query.filter(SalesDaily.day >= start_day)
+        if end_day:
+            if end_has_day:
+                query = query.filter(SalesDaily.day <= end_day)
+            else:
+                query = query.filter(SalesDaily.day < _next_month(end_day))
+        if statuses:
+            query = query.filter(SalesDaily.status.in_(statuses))
+        for r in query:
+            totals[(_month_of(r.day), r.status)][0] += r.total_value
+            totals[(_month_of(r.day), r.status)][1] += r.total_orders
+    else:
+        query = SalesMonthly.query
+        if start_day:
+            query = query.filter(SalesMonthly.month >= start_day)
+        if end_day:
+            query = query.filter(SalesMonthly.month <= end_day)
+        if statuses:
+            query = query.filter(SalesMonthly.status.in_(statuses))
+        for r in query:
+            totals[(r.month, r.status)][0] += r.total_value
+            totals[(r.month, r.status)][1] += r.total_orders
+    return {key: values for key, values in totals.items() if values[1] != 0}
+
+
+def _next_month(day):
+    return date(day.year + (day.month // 12), day.month % 12 + 1, 1)
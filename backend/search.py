@@ -0,0 +1,256 @@
+import re
+import bisect
+import threading
+import unicodedata
+from sqlalchemy import select, func, case, or_, and_, not_, literal_column
+from database import db, Client, Product
+from data_versions import data_versions
+
+SEARCH_DEFAULT_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+# Trigramas precisam de 3 caracteres: termos menores buscam só por prefixo
+MIN_SUBSTRING_LENGTH = 3
+
+# Índices do PostgreSQL (migração 6). As expressões precisam ser idênticas às das consultas
+# abaixo para o planner usar o índice. unaccent() não é IMMUTABLE, daí o wrapper f_unaccent.
+POSTGRES_SEARCH_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS "
+    "$$ SELECT public.unaccent('public.unaccent', $1) $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT",
+]
+POSTGRES_SEARCH_INDEXES = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_client_name_search ON client (lower(f_unaccent(name)) text_pattern_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_client_name_trgm ON client USING gin (lower(f_unaccent(name)) gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_client_cnpj_search ON client (regexp_replace(cnpj, '[^0-9]', '', 'g') text_pattern_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_client_cnpj_trgm ON client USING gin (regexp_replace(cnpj, '[^0-9]', '', 'g') gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_product_name_search ON product (lower(f_unaccent(name)) text_pattern_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_product_name_trgm ON product USING gin (lower(f_unaccent(name)) gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_product_sku_search ON product (lower(f_unaccent(sku)) text_pattern_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_product_sku_trgm ON product USING gin (lower(f_unaccent(sku)) gin_trgm_ops)",
+]
+
+
+class SearchError(ValueError):
+    """Parâmetros de busca inválidos."""
+
+
+def normalize(text):
+    """Minúsculas e sem acentos ('Ação' -> 'acao'), igual a lower(f_unaccent()) no PostgreSQL."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def only_digits(text):
+    return re.sub(r'[^0-9]', '', text or '')
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _pg_normalized(column):
+    return func.lower(func.f_unaccent(column))
+
+
+def _pg_digits(column):
+    # Literais (e não parâmetros) para a expressão bater com a do índice
+    return func.regexp_replace(column, literal_column("'[^0-9]'"), literal_column("''"), literal_column("'g'"))
+
+
+class SearchTarget:
+    def __init__(self, model, entity, name, code, code_is_digits, columns, serialize):
+        self.model = model
+        self.entity = entity
+        self.name = name
+        self.code = code
+        # CNPJ é comparado só pelos dígitos; SKU como texto normalizado
+        self.code_is_digits = code_is_digits
+        self.columns = columns
+        self.serialize = serialize
+
+    def query_code(self, q):
+        return only_digits(q) if self.code_is_digits else normalize(q)
+
+    def local_code(self, value):
+        return only_digits(value) if self.code_is_digits else normalize(value)
+
+    def pg_code(self):
+        return _pg_digits(self.code) if self.code_is_digits else _pg_normalized(self.code)
+
+
+SEARCH_TYPES = {
+    'client': SearchTarget(
+        Client, 'clients', Client.name, Client.cnpj, True, [Client.id, Client.name, Client.cnpj],
+        lambda row: {'id': row.id, 'name': row.name, 'cnpj': row.cnpj},
+    ),
+    'product': SearchTarget(
+        Product, 'products', Product.name, Product.sku, False,
+        [Product.id, Product.name, Product.sku, Product.price, Product.unit, Product.stock],
+        lambda row: {'id': row.id, 'name': row.name, 'sku': row.sku, 'price': row.price,
+                     'unit': row.unit, 'stock': row.stock},
+    ),
+}
+
+
+def parse_search_args(args):
+    search_type = args.get('type', '')
+    if search_type not in SEARCH_TYPES:
+        raise SearchError(f"Parâmetro 'type' inválido: use {' ou '.join(SEARCH_TYPES)}")
+    try:
+        limit = int(args.get('limit', SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        raise SearchError(f"Valor inválido para 'limit': {args.get('limit')}")
+    if limit < 1 or limit > SEARCH_MAX_LIMIT:
+        raise SearchError(f"'limit' deve estar entre 1 e {SEARCH_MAX_LIMIT}")
+    return search_type, (args.get('q') or '').strip(), limit
+
+
+def rank(name, code, q, qcode):
+    """0: igual; 1: começa com o termo; 2: alguma palavra começa com o termo; 3: contém."""
+    if name == q or (qcode and code == qcode):
+        return 0
+    if name.startswith(q) or (qcode and code.startswith(qcode)):
+        return 1
+    if f' {q}' in name:
+        return 2
+    return 3
+
+
+# --- PostgreSQL: índices btree (prefixo) e GIN de trigramas (substring) ---
+def postgres_statements(target, q, qcode, limit):
+    """Consultas em camadas. Prefixos de nome e de código vêm de range scans no btree, já na
+    ordem do índice e com LIMIT (o termo exato é o primeiro da faixa). A consulta por
+    substring (GIN de trigramas) só roda se os prefixos não bastarem."""
+    name, code = _pg_normalized(target.name), target.pg_code()
+    prefix_match = [name.like(f'{_escape_like(q)}%', escape='\\')]
+    statements = [select(*target.columns).where(prefix_match[0]).order_by(name).limit(limit)]
+    if qcode:
+        prefix_match.append(code.like(f'{_escape_like(qcode)}%', escape='\\'))
+        statements.append(select(*target.columns).where(prefix_match[1]).order_by(code).limit(limit))
+    if len(q) >= MIN_SUBSTRING_LENGTH:
+        substring_match = [name.like(f'%{_escape_like(q)}%', escape='\\')]
+        if len(qcode) >= MIN_SUBSTRING_LENGTH:
+            substring_match.append(code.like(f'%{_escape_like(qcode)}%', escape='\\'))
+        word_prefix = case((name.like(f'% {_escape_like(q)}%', escape='\\'), 0), else_=1)
+        statements.append(
+            select(*target.columns).where(and_(or_(*substring_match), not_(or_(*prefix_match))))
+            .order_by(word_prefix, name).limit(limit)
+        )
+    return statements
+
+
+def _search_postgres(target, q, qcode, limit):
+    *prefix_statements, last = postgres_statements(target, q, qcode, limit)
+    if len(q) < MIN_SUBSTRING_LENGTH:
+        prefix_statements.append(last)
+        last = None
+    rows = {}
+    for statement in prefix_statements:
+        rows.update((row.id, row) for row in db.session.execute(statement))
+    if last is not None and len(rows) < limit:
+        rows.update((row.id, row) for row in db.session.execute(last.limit(limit - len(rows))))
+    return list(rows.values())
+
+
+# --- Demais bancos (SQLite em testes): índice em memória do processo ---
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class LocalSearchIndex:
+    """Índice em memória: linhas ordenadas pelo nome normalizado (prefixo via bisect) e
+    trigramas -> posições, também em ordem de nome (substring). É reconstruído quando a
+    versão de dados da entidade muda (data_version) e trocado de uma vez só (uma tupla), então
+    uma busca em andamento continua lendo o índice antigo inteiro, sem trava."""
+
+    def __init__(self, target):
+        self.target = target
+        self.version = None
+        self._lock = threading.Lock()
+        # (linhas, nomes, trigramas, códigos, posições dos códigos)
+        self._index = ((), (), {}, (), ())
+
+    def refresh(self):
+        version = data_versions(self.target.entity)[0]
+        if version == self.version:
+            return
+        with self._lock:
+            if version == self.version:
+                return
+            code_key = self.target.code.key
+            rows = db.session.execute(select(*self.target.columns)).all()
+            entries = sorted(((normalize(row.name), self.target.local_code(getattr(row, code_key)), row)
+                              for row in rows), key=lambda entry: entry[0])
+            by_code = sorted((entry[1], i) for i, entry in enumerate(entries) if entry[1])
+            grams = {}
+            for i, (name, code, _) in enumerate(entries):
+                for gram in _trigrams(name) | _trigrams(code):
+                    grams.setdefault(gram, []).append(i)
+            self._index = (entries, [entry[0] for entry in entries], grams,
+                           [c for c, _ in by_code], [i for _, i in by_code])
+            self.version = version
+
+    @staticmethod
+    def _rarest(grams, term):
+        return min((grams.get(gram, ()) for gram in _trigrams(term)), key=len)
+
+    def search(self, q, qcode, limit):
+        self.refresh()
+        entries, names, grams, codes, code_positions = self._index
+        # Mesmas camadas da versão PostgreSQL: prefixos já vêm em ordem, basta o início da faixa
+        start = bisect.bisect_left(names, q)
+        end = bisect.bisect_left(names, q + '\uffff')
+        found = set(range(start, min(end, start + limit)))
+        if qcode:
+            start = bisect.bisect_left(codes, qcode)
+            end = bisect.bisect_left(codes, qcode + '\uffff')
+            found.update(code_positions[start:min(end, start + limit)])
+        if len(q) >= MIN_SUBSTRING_LENGTH and len(found) < limit:
+            missing = limit - len(found)
+            # Percorre em ordem de nome só as linhas do trigrama mais raro do termo; para
+            # quando já há linhas suficientes com uma palavra começando com o termo
+            word_prefix, others = [], []
+            for i in self._rarest(grams, q):
+                name = entries[i][0]
+                if i in found or q not in name:
+                    continue
+                if f' {q}' in name:
+                    word_prefix.append(i)
+                    if len(word_prefix) >= missing:
+                        break
+                elif len(others) < missing:
+                    others.append(i)
+            if len(qcode) >= MIN_SUBSTRING_LENGTH and len(word_prefix) + len(others) < missing:
+                others.extend(i for i in self._rarest(grams, qcode) if qcode in entries[i][1] and i not in found)
+                others.sort()
+            found.update((word_prefix + others)[:missing])
+        return [entries[i][2] for i in found]
+
+
+def init_search(app):
+    with app.app_context():
+        local = db.engine.dialect.name != 'postgresql'
+    app.extensions['search_indexes'] = (
+        {name: LocalSearchIndex(target) for name, target in SEARCH_TYPES.items()} if local else None
+    )
+
+
+def search(indexes, search_type, q, limit):
+    """Resultados ranqueados (igual, prefixo, início de palavra, contém) para autocompletar."""
+    target = SEARCH_TYPES[search_type]
+    normalized = normalize(q)
+    if not normalized:
+        return []
+    qcode = target.query_code(q)
+    if target.code_is_digits and len(qcode) < 2:
+        # Poucos dígitos casariam com metade dos CNPJs
+        qcode = ''
+    if indexes is None:
+        rows = _search_postgres(target, normalized, qcode, limit)
+    else:
+        rows = indexes[search_type].search(normalized, qcode, limit)
+    code_key = target.code.key
+    rows.sort(key=lambda row: (rank(normalize(row.name), target.local_code(getattr(row, code_key)), normalized, qcode),
+                               normalize(row.name)))
+    return [target.serialize(row) for row in rows[:limit]]
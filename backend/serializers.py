@@ -0,0 +1,145 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask import Response
+from database import Client, Order, Product, User, StockMovement
+
+try:
+    import orjson
+except ImportError:  # dependência opcional: sem ela usa o json da biblioteca padrão
+    orjson = None
+
+
+# --- Conversões (um único lugar para datas e números) ---
+def iso(value):
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+
+def number(value):
+    # Decimal (Numeric no PostgreSQL) e int (o SQLite devolve REAL sem casas decimais como inteiro,
+    # ex.: no RETURNING do INSERT em lote): campos Float saem sempre como float
+    if isinstance(value, (Decimal, int)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def summary(id, name):
+    return {"id": id, "name": name} if id is not None else None
+
+
+class Serializer:
+    """Mapeamento declarativo campo JSON -> coluna(s) do modelo.
+
+    Cada campo é (chave, coluna) ou (chave, coluna, conversão); com uma tupla de colunas a
+    conversão recebe os valores na mesma ordem (ex.: cliente embutido no pedido). Colunas de
+    outros modelos entram por JOIN na consulta e pelo relacionamento no objeto ORM.
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        fields = [(key, expr if isinstance(expr, tuple) else (expr,), convert[0] if convert else None)
+                  for key, expr, *convert in fields]
+        # Modelo relacionado -> relacionamento (Order.client), usado no JOIN e no objeto ORM
+        self._joins = {}
+        for _, exprs, _ in fields:
+            for column in exprs:
+                if column.class_ is not self.model and column.class_ not in self._joins:
+                    self._joins[column.class_] = next(
+                        r for r in self.model.__mapper__.relationships if r.mapper.class_ is column.class_
+                    ).class_attribute
+        self.columns = []
+        self._fields = []
+        for key, exprs, convert in fields:
+            self._fields.append((key, len(self.columns), len(exprs), convert, exprs))
+            # Rótulo = nome do atributo no modelo: a paginação por keyset lê o cursor da própria linha
+            self.columns.extend(column.label(self._label(column)) for column in exprs)
+
+    def _label(self, column):
+        if column.class_ is self.model:
+            return column.key
+        return f"{self._joins[column.class_].key}_{column.key}"
+
+    def select(self, query):
+        """Troca as entidades da consulta pelas colunas do serializer (sem hidratar objetos ORM)."""
+        for relationship in self._joins.values():
+            query = query.outerjoin(relationship)
+        return query.with_entities(*self.columns)
+
+    def row(self, row):
+        item = {}
+        for key, start, size, convert, _ in self._fields:
+            if size == 1:
+                value = row[start]
+                item[key] = convert(value) if convert else value
+            else:
+                item[key] = convert(*row[start:start + size])
+        return item
+
+    def rows(self, rows):
+        return [self.row(row) for row in rows]
+
+    def from_mapping(self, values):
+        """Mesmo formato a partir de um dict com os nomes das colunas (ex.: valores de um INSERT)."""
+        return self.row([values[column.name] for column in self.columns])
+
+    def dump(self, obj):
+        """Mesmo formato a partir de um objeto ORM (respostas de criação/edição)."""
+        values = []
+        for _, _, _, _, exprs in self._fields:
+            for column in exprs:
+                source = obj
+                if column.class_ is not self.model:
+                    source = getattr(obj, self._joins[column.class_].key)
+                values.append(getattr(source, column.key) if source is not None else None)
+        return self.row(values)
+
+
+CLIENT = Serializer(Client, [
+    ("id", Client.id), ("name", Client.name), ("contact_person", Client.contact_person),
+    ("phone", Client.phone), ("email", Client.email), ("address", Client.address),
+    ("cnpj", Client.cnpj), ("observations", Client.observations), ("created_at", Client.created_at, iso),
+    ("updated_at", Client.updated_at, iso),
+])
+PRODUCT = Serializer(Product, [
+    ("id", Product.id), ("name", Product.name), ("description", Product.description),
+    ("price", Product.price, number), ("unit", Product.unit), ("sku", Product.sku),
+    ("stock", Product.stock), ("created_at", Product.created_at, iso),
+    ("updated_at", Product.updated_at, iso),
+])
+LOW_STOCK_PRODUCT = Serializer(Product, [
+    ("id", Product.id), ("name", Product.name), ("sku", Product.sku), ("stock", Product.stock), ("unit", Product.unit),
+])
+ORDER = Serializer(Order, [
+    ("id", Order.id), ("order_number", Order.order_number), ("client_id", Order.client_id),
+    ("client", (Client.id, Client.name), summary),
+    ("material", Order.material), ("thickness", Order.thickness), ("width", Order.width, number),
+    ("length", Order.length, number), ("quantity", Order.quantity), ("observations", Order.observations),
+    ("value", Order.value, number), ("status", Order.status), ("created_at", Order.created_at, iso),
+    ("updated_at", Order.updated_at, iso),
+])
+# Nomes de campos usados pela tela de pedidos (/api/pedidos)
+PEDIDO = Serializer(Order, [
+    ("id", Order.id), ("numero", Order.order_number), ("cliente_id", Order.client_id),
+    ("cliente_nome", Client.name), ("material", Order.material), ("espessura", Order.thickness),
+    ("largura", Order.width, number), ("comprimento", Order.length, number), ("quantidade", Order.quantity),
+    ("observacoes", Order.observations), ("valor", Order.value, number), ("status", Order.status),
+    ("data", Order.created_at, iso),
+])
+STOCK_MOVEMENT = Serializer(StockMovement, [
+    ("id", StockMovement.id), ("product_id", StockMovement.product_id), ("kind", StockMovement.kind),
+    ("quantity", StockMovement.quantity), ("stock_after", StockMovement.stock_after),
+    ("order_id", StockMovement.order_id), ("note", StockMovement.note), ("created_by", StockMovement.created_by),
+    ("created_at", StockMovement.created_at, iso),
+])
+USER = Serializer(User, [("id", User.id), ("username", User.username), ("role", User.role)])
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=iso).encode("utf-8")
+
+
+def json_response(payload, status=200):
+    """Resposta JSON serializada com orjson quando disponível (bem mais rápido que jsonify)."""
+    return Response(dumps(payload), status=status, mimetype="application/json")
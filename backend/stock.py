@@ -0,0 +1,186 @@
+from datetime import datetime
+from sqlalchemy import event, select, update, insert, exists, and_, not_, literal, func, case
+from sqlalchemy.orm import Session
+from database import db, Product, Order, StockMovement, entity_version
+from data_versions import bump_data_versions
+
+MOVEMENT_KINDS = ('in', 'out', 'adjust')
+# Produtos por UPDATE em set_stock_levels (a diferença de cada um vai num CASE)
+STOCK_LEVEL_BATCH = 500
+# Releituras em set_stock_levels quando movimentações concorrentes mudam o estoque no meio
+STOCK_LEVEL_ATTEMPTS = 3
+
+_product = Product.__table__
+
+
+class StockError(ValueError):
+    """Movimentação inválida ou impossível (ex.: estoque insuficiente), com o status HTTP."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_movement(data):
+    """Valida o corpo de uma movimentação: kind, quantity, order_id e note opcionais."""
+    if not isinstance(data, dict):
+        raise StockError("Corpo da requisição deve ser um objeto JSON")
+    kind = data.get('kind')
+    if kind not in MOVEMENT_KINDS:
+        raise StockError(f"Campo 'kind' inválido: use {', '.join(MOVEMENT_KINDS)}")
+    try:
+        quantity = int(data.get('quantity'))
+    except (TypeError, ValueError):
+        raise StockError(f"Valor inválido para 'quantity': {data.get('quantity')}")
+    # Entradas e saídas informam a quantidade; ajustes (inventário) informam a variação com sinal
+    if kind == 'adjust' and quantity == 0:
+        raise StockError("'quantity' do ajuste não pode ser zero")
+    if kind != 'adjust' and quantity <= 0:
+        raise StockError("'quantity' deve ser maior que zero")
+    order_id = data.get('order_id')
+    if order_id not in (None, ''):
+        try:
+            order_id = int(order_id)
+        except (TypeError, ValueError):
+            raise StockError(f"Valor inválido para 'order_id': {order_id}")
+    else:
+        order_id = None
+    return {'kind': kind, 'delta': -quantity if kind == 'out' else quantity,
+            'order_id': order_id, 'note': data.get('note') or None}
+
+
+def move_stock(product_id, kind, delta, order_id=None, note=None, created_by=None):
+    """Aplica a variação com um único UPDATE condicional e grava a movimentação na mesma
+    transação (da sessão; quem chama faz o commit).
+
+    Nenhum produto é lido antes: o banco só trava a linha do produto durante o UPDATE, então
+    movimentações concorrentes não se perdem. A versão de produtos sobe na mesma transação, mas
+    só no commit (_bump_stock_version): a linha de data_version, única para todos os produtos,
+    fica travada apenas durante o próprio commit.
+    """
+    if order_id is not None and db.session.scalar(select(Order.id).where(Order.id == order_id)) is None:
+        raise StockError("Pedido não encontrado")
+    condition = _product.c.id == product_id
+    if delta < 0:
+        condition = and_(condition, _product.c.stock >= -delta)
+    stock = db.session.execute(
+        update(_product).where(condition).values(stock=_product.c.stock + delta).returning(_product.c.stock)
+    ).scalar()
+    if stock is None:
+        current = db.session.scalar(select(_product.c.stock).where(_product.c.id == product_id))
+        if current is None:
+            raise StockError("Produto não encontrado", 404)
+        raise StockError(f"Estoque insuficiente: disponível {current}, solicitado {-delta}", 409)
+    values = {'product_id': product_id, 'kind': kind, 'quantity': delta, 'stock_after': stock,
+              'order_id': order_id, 'note': note, 'created_by': created_by, 'created_at': datetime.utcnow()}
+    values['id'] = db.session.execute(insert(StockMovement).values(**values).returning(StockMovement.id)).scalar()
+    db.session.info.setdefault('stock_products', set()).add(product_id)
+    return values
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_stock_version(session):
+    # Versão de produtos e change_version dos produtos movimentados, logo antes do commit
+    product_ids = session.info.pop('stock_products', None)
+    if not product_ids:
+        return
+    connection = session.connection()
+    bump_data_versions(connection, ['products'])
+    connection.execute(update(_product).where(_product.c.id.in_(product_ids))
+                       .values(change_version=entity_version('products')))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_stock_products(session):
+    session.info.pop('stock_products', None)
+
+
+def adjust_stock_to(product_id, target, note=None, created_by=None):
+    """Leva o estoque ao valor informado (edição do produto) com um ajuste pela diferença.
+
+    A diferença é aplicada como variação, não como valor absoluto: uma movimentação que
+    entre a leitura e o UPDATE continua contando.
+    """
+    if target < 0:
+        raise StockError("Estoque não pode ser negativo")
+    current = db.session.scalar(select(_product.c.stock).where(_product.c.id == product_id))
+    if current is None:
+        raise StockError("Produto não encontrado", 404)
+    if target == current:
+        return None
+    return move_stock(product_id, 'adjust', target - current, note=note, created_by=created_by)
+
+
+def set_stock_levels(connection, targets, note=None, created_by=None):
+    """Versão em lote de adjust_stock_to (importação): {product_id: estoque desejado}.
+
+    Como em move_stock, a diferença é aplicada por UPDATE condicional (stock + diferença >= 0)
+    com RETURNING. Um produto movimentado por outra transação entre a leitura e o UPDATE fica
+    de fora e é relido; quem chama já incrementou a versão de produtos (bump_data_versions).
+    Retorna quantos produtos mudaram.
+    """
+    if any(target < 0 for target in targets.values()):
+        raise StockError("Estoque não pode ser negativo")
+    pending, applied = dict(targets), []
+    for _ in range(STOCK_LEVEL_ATTEMPTS):
+        if not pending:
+            break
+        current = dict(connection.execute(
+            select(_product.c.id, _product.c.stock).where(_product.c.id.in_(pending))
+        ).all())
+        deltas = {product_id: pending[product_id] - stock for product_id, stock in current.items()
+                  if pending[product_id] != stock}
+        ids = list(deltas)
+        for start in range(0, len(ids), STOCK_LEVEL_BATCH):
+            batch = {product_id: deltas[product_id] for product_id in ids[start:start + STOCK_LEVEL_BATCH]}
+            delta = case(batch, value=_product.c.id)
+            rows = connection.execute(
+                update(_product).where(_product.c.id.in_(batch), _product.c.stock + delta >= 0)
+                .values(stock=_product.c.stock + delta, change_version=entity_version('products'))
+                .returning(_product.c.id, _product.c.stock)
+            ).all()
+            applied.extend((product_id, batch[product_id], stock) for product_id, stock in rows)
+            for product_id, _ in rows:
+                del deltas[product_id]
+        pending = {product_id: pending[product_id] for product_id in deltas}
+    if pending:
+        raise StockError(f"Estoque alterado por outras movimentações durante a importação (produtos "
+                         f"{', '.join(str(product_id) for product_id in sorted(pending)[:10])}); tente de novo", 409)
+    if applied:
+        now = datetime.utcnow()
+        connection.execute(insert(StockMovement), [
+            {'product_id': product_id, 'kind': 'adjust', 'quantity': delta, 'stock_after': stock,
+             'note': note, 'created_by': created_by, 'created_at': now} for product_id, delta, stock in applied
+        ])
+    return len(applied)
+
+
+def record_opening_balances(connection, condition=None, note='Saldo inicial'):
+    """Grava o saldo de abertura dos produtos com estoque e sem nenhuma movimentação
+    (produtos anteriores ao livro razão, novos cadastros e inserções em lote)."""
+    has_movements = exists().where(StockMovement.product_id == _product.c.id)
+    query = select(
+        _product.c.id, literal('adjust'), _product.c.stock, _product.c.stock, literal(note), literal(datetime.utcnow())
+    ).where(_product.c.stock != 0, not_(has_movements))
+    if condition is not None:
+        query = query.where(condition)
+    columns = ['product_id', 'kind', 'quantity', 'stock_after', 'note', 'created_at']
+    return connection.execute(insert(StockMovement).from_select(columns, query)).rowcount
+
+
+def product_has_movements(product_id):
+    """Produtos com movimentações não podem ser excluídos (o livro razão fica íntegro)."""
+    return db.session.scalar(select(exists().where(StockMovement.product_id == product_id)))
+
+
+def check_stock_ledger():
+    """Produtos cujo estoque difere da soma das movimentações: lista de (id, estoque, soma)."""
+    totals = (select(StockMovement.product_id, func.sum(StockMovement.quantity).label('total'))
+              .group_by(StockMovement.product_id).subquery())
+    total = func.coalesce(totals.c.total, 0)
+    rows = db.session.execute(
+        select(_product.c.id, _product.c.stock, total)
+        .select_from(_product.outerjoin(totals, totals.c.product_id == _product.c.id))
+        .where(_product.c.stock != total)
+    ).all()
+    return [tuple(row) for row in rows]
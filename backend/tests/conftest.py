@@ -0,0 +1,76 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from database import db  # noqa: E402
+from migrations import schema_metadata, upgrade  # noqa: E402
+
+# PostgreSQL descartável para os testes que dependem do planejador e de locks reais. O schema é
+# apagado e recriado a cada teste; sem a variável esses testes são pulados.
+PG_DSN = os.environ.get('TEST_DATABASE_URL')
+
+
+def make_app(uri, **config):
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SECRET_KEY': 'test',
+        'AUTH_REQUIRED': False,
+        'JOB_WORKERS': 0,
+        'ORDER_WEBHOOK_URL': None,
+        **config,
+    })
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(f"sqlite:///{tmp_path / 'test.db'}")
+    with app.app_context():
+        upgrade()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def make_pg_app():
+    """App no PostgreSQL de testes com o schema recriado do zero (pula o teste sem TEST_DATABASE_URL)."""
+    if not PG_DSN:
+        pytest.skip('TEST_DATABASE_URL não definida')
+    app = make_app(PG_DSN)
+    with app.app_context():
+        db.drop_all()
+        schema_metadata.drop_all(db.engine)
+        upgrade()
+    return app
+
+
+@pytest.fixture
+def pg_app():
+    app = make_pg_app()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@contextmanager
+def sql_statements(app):
+    """Lista os comandos SQL executados pelo app dentro do bloco."""
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
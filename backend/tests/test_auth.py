@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+from auth import AuthError, KdfPool, get_auth
+from conftest import make_app, sql_statements
+from database import User, db
+from migrations import upgrade
+
+
+def _apps(tmp_path, count=1, **config):
+    apps = [make_app(f"sqlite:///{tmp_path / 'auth.db'}", AUTH_REQUIRED=True, **config) for _ in range(count)]
+    with apps[0].app_context():
+        upgrade()
+        db.session.add(User(username='adm', password=get_auth().hash_password('x'), role='admin'))
+        db.session.commit()
+    return apps
+
+
+def _login(client, password='x'):
+    tokens = client.post('/api/login', json={'username': 'adm', 'password': password}).json
+    return tokens, {'Authorization': f"Bearer {tokens['access_token']}"}
+
+
+def test_password_change_revokes_old_tokens_but_not_new_ones(tmp_path):
+    app, = _apps(tmp_path)
+    client = app.test_client()
+    _, old = _login(client)
+    assert client.put('/api/users/1', headers=old, json={'password': 'y'}).status_code == 200
+    # Login no mesmo segundo da troca: o token novo vale, o antigo não
+    _, new = _login(client, 'y')
+    assert client.get('/api/clients', headers=new).status_code == 200
+    assert client.get('/api/clients', headers=old).status_code == 401
+
+
+def test_revocation_check_is_cached(tmp_path):
+    app, = _apps(tmp_path)
+    client = app.test_client()
+    _, headers = _login(client)
+    assert client.get('/api/clients', headers=headers).status_code == 200
+    with sql_statements(app) as statements:
+        assert client.get('/api/clients', headers=headers).status_code == 200
+    assert not [sql for sql in statements if 'revoked_token' in sql]
+
+
+def test_logout_is_seen_by_other_workers(tmp_path):
+    first, second = _apps(tmp_path, 2, AUTH_REVOCATION_CACHE_TTL=0)
+    a, b = first.test_client(), second.test_client()
+    tokens, headers = _login(a)
+    assert b.get('/api/clients', headers=headers).status_code == 200
+    assert a.post('/api/logout', headers=headers, json={'refresh_token': tokens['refresh_token']}).status_code == 200
+    assert a.get('/api/clients', headers=headers).status_code == 401
+    assert b.get('/api/clients', headers=headers).status_code == 401
+    assert b.post('/api/token/refresh', json={'refresh_token': tokens['refresh_token']}).status_code == 401
+
+
+def test_kdf_pool_leaves_a_thread_free():
+    pool = KdfPool(workers=2, max_pending=16, timeout=5, threads=4)
+    release = threading.Event()
+    callers = [threading.Thread(target=pool.run, args=(release.wait, 5)) for _ in range(3)]
+    for caller in callers:
+        caller.start()
+    try:
+        # Três chamadas (threads - 1) ocupam todas as vagas, não workers + max_pending = 18
+        deadline = time.monotonic() + 5
+        while pool._slots._value and time.monotonic() < deadline:
+            time.sleep(0.01)
+        with pytest.raises(AuthError) as error:
+            pool.run(lambda: None)
+        assert error.value.status == 503 and 'Retry-After' in error.value.headers
+    finally:
+        release.set()
+        for caller in callers:
+            caller.join()
@@ -0,0 +1,35 @@
+from database import Client, Order, db
+
+
+def _order(client_id, **values):
+    return {'client_id': client_id, 'material': 'Aço', 'thickness': '2mm', 'width': 100, 'length': 200,
+            'quantity': 1, 'value': 10.0, **values}
+
+
+def _client(app):
+    with app.app_context():
+        client = Client(name='Cliente')
+        db.session.add(client)
+        db.session.commit()
+        return client.id
+
+
+def test_batch_rejects_unknown_status_per_item(app, client):
+    client_id = _client(app)
+    response = client.post('/api/orders/batch', json={'orders': [
+        _order(client_id), _order(client_id, status='Perdido'), _order(client_id, status='em produção'),
+    ]})
+    assert response.status_code == 400
+    assert [error['index'] for error in response.json['errors']] == [1]
+    assert 'Perdido' in response.json['errors'][0]['message']
+    with app.app_context():
+        assert db.session.query(Order).count() == 0
+
+
+def test_batch_stores_the_configured_status_name(app, client):
+    client_id = _client(app)
+    response = client.post('/api/orders/batch', json={'orders': [
+        _order(client_id), _order(client_id, status='em produção'),
+    ]})
+    assert response.status_code == 201, response.json
+    assert [order['status'] for order in response.json['orders']] == ['Aguardando', 'Em produção']
@@ -0,0 +1,31 @@
+from conftest import make_app, sql_statements
+from database import Client, db
+from migrations import upgrade
+
+
+def test_not_modified_does_not_query_the_database(app, client):
+    etag = client.get('/api/clients').headers['ETag']
+    with sql_statements(app) as statements:
+        assert client.get('/api/clients', headers={'If-None-Match': etag}).status_code == 304
+    assert statements == []
+
+
+def test_write_in_the_same_process_changes_the_etag(client):
+    etag = client.get('/api/clients').headers['ETag']
+    assert client.post('/api/clients', json={'name': 'Novo'}).status_code == 201
+    response = client.get('/api/clients', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert [row['name'] for row in response.json] == ['Novo']
+
+
+def test_write_in_another_process_is_seen_after_the_version_ttl(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'cache.db'}"
+    web, job = make_app(uri, HTTP_CACHE_VERSION_TTL=0), make_app(uri)
+    with web.app_context():
+        upgrade()
+    client = web.test_client()
+    etag = client.get('/api/clients').headers['ETag']
+    with job.app_context():
+        db.session.add(Client(name='Do job'))
+        db.session.commit()
+    assert client.get('/api/clients', headers={'If-None-Match': etag}).status_code == 200
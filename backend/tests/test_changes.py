@@ -0,0 +1,51 @@
+import threading
+import time
+
+from conftest import make_app
+from database import Client, db
+from migrations import upgrade
+
+
+def _app(tmp_path, **config):
+    app = make_app(f"sqlite:///{tmp_path / 'changes.db'}", CHANGES_POLL_INTERVAL=0.05, **config)
+    with app.app_context():
+        upgrade()
+    return app
+
+
+def _cursor(client):
+    return client.get('/api/changes').json['cursor']
+
+
+def test_long_poll_returns_changes_written_during_the_wait(tmp_path):
+    app = _app(tmp_path)
+    client = app.test_client()
+    cursor = _cursor(client)
+
+    def write():
+        time.sleep(0.2)
+        with app.app_context():
+            db.session.add(Client(name='Novo'))
+            db.session.commit()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    body = client.get(f'/api/changes?entities=clients&since={cursor}&wait=5').json
+    writer.join()
+    assert [change['data']['name'] for change in body['changes']] == ['Novo']
+
+
+def test_long_polls_above_the_limit_return_at_once(tmp_path):
+    app = _app(tmp_path, CHANGES_MAX_WAITERS=1)
+    cursor = _cursor(app.test_client())
+    waiting = threading.Thread(target=lambda: app.test_client().get(
+        f'/api/changes?entities=clients&since={cursor}&wait=1'))
+    waiting.start()
+    try:
+        time.sleep(0.2)
+        started = time.monotonic()
+        body = app.test_client().get(f'/api/changes?entities=clients&since={cursor}&wait=1').json
+        assert time.monotonic() - started < 0.5
+        assert body['retry_after'] > 0
+    finally:
+        waiting.join()
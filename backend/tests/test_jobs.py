@@ -0,0 +1,35 @@
+import pytest
+
+from auth import get_auth
+from conftest import make_app
+from database import User, db
+from migrations import upgrade
+
+
+@pytest.fixture
+def auth_app(tmp_path):
+    app = make_app(f"sqlite:///{tmp_path / 'jobs.db'}", AUTH_REQUIRED=True)
+    with app.app_context():
+        upgrade()
+        for username, role in (('adm', 'admin'), ('ana', 'user'), ('bia', 'user')):
+            db.session.add(User(username=username, password=get_auth().hash_password('x'), role=role))
+        db.session.commit()
+    return app
+
+
+def _headers(client, username):
+    token = client.post('/api/login', json={'username': username, 'password': 'x'}).json['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_jobs_are_visible_only_to_their_owner_and_admins(auth_app):
+    client = auth_app.test_client()
+    owner, other, admin = (_headers(client, username) for username in ('ana', 'bia', 'adm'))
+    job_id = client.post('/api/clients/export', headers=owner).json['id']
+
+    assert client.get(f'/api/jobs/{job_id}', headers=owner).status_code == 200
+    assert client.get(f'/api/jobs/{job_id}', headers=admin).status_code == 200
+    assert client.get(f'/api/jobs/{job_id}', headers=other).status_code == 404
+    assert client.get(f'/api/jobs/{job_id}/download', headers=other).status_code == 404
+    assert client.post(f'/api/jobs/{job_id}/cancel', headers=other).status_code == 404
+    assert client.post(f'/api/jobs/{job_id}/cancel', headers=owner).status_code == 200
@@ -0,0 +1,44 @@
+import logging
+import multiprocessing
+
+from metrics import Metrics, reset_directory
+
+REQUESTS = 'http_requests_total{endpoint="/api/orders",method="GET",status="200"}'
+LATENCY_COUNT = 'http_request_duration_seconds_count{endpoint="/api/orders",method="GET"}'
+
+
+def _metrics(directory):
+    return Metrics(1.0, 0, logging.getLogger(__name__), directory)
+
+
+def _worker(directory, requests, retire):
+    metrics = _metrics(directory)
+    for _ in range(requests):
+        metrics.record('/api/orders', 'GET', 200, 0.01, 100, None)
+    # Worker reciclado: soma os contadores ao total dos encerrados; o outro segue ativo
+    metrics.retire() if retire else metrics.flush()
+
+
+def test_render_sums_running_and_retired_workers(tmp_path):
+    directory = str(tmp_path)
+    reset_directory(directory)
+    workers = [multiprocessing.get_context('fork').Process(target=_worker, args=(directory, n, n == 2))
+               for n in (2, 3)]
+    for worker in workers:
+        worker.start()
+        worker.join()
+    metrics = _metrics(directory)
+    metrics.record('/api/orders', 'GET', 200, 0.01, 100, None)
+    text = metrics.render()
+    assert f'{REQUESTS} 6' in text
+    assert f'{LATENCY_COUNT} 6' in text
+    # Encerrados, o worker ativo e este processo
+    names = sorted(path.name for path in tmp_path.glob('metrics-*.json'))
+    assert len(names) == 3 and 'metrics-retired.json' in names
+    assert any(name.startswith(f'metrics-{workers[1].pid}-') for name in names)
+
+
+def test_render_without_directory_shows_the_process_counters():
+    metrics = _metrics(None)
+    metrics.record('/api/orders', 'GET', 200, 0.01, 100, None)
+    assert f'{REQUESTS} 1' in metrics.render()
@@ -0,0 +1,39 @@
+"""A listagem de pedidos não pode fazer uma consulta por pedido (N+1): a contagem de comandos
+SQL de cada rota é a mesma com bases de tamanhos diferentes."""
+import pytest
+
+from conftest import make_app, sql_statements
+from database import db, Client, Order
+
+SIZES = (5, 50, 500)
+ROUTES = ('/api/orders', '/api/pedidos', '/api/orders?limit=100')
+
+
+def _app(orders):
+    app = make_app('sqlite://', HTTP_CACHE_BACKEND='none')
+    with app.app_context():
+        db.create_all()
+        clients = [Client(name=f'Cliente {n}') for n in range(max(1, orders // 5))]
+        db.session.add_all(clients)
+        db.session.flush()
+        db.session.add_all(Order(
+            order_number=f'P{n}', client_id=clients[n % len(clients)].id, material='Aço',
+            thickness='2mm', width=100, length=200, quantity=1, value=10.0
+        ) for n in range(orders))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture(scope='module')
+def apps():
+    return [_app(size) for size in SIZES]
+
+
+@pytest.mark.parametrize('route', ROUTES)
+def test_order_listing_query_count_is_constant(apps, route):
+    counts = []
+    for app in apps:
+        with sql_statements(app) as statements:
+            assert app.test_client().get(route).status_code == 200
+        counts.append(len(statements))
+    assert len(set(counts)) == 1, dict(zip(SIZES, counts))
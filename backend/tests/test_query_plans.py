@@ -0,0 +1,114 @@
+"""Planos das consultas mais acessadas no PostgreSQL, com volume parecido com o de produção.
+
+Com tabelas quase vazias o planner prefere varredura sequencial mesmo havendo índice, então o
+banco de testes é povoado antes (SEED_ROWS) e o planner escolhe livremente: uma consulta sem
+índice utilizável aparece como Seq Scan na tabela indicada.
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from conftest import make_pg_app
+from database import db, Client, Order, Product, Tombstone, LOW_STOCK_THRESHOLD
+from search import SEARCH_TYPES, postgres_statements
+
+# (nome, tabela que não pode ser lida por varredura sequencial, consulta), no formato em que os
+# handlers as executam. O rollup de vendas fica de fora: tem uma linha por mês e status, e ler
+# a tabela inteira é o plano certo.
+HOT_QUERIES = [
+    ('listagem de pedidos (keyset)', 'order',
+     select(Order).order_by(Order.created_at, Order.id).limit(50)),
+    ('pedidos por cliente', 'order',
+     select(Order).where(Order.client_id == 1).order_by(Order.created_at, Order.id).limit(50)),
+    ('pedidos por status', 'order',
+     select(Order).where(Order.status == 'Aguardando').order_by(Order.created_at, Order.id).limit(50)),
+    ('pedidos por período', 'order',
+     select(Order).where(Order.created_at >= datetime(2024, 1, 1), Order.created_at < datetime(2024, 2, 1))),
+    ('listagem de clientes (keyset)', 'client',
+     select(Client).order_by(Client.created_at, Client.id).limit(50)),
+    ('listagem de produtos (keyset)', 'product',
+     select(Product).order_by(Product.created_at, Product.id).limit(50)),
+    ('produtos com estoque baixo', 'product',
+     select(Product).where(Product.stock <= LOW_STOCK_THRESHOLD)),
+    ('feed de alterações de pedidos', 'order',
+     select(Order).where(Order.change_version > 10, Order.change_version <= 20)
+     .order_by(Order.change_version, Order.id).limit(200)),
+    ('feed de exclusões', 'tombstone',
+     select(Tombstone).where(Tombstone.entity == 'orders', Tombstone.version > 10, Tombstone.version <= 20)
+     .order_by(Tombstone.version, Tombstone.id).limit(200)),
+] + [
+    # Busca (/api/search) por índices de trigramas
+    (f'busca de {search_type} ({layer})', target.model.__tablename__, statement)
+    for search_type, target in SEARCH_TYPES.items()
+    for layer, statement in zip(('prefixo', 'prefixo do código', 'substring'),
+                                postgres_statements(target, 'aco', '123', 10))
+]
+
+SEED_ROWS = {'client': 5000, 'product': 20000, 'order': 200000, 'tombstone': 50000}
+ORDER_STATUSES = ('Aguardando', 'Em produção', 'Pronto', 'Concluído', 'Entregue', 'Cancelado')
+
+
+def _timestamp(minutes):
+    # A partir de 2022: pedidos espalhados por uns três anos
+    return f"TIMESTAMP '2022-01-01' + ({minutes}) * INTERVAL '1 minute'"
+
+
+def _case(expression, values):
+    return 'CASE ' + ' '.join(f"WHEN {expression} = {n} THEN '{value}'" for n, value in enumerate(values)) + ' END'
+
+
+def seed_rows(connection):
+    """Povoa as tabelas com volume e distribuição parecidos com os de produção (clientes,
+    status e datas variados) e atualiza as estatísticas."""
+    created = _timestamp('n * 600')
+    connection.exec_driver_sql(
+        f"INSERT INTO client (name, created_at, updated_at, change_version) "
+        f"SELECT 'Cliente do plano ' || n, {created}, {created}, n FROM generate_series(1, {SEED_ROWS['client']}) n"
+    )
+    created = _timestamp('n * 60')
+    connection.exec_driver_sql(
+        f"INSERT INTO product (name, price, stock, created_at, updated_at, change_version) "
+        f"SELECT 'Produto do plano ' || n, 10, CASE WHEN n % 100 = 0 THEN 0 ELSE 100 + n % 500 END, "
+        f"{created}, {created}, n FROM generate_series(1, {SEED_ROWS['product']}) n"
+    )
+    created = _timestamp('n * 8')
+    # Cada pedido vai para um cliente existente, em rodízio
+    connection.exec_driver_sql(
+        f'INSERT INTO "order" (order_number, client_id, material, thickness, width, length, quantity, '
+        f'value, status, created_at, updated_at, change_version) '
+        f"SELECT 'PLANO-' || n, (SELECT min(id) FROM client) + n % {SEED_ROWS['client']}, 'Aço carbono', "
+        f"'2mm', 100, 200, 1, 50, {_case('n % 6', ORDER_STATUSES)}, {created}, {created}, n "
+        f"FROM generate_series(1, {SEED_ROWS['order']}) n"
+    )
+    connection.exec_driver_sql(
+        f"INSERT INTO tombstone (entity, row_id, version, deleted_at) "
+        f"SELECT {_case('n % 3', ('orders', 'clients', 'products'))}, n, n, {_timestamp('n')} "
+        f"FROM generate_series(1, {SEED_ROWS['tombstone']}) n"
+    )
+    connection.exec_driver_sql('ANALYZE')
+
+
+@pytest.fixture(scope='module')
+def seeded():
+    app = make_pg_app()
+    with app.app_context():
+        with db.engine.begin() as connection:
+            seed_rows(connection)
+        with db.engine.connect() as connection:
+            yield connection
+        db.engine.dispose()
+
+
+def _sequential_scan(table, plan):
+    for line in plan:
+        if 'Seq Scan on' in line and (f' {table} ' in f'{line} ' or f'"{table}"' in line):
+            return line.strip()
+    return None
+
+
+@pytest.mark.parametrize('name, table, statement', HOT_QUERIES, ids=[name for name, _, _ in HOT_QUERIES])
+def test_hot_query_uses_an_index(seeded, name, table, statement):
+    sql = str(statement.compile(dialect=seeded.dialect, compile_kwargs={'literal_binds': True}))
+    plan = [row[0] for row in seeded.exec_driver_sql(f'EXPLAIN {sql}')]
+    assert _sequential_scan(table, plan) is None, '\n'.join(plan)
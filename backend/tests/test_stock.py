@@ -0,0 +1,108 @@
+import threading
+import time
+
+from sqlalchemy import select, text
+
+from data_versions import data_versions
+from database import Product, db
+from stock import StockError, check_stock_ledger, move_stock
+
+
+def _products(app, count, stock=0):
+    with app.app_context():
+        products = [Product(name=f'Produto {i}', price=1.0, stock=stock) for i in range(count)]
+        db.session.add_all(products)
+        db.session.commit()
+        return [product.id for product in products]
+
+
+def test_move_stock_bumps_version_on_commit(app):
+    product_id, = _products(app, 1)
+    with app.app_context():
+        before = data_versions('products')
+        change_version = db.session.scalar(select(Product.change_version).where(Product.id == product_id))
+        move_stock(product_id, 'in', 5)
+        db.session.commit()
+        assert data_versions('products') != before
+        assert db.session.scalar(select(Product.change_version).where(Product.id == product_id)) > change_version
+
+
+def test_move_stock_rollback_keeps_version(app):
+    product_id, = _products(app, 1)
+    with app.app_context():
+        before = data_versions('products')
+        move_stock(product_id, 'in', 5)
+        db.session.rollback()
+        db.session.commit()
+        assert data_versions('products') == before
+        assert db.session.get(Product, product_id).stock == 0
+
+
+def test_move_stock_rejects_insufficient_stock(app):
+    product_id, = _products(app, 1, stock=2)
+    with app.app_context():
+        try:
+            move_stock(product_id, 'out', -3)
+        except StockError as e:
+            assert e.status == 409
+        else:
+            raise AssertionError('saída maior que o estoque foi aceita')
+
+
+def test_open_movement_does_not_block_other_products(pg_app):
+    """Uma movimentação com a transação aberta não pode segurar as de outros produtos."""
+    first, second = _products(pg_app, 2, stock=10)
+    moved, release = threading.Event(), threading.Event()
+
+    def hold():
+        with pg_app.app_context():
+            move_stock(first, 'out', -1)
+            moved.set()
+            release.wait(10)
+            db.session.commit()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    try:
+        assert moved.wait(10)
+        with pg_app.app_context():
+            db.session.execute(text("SET LOCAL lock_timeout = '2s'"))
+            started = time.monotonic()
+            move_stock(second, 'out', -1)
+            db.session.commit()
+            assert time.monotonic() - started < 2
+    finally:
+        release.set()
+        holder.join()
+    with pg_app.app_context():
+        assert [db.session.get(Product, product_id).stock for product_id in (first, second)] == [9, 9]
+
+
+def test_concurrent_movements_match_ledger(pg_app):
+    product_ids = _products(pg_app, 2, stock=0)
+    threads, movements, errors = 8, 25, []
+
+    def work(n):
+        with pg_app.app_context():
+            try:
+                for i in range(movements):
+                    product_id = product_ids[(n + i) % 2]
+                    move_stock(product_id, 'in', 2)
+                    db.session.commit()
+                    try:
+                        move_stock(product_id, 'out', -1)
+                        db.session.commit()
+                    except StockError:
+                        db.session.rollback()
+            except Exception as e:
+                errors.append(e)
+
+    workers = [threading.Thread(target=work, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert errors == []
+    with pg_app.app_context():
+        assert check_stock_ledger() == []
+        assert sum(db.session.get(Product, product_id).stock for product_id in product_ids) == threads * movements
@@ -6,6 +6,7 @@ import Pedidos from './components/Pedidos'
 import Clientes from './components/Clientes'
 import Relatorios from './components/Relatorios'
 import Configuracoes from './components/Configuracoes'
+import { logout } from './lib/api'
 import './App.css'
 
 function App() {
@@ -16,6 +17,7 @@ function App() {
   }
 
   const handleLogout = () => {
+    logout()
     setIsAuthenticated(false)
     setCurrentPage('dashboard')
   }
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState } from 'react';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
@@ -27,9 +27,12 @@ import {
   TooltipProvider,
   TooltipTrigger,
 } from "@/components/ui/tooltip";
+import { authFetch, authFetchJob } from "@/lib/api";
+import { useSyncedList } from "@/hooks/use-synced-list";
 
 const Clientes = () => {
-  const [clientes, setClientes] = useState([]);
+  // Lista mantida em dia pelo feed de alterações (/api/changes)
+  const [clientes, syncClients] = useSyncedList("clients", "/api/clients");
   const [showForm, setShowForm] = useState(false);
   const [editingCliente, setEditingCliente] = useState(null);
   const [searchTerm, setSearchTerm] = useState("");
@@ -46,36 +49,18 @@ const Clientes = () => {
 
   const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || "http://localhost:5000";
 
-  const fetchClients = async () => {
-    try {
-      const response = await fetch(`${API_BASE_URL}/api/clients`);
-      if (response.ok) {
-        const data = await response.json();
-        setClientes(data);
-      } else {
-        console.error("Erro ao buscar clientes:", response.statusText);
-      }
-    } catch (error) {
-      console.error("Erro de rede ao buscar clientes:", error);
-    }
-  };
-
-  useEffect(() => {
-    fetchClients();
-  }, []);
-
   const handleSubmit = async (e) => {
     e.preventDefault();
     try {
       let response;
       if (editingCliente) {
-        response = await fetch(`${API_BASE_URL}/api/clients/${editingCliente.id}`, {
+        response = await authFetch(`${API_BASE_URL}/api/clients/${editingCliente.id}`, {
           method: 'PUT',
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify(formData)
         });
       } else {
-        response = await fetch(`${API_BASE_URL}/api/clients`, {
+        response = await authFetch(`${API_BASE_URL}/api/clients`, {
           method: 'POST',
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify(formData)
@@ -83,7 +68,7 @@ const Clientes = () => {
       }
 
       if (response.ok) {
-        fetchClients();
+        syncClients();
         resetForm();
         alert('Cliente salvo com sucesso!'); // Manter alert por enquanto
       } else {
@@ -129,11 +114,11 @@ const Clientes = () => {
       return;
     }
     try {
-      const response = await fetch(`${API_BASE_URL}/api/clients/${id}`, {
+      const response = await authFetch(`${API_BASE_URL}/api/clients/${id}`, {
         method: 'DELETE'
       });
       if (response.ok) {
-        fetchClients();
+        syncClients();
         alert('Cliente deletado com sucesso!'); // Manter alert por enquanto
       } else {
         const errorData = await response.json();
@@ -148,13 +133,13 @@ const Clientes = () => {
   const toggleStatus = async (id, currentStatus) => {
     try {
       const newStatus = currentStatus === 'Ativo' ? 'Inativo' : 'Ativo';
-      const response = await fetch(`${API_BASE_URL}/api/clients/${id}`, {
+      const response = await authFetch(`${API_BASE_URL}/api/clients/${id}`, {
         method: 'PUT',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ status: newStatus })
       });
       if (response.ok) {
-        fetchClients();
+        syncClients();
         alert(`Status do cliente alterado para ${newStatus}.`); // Manter alert por enquanto
       } else {
         const errorData = await response.json();
@@ -169,7 +154,7 @@ const Clientes = () => {
   // FUNÇÃO DE EXPORTAÇÃO DE CLIENTES
   const handleExportClients = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/clients/export`);
+      const response = await authFetchJob(`${API_BASE_URL}/api/clients/export`, { method: "POST" });
 
       if (response.ok) {
         const blob = await response.blob();
@@ -208,7 +193,7 @@ const Clientes = () => {
     formData.append('file', fileToImport);
 
     try {
-      const response = await fetch(`${API_BASE_URL}/api/clients/import`, {
+      const response = await authFetchJob(`${API_BASE_URL}/api/clients/import`, {
         method: 'POST',
         body: formData,
       });
@@ -217,7 +202,7 @@ const Clientes = () => {
         const data = await response.json();
         alert(data.message);
         setFileToImport(null);
-        fetchClients();
+        syncClients();
       } else {
         const errorData = await response.json();
         alert(`Erro na importação: ${errorData.message}`);
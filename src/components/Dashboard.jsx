@@ -12,6 +12,7 @@ import {
   Bar,
   CartesianGrid
 } from 'recharts';
+import { authFetch } from '@/lib/api';
 
 const Dashboard = () => {
   // Dados simulados para demonstração (manter por enquanto, ou remover se todos os dados vierem da API)
@@ -52,7 +53,7 @@ const Dashboard = () => {
 
   const fetchSalesData = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/dashboard/sales_by_month`);
+      const response = await authFetch(`${API_BASE_URL}/api/dashboard/sales_by_month`);
       if (response.ok) {
         const data = await response.json();
         setSalesData(data);
@@ -67,7 +68,7 @@ const Dashboard = () => {
   // NOVO: Função para buscar produtos com estoque baixo
   const fetchLowStockProducts = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/dashboard/low_stock_products`);
+      const response = await authFetch(`${API_BASE_URL}/api/dashboard/low_stock_products`);
       if (response.ok) {
         const data = await response.json();
         setLowStockProducts(data);
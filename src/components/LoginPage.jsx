@@ -5,6 +5,7 @@ import { Label } from '@/components/ui/label'
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card'
 import { Alert, AlertDescription } from '@/components/ui/alert'
 import { Eye, EyeOff, Lock, User } from 'lucide-react'
+import { setTokens } from '@/lib/api'
 
 const LoginPage = ({ onLogin }) => {
   const [credentials, setCredentials] = useState({
@@ -34,6 +35,7 @@ const LoginPage = ({ onLogin }) => {
       if (response.ok) {
         const data = await response.json();
         console.log(data.message);
+        setTokens(data);
         onLogin(true); // Indica sucesso no login
       } else {
         const errorData = await response.json();
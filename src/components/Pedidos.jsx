@@ -35,12 +35,17 @@ import {
   Edit
 
 } from 'lucide-react'
+import { authFetch } from '@/lib/api'
+
+import { useSyncedList } from '@/hooks/use-synced-list'
 
 
 
 const Pedidos = () => {
 
-  const [pedidos, setPedidos] = useState([])
+  // Lista mantida em dia pelo feed de alterações (/api/changes)
+
+  const [pedidos, syncPedidos] = useSyncedList('pedidos', '/api/pedidos')
 
   const [clientesDisponiveis, setClientesDisponiveis] = useState([])
 
@@ -72,43 +77,11 @@ const Pedidos = () => {
 
   const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || "http://localhost:5000";
 
-  const N8N_WEBHOOK_URL = "https://n8n-nw.nicwalsolutions.com.br/webhook-test/evo-api-nw-5511979987046";
-
-
-
-  const fetchPedidos = async () => {
-
-    try {
-
-      const response = await fetch(`${API_BASE_URL}/api/pedidos`);
-
-      if (response.ok) {
-
-        const data = await response.json();
-
-        setPedidos(data);
-
-      } else {
-
-        console.error("Erro ao buscar pedidos:", response.statusText);
-
-      }
-
-    } catch (error) {
-
-      console.error("Erro de rede ao buscar pedidos:", error);
-
-    }
-
-  };
-
-
-
   const fetchClientesDisponiveis = async () => {
 
     try {
 
-      const response = await fetch(`${API_BASE_URL}/api/clients`);
+      const response = await authFetch(`${API_BASE_URL}/api/clients`);
 
       if (response.ok) {
 
@@ -156,8 +129,6 @@ const Pedidos = () => {
 
   useEffect(() => {
 
-    fetchPedidos();
-
     fetchClientesDisponiveis();
 
     fetchMateriaisDisponiveis();
@@ -194,46 +165,6 @@ const Pedidos = () => {
 
 
 
-  const enviarPedidoParaN8n = async (pedido) => {
-
-    try {
-
-      const response = await fetch(N8N_WEBHOOK_URL, {
-
-        method: "POST",
-
-        headers: {
-
-          "Content-Type": "application/json",
-
-        },
-
-        body: JSON.stringify(pedido),
-
-      });
-
-
-
-      if (response.ok) {
-
-        console.log("✅ Pedido enviado ao N8N com sucesso!", await response.json());
-
-      } else {
-
-        console.error("❌ Erro ao enviar pedido para o N8N:", response.statusText);
-
-      }
-
-    } catch (error) {
-
-      console.error("❌ Erro de rede ao enviar pedido para o N8N:", error);
-
-    }
-
-  };
-
-
-
   const handleSubmit = async (e) => {
 
     e.preventDefault();
@@ -254,7 +185,7 @@ const Pedidos = () => {
 
       data: editingPedido ? editingPedido.data : new Date().toISOString().split('T')[0],
 
-      cliente_nome: clienteNome // Adiciona o nome do cliente para o PDF/N8N
+      cliente_nome: clienteNome // Adiciona o nome do cliente para o PDF
 
     };
 
@@ -266,7 +197,7 @@ const Pedidos = () => {
 
       if (editingPedido) {
 
-        response = await fetch(`${API_BASE_URL}/api/pedidos/${editingPedido.id}`, {
+        response = await authFetch(`${API_BASE_URL}/api/pedidos/${editingPedido.id}`, {
 
           method: 'PUT',
 
@@ -278,7 +209,7 @@ const Pedidos = () => {
 
       } else {
 
-        response = await fetch(`${API_BASE_URL}/api/pedidos`, {
+        response = await authFetch(`${API_BASE_URL}/api/pedidos`, {
 
           method: 'POST',
 
@@ -294,16 +225,10 @@ const Pedidos = () => {
 
       if (response.ok) {
 
-        fetchPedidos();
+        syncPedidos();
 
         resetForm();
 
-        if (!editingPedido) {
-
-          enviarPedidoParaN8n(pedidoData);
-
-        }
-
       } else {
 
         console.error("Erro ao salvar pedido:", response.statusText);
@@ -380,7 +305,7 @@ const Pedidos = () => {
 
     try {
 
-      const response = await fetch(`${API_BASE_URL}/api/pedidos/${id}`, {
+      const response = await authFetch(`${API_BASE_URL}/api/pedidos/${id}`, {
 
         method: 'DELETE'
 
@@ -388,7 +313,7 @@ const Pedidos = () => {
 
       if (response.ok) {
 
-        fetchPedidos();
+        syncPedidos();
 
       } else {
 
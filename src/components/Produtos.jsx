@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState } from 'react';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label'; // Importado Label
@@ -16,9 +16,12 @@ import {
   Trash2, // Ícone de exclusão
   X // Ícone para fechar formulário
 } from 'lucide-react';
+import { authFetch, authFetchJob } from '@/lib/api';
+import { useSyncedList } from '@/hooks/use-synced-list';
 
 const Produtos = () => {
-  const [products, setProducts] = useState([]);
+  // Lista mantida em dia pelo feed de alterações (/api/changes)
+  const [products, syncProducts] = useSyncedList('products', '/api/products');
   const [searchTerm, setSearchTerm] = useState("");
   const [fileToImport, setFileToImport] = useState(null);
   const [showForm, setShowForm] = useState(false); // NOVO: Estado para mostrar/esconder formulário
@@ -33,30 +36,10 @@ const Produtos = () => {
 
   const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || "http://localhost:5000";
 
-  // Função para buscar produtos do backend
-  const fetchProducts = async () => {
-    try {
-      const response = await fetch(`${API_BASE_URL}/api/products`);
-      if (response.ok) {
-        const data = await response.json();
-        setProducts(data);
-      } else {
-        console.error("Erro ao buscar produtos:", response.statusText);
-      }
-    } catch (error) {
-      console.error("Erro de rede ao buscar produtos:", error);
-    }
-  };
-
-  // Carrega produtos ao montar o componente
-  useEffect(() => {
-    fetchProducts();
-  }, []);
-
   // FUNÇÃO DE EXPORTAÇÃO DE PRODUTOS
   const handleExportProducts = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/products/export`); // Você precisaria criar esta rota no backend
+      const response = await authFetchJob(`${API_BASE_URL}/api/products/export`, { method: "POST" });
 
       if (response.ok) {
         const blob = await response.blob();
@@ -95,7 +78,7 @@ const Produtos = () => {
     formData.append('file', fileToImport);
 
     try {
-      const response = await fetch(`${API_BASE_URL}/api/products/import`, {
+      const response = await authFetchJob(`${API_BASE_URL}/api/products/import`, {
         method: 'POST',
         body: formData,
       });
@@ -104,7 +87,7 @@ const Produtos = () => {
         const data = await response.json();
         alert(data.message);
         setFileToImport(null);
-        fetchProducts(); // Atualiza a lista de produtos após a importação
+        syncProducts(); // Atualiza a lista de produtos após a importação
       } else {
         const errorData = await response.json();
         alert(`Erro na importação de produtos: ${errorData.message}`);
@@ -122,14 +105,14 @@ const Produtos = () => {
       let response;
       if (editingProduct) {
         // Rota PUT para atualizar
-        response = await fetch(`${API_BASE_URL}/api/products/${editingProduct.id}`, {
+        response = await authFetch(`${API_BASE_URL}/api/products/${editingProduct.id}`, {
           method: 'PUT',
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify(formData)
         });
       } else {
         // Rota POST para criar
-        response = await fetch(`${API_BASE_URL}/api/products`, {
+        response = await authFetch(`${API_BASE_URL}/api/products`, {
           method: 'POST',
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify(formData)
@@ -137,7 +120,7 @@ const Produtos = () => {
       }
 
       if (response.ok) {
-        fetchProducts(); // Recarrega a lista de produtos
+        syncProducts(); // Atualiza a lista de produtos
         resetForm(); // Limpa e esconde o formulário
       } else {
         const errorData = await response.json();
@@ -178,12 +161,12 @@ const Produtos = () => {
       return;
     }
     try {
-      const response = await fetch(`${API_BASE_URL}/api/products/${id}`, {
+      const response = await authFetch(`${API_BASE_URL}/api/products/${id}`, {
         method: 'DELETE'
       });
       if (response.ok) {
         alert("Produto deletado com sucesso!");
-        fetchProducts(); // Recarrega a lista de produtos
+        syncProducts(); // Atualiza a lista de produtos
       } else {
         const errorData = await response.json();
         alert(`Erro ao deletar produto: ${errorData.message}`);
@@ -26,6 +26,7 @@ import {
   SelectTrigger,
   SelectValue,
 } from "@/components/ui/select"; // Importado Select para o campo de role
+import { authFetch } from '@/lib/api';
 
 const Usuarios = () => {
   const [users, setUsers] = useState([]);
@@ -43,7 +44,7 @@ const Usuarios = () => {
   // Função para buscar usuários do backend
   const fetchUsers = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/users`);
+      const response = await authFetch(`${API_BASE_URL}/api/users`);
       if (response.ok) {
         const data = await response.json();
         setUsers(data);
@@ -67,14 +68,14 @@ const Usuarios = () => {
       let response;
       if (editingUser) {
         // Rota PUT para atualizar
-        response = await fetch(`${API_BASE_URL}/api/users/${editingUser.id}`, {
+        response = await authFetch(`${API_BASE_URL}/api/users/${editingUser.id}`, {
           method: 'PUT',
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify(formData)
         });
       } else {
         // Rota POST para criar
-        response = await fetch(`${API_BASE_URL}/api/users`, {
+        response = await authFetch(`${API_BASE_URL}/api/users`, {
           method: 'POST',
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify(formData)
@@ -123,7 +124,7 @@ const Usuarios = () => {
       return;
     }
     try {
-      const response = await fetch(`${API_BASE_URL}/api/users/${id}`, {
+      const response = await authFetch(`${API_BASE_URL}/api/users/${id}`, {
         method: 'DELETE'
       });
       if (response.ok) {
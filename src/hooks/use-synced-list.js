@@ -0,0 +1,101 @@
+import { useCallback, useEffect, useRef, useState } from "react";
+import { authFetch } from "@/lib/api";
+
+const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || "http://localhost:5000";
+// Long-poll: o servidor segura a requisição até haver alteração ou este prazo passar
+const WAIT_SECONDS = 25;
+const ERROR_RETRY_MS = 5000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Aplica as alterações do feed (/api/changes) na lista, na ordem recebida
+function applyChanges(items, changes) {
+  if (!changes.length) return items;
+  const next = [...items];
+  const index = new Map(next.map((item, position) => [item.id, position]));
+  let removed = false;
+  for (const change of changes) {
+    if (change.op === "delete") {
+      if (index.has(change.id)) {
+        next[index.get(change.id)] = null;
+        index.delete(change.id);
+        removed = true;
+      }
+    } else if (index.has(change.data.id)) {
+      next[index.get(change.data.id)] = change.data;
+    } else {
+      index.set(change.data.id, next.length);
+      next.push(change.data);
+    }
+  }
+  return removed ? next.filter(Boolean) : next;
+}
+
+// Lista carregada uma vez e mantida em dia pelo feed de alterações, sem baixar a tabela
+// inteira a cada escrita. `sync()` busca as alterações na hora (ex.: depois de salvar).
+export function useSyncedList(entity, listPath) {
+  const [items, setItems] = useState([]);
+  const pending = useRef(null);
+
+  useEffect(() => {
+    let active = true;
+    let cursor = null;
+
+    // Cursor antes da lista: o que mudar entre as duas chamadas chega pelo feed
+    const load = async () => {
+      const start = await authFetch(`${API_BASE_URL}/api/changes`);
+      const list = await authFetch(`${API_BASE_URL}${listPath}`);
+      if (!start.ok || !list.ok) throw new Error(`Erro ao carregar ${entity}`);
+      cursor = (await start.json()).cursor;
+      const data = await list.json();
+      if (active) setItems(data);
+    };
+
+    const run = async () => {
+      let immediate = false;
+      while (active) {
+        try {
+          if (!cursor) await load();
+          const controller = new AbortController();
+          pending.current = controller;
+          const wait = immediate ? 0 : WAIT_SECONDS;
+          const response = await authFetch(
+            `${API_BASE_URL}/api/changes?entities=${entity}&since=${cursor}&wait=${wait}`,
+            { signal: controller.signal }
+          );
+          if (response.status === 410) {
+            // Cursor antigo demais: recarrega a lista inteira
+            cursor = null;
+            continue;
+          }
+          if (!response.ok) throw new Error(response.statusText);
+          const data = await response.json();
+          if (!active) return;
+          cursor = data.cursor;
+          setItems((current) => applyChanges(current, data.changes));
+          immediate = data.has_more;
+          if (data.retry_after) await sleep(data.retry_after * 1000);
+        } catch (error) {
+          if (!active) return;
+          if (error.name === "AbortError") {
+            // sync(): consulta de novo sem esperar
+            immediate = true;
+            continue;
+          }
+          console.error(`Erro ao sincronizar ${entity}:`, error);
+          await sleep(ERROR_RETRY_MS);
+        }
+      }
+    };
+
+    run();
+    return () => {
+      active = false;
+      pending.current?.abort();
+    };
+  }, [entity, listPath]);
+
+  const sync = useCallback(() => pending.current?.abort(), []);
+
+  return [items, sync];
+}
@@ -0,0 +1,99 @@
+// Tokens de acesso emitidos por /api/login. O access token expira em poucos minutos e é
+// renovado automaticamente com o refresh token quando uma chamada recebe 401.
+const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || "http://localhost:5000";
+const STORAGE_KEY = "gbl_tokens";
+
+export function getTokens() {
+  try {
+    return JSON.parse(localStorage.getItem(STORAGE_KEY)) || null;
+  } catch {
+    return null;
+  }
+}
+
+export function setTokens(data) {
+  localStorage.setItem(STORAGE_KEY, JSON.stringify({
+    access_token: data.access_token,
+    refresh_token: data.refresh_token,
+  }));
+}
+
+export function clearTokens() {
+  localStorage.removeItem(STORAGE_KEY);
+}
+
+let refreshing = null;
+
+async function refreshTokens() {
+  const tokens = getTokens();
+  if (!tokens?.refresh_token) return false;
+  const response = await fetch(`${API_BASE_URL}/api/token/refresh`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ refresh_token: tokens.refresh_token }),
+  });
+  if (!response.ok) {
+    clearTokens();
+    return false;
+  }
+  setTokens(await response.json());
+  return true;
+}
+
+function withAuth(options = {}) {
+  const tokens = getTokens();
+  const headers = new Headers(options.headers || {});
+  if (tokens?.access_token) headers.set("Authorization", `Bearer ${tokens.access_token}`);
+  return { ...options, headers };
+}
+
+// fetch com o header Authorization; em 401 tenta renovar o token uma vez e repete a chamada
+export async function authFetch(url, options = {}) {
+  let response = await fetch(url, withAuth(options));
+  if (response.status !== 401) return response;
+  // Várias chamadas simultâneas compartilham a mesma renovação
+  refreshing = refreshing || refreshTokens().finally(() => { refreshing = null; });
+  if (await refreshing) {
+    response = await fetch(url, withAuth(options));
+  }
+  return response;
+}
+
+export async function logout() {
+  const tokens = getTokens();
+  try {
+    await fetch(`${API_BASE_URL}/api/logout`, withAuth({
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ refresh_token: tokens?.refresh_token }),
+    }));
+  } finally {
+    clearTokens();
+  }
+}
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Importações, exportações e relatórios respondem 202 com um job em segundo plano.
+// Acompanha o job até terminar e devolve uma Response como a das rotas síncronas:
+// o arquivo gerado (download) ou um JSON com a mensagem/erros do job.
+export async function authFetchJob(url, options = {}, { interval = 1000, onProgress } = {}) {
+  const response = await authFetch(url, options);
+  if (response.status !== 202) return response;
+  let job = await response.json();
+  while (job.status === "queued" || job.status === "running") {
+    await sleep(interval);
+    const poll = await authFetch(`${API_BASE_URL}${job.status_url}`);
+    if (!poll.ok) return poll;
+    job = await poll.json();
+    onProgress?.(job);
+  }
+  if (job.status === "succeeded" && job.download_url) {
+    return authFetch(`${API_BASE_URL}${job.download_url}`);
+  }
+  const body = { ...(job.result || {}), message: job.message, errors: job.errors, job };
+  return new Response(JSON.stringify(body), {
+    status: job.status === "succeeded" ? 200 : 500,
+    headers: { "Content-Type": "application/json" },
+  });
+}